@@ -0,0 +1,149 @@
+# Cache 2 tầng:
+# - L1: LRU trong bộ nhớ của từng process (giới hạn số entry, có TTL riêng) -> đọc không tốn I/O.
+# - L2: cache dùng chung giữa các process/worker (vd: FileBasedCache, Redis...), khai báo bằng alias.
+# Ghi/xóa luôn đi xuyên qua cả 2 tầng. L1 chỉ giữ dữ liệu tối đa LOCAL_TIMEOUT giây nên process
+# khác ghi đè/xóa key thì process này sẽ thấy giá trị mới sau tối đa LOCAL_TIMEOUT giây.
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+
+class TieredCache(BaseCache):
+    """
+    OPTIONS:
+    - SHARED_ALIAS: alias của cache tầng 2 trong settings.CACHES (mặc định 'shared').
+    - LOCAL_MAX_ENTRIES: số entry tối đa của L1 (mặc định 1000).
+    - LOCAL_TIMEOUT: số giây tối đa một entry được giữ ở L1 (mặc định 5).
+    """
+
+    def __init__(self, location, params):
+        options = dict(params.get('OPTIONS', {}))
+        self._shared_alias = options.pop('SHARED_ALIAS', 'shared')
+        self._local_max_entries = int(options.pop('LOCAL_MAX_ENTRIES', 1000))
+        self._local_timeout = float(options.pop('LOCAL_TIMEOUT', 5))
+        super().__init__({**params, 'OPTIONS': options})
+
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'local_hits': 0, 'shared_hits': 0, 'misses': 0, 'evictions': 0}
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    # --- L1 ---
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _local_get(self, key):
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            expires_at, pickled = entry
+            if expires_at <= time.monotonic():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            self._stats['local_hits'] += 1
+        # Lưu dạng pickle để caller sửa object trả về không làm hỏng dữ liệu trong L1
+        return pickle.loads(pickled)
+
+    def _local_set(self, key, value, timeout):
+        local_timeout = self._local_timeout if timeout is None else min(timeout, self._local_timeout)
+        if local_timeout <= 0:
+            self._local_delete(key)
+            return
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._local[key] = (time.monotonic() + local_timeout, pickled)
+            self._local.move_to_end(key)
+            while len(self._local) > self._local_max_entries:
+                self._local.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def _local_delete(self, key):
+        with self._lock:
+            self._local.pop(key, None)
+
+    # --- API của Django cache ---
+    # Key được make_key ở tầng này, tầng 2 nhận key đã hoàn chỉnh (KEY_PREFIX/VERSION của tầng 2 vẫn áp dụng thêm).
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        value = self._local_get(key)
+        if value is not None:
+            return value
+
+        sentinel = object()
+        value = self.shared.get(key, sentinel)
+        if value is sentinel:
+            self._count('misses')
+            return default
+        self._count('shared_hits')
+        # Không biết TTL còn lại ở tầng 2 -> chỉ giữ ở L1 trong LOCAL_TIMEOUT
+        self._local_set(key, value, None)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        timeout = self.get_backend_timeout(timeout)
+        self.shared.set(key, value, timeout)
+        self._local_set(key, value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        timeout = self.get_backend_timeout(timeout)
+        added = self.shared.add(key, value, timeout)
+        if added:
+            self._local_set(key, value, timeout)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._local_delete(key)
+        return self.shared.touch(key, self.get_backend_timeout(timeout))
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._local_delete(key)
+        return self.shared.delete(key)
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return True
+        return self.shared.has_key(key)
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._local_delete(key)
+        return self.shared.incr(key, delta)
+
+    def clear(self):
+        """
+        Chỉ xóa L1 của process này. Tầng dùng chung còn chứa key của các cache khác (default, OTP...)
+        nên không gọi shared.clear(); entry của tầng này ở đó tự hết hạn theo timeout
+        (response cache còn hết hiệu lực theo version scope, xem backend.response_cache).
+        """
+        with self._lock:
+            self._local.clear()
+
+    def get_backend_timeout(self, timeout=DEFAULT_TIMEOUT):
+        # Trả về số giây (hoặc None = không hết hạn) thay vì mốc thời gian tuyệt đối như BaseCache
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        return None if timeout is None else max(0, timeout)
+
+    def stats(self):
+        """Bộ đếm hit/miss/eviction của process hiện tại."""
+        with self._lock:
+            return {**self._stats, 'local_entries': len(self._local)}
@@ -0,0 +1,77 @@
+# Conditional GET (ETag / Last-Modified) dựa trên version của dòng dữ liệu.
+# Model có cột 'version' tăng mỗi khi nội dung trả về thay đổi (bump_row_version); view chỉ cần
+# đọc version (truy vấn rẻ) để so với If-None-Match và trả 304 mà không cần serialize.
+import hashlib
+from functools import wraps
+
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+class RowVersionMixin:
+    """
+    Mixin cho model có trường 'version'.
+    save() thông thường không ghi đè cột version (instance có thể giữ giá trị cũ),
+    version chỉ tăng qua bump_row_version.
+    """
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'version'
+            ]
+        super().save(*args, **kwargs)
+
+
+def bump_row_version(queryset, touch_updated_at=False):
+    """Tăng version (và tùy chọn updated_at) của các dòng trong queryset bằng một câu UPDATE."""
+    changes = {'version': F('version') + 1}
+    if touch_updated_at:
+        changes['updated_at'] = timezone.now()
+    return queryset.update(**changes)
+
+
+def _representation_suffix(request):
+    # Cùng một dòng nhưng query string khác (vd: ?fields=) cho ra representation khác -> ETag khác
+    params = sorted((key, tuple(request.GET.getlist(key))) for key in request.GET)
+    if not params:
+        return ''
+    return '-' + hashlib.md5(repr(params).encode('utf-8')).hexdigest()[:8]
+
+
+def conditional_get(lookup):
+    """
+    Decorator cho view GET (đặt dưới @api_view, hoặc dùng method_decorator cho APIView.get).
+    lookup(request, *args, **kwargs) trả về (etag, last_modified) hoặc None nếu không tìm thấy
+    (khi đó view chạy bình thường để trả lỗi).
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view_func(request, *args, **kwargs)
+
+            validators = lookup(request, *args, **kwargs)
+            if validators is None:
+                return view_func(request, *args, **kwargs)
+
+            etag, last_modified = validators
+            etag = quote_etag(f'{etag}{_representation_suffix(request)}')
+            timestamp = int(last_modified.timestamp()) if last_modified else None
+
+            not_modified = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if not_modified is not None:
+                not_modified.headers['ETag'] = etag
+                return not_modified
+
+            response = view_func(request, *args, **kwargs)
+            if response.status_code == 200:
+                response.headers['ETag'] = etag
+                if timestamp is not None:
+                    response.headers['Last-Modified'] = http_date(timestamp)
+            return response
+        return wrapper
+    return decorator
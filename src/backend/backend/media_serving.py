@@ -0,0 +1,222 @@
+# Phục vụ file trong MEDIA_ROOT (ảnh sản phẩm khi dùng storage local) ở cả môi trường production.
+# - MEDIA_SENDFILE_BACKEND='nginx': chỉ trả header X-Accel-Redirect, nginx tự gửi file (Range, gzip_static...):
+#       location /protected-media/ { internal; alias /app/media/; gzip_static on; }
+#   'xsendfile': header X-Sendfile (Apache mod_xsendfile, lighttpd).
+# - Không có web server phía trước: FileResponse -> gunicorn gửi bằng os.sendfile (wsgi.file_wrapper),
+#   byte ảnh không đi qua bộ nhớ của worker Python. Hỗ trợ Range một đoạn (206 / 416) và If-Range.
+# - Tên file ảnh sản phẩm là UUID không bao giờ dùng lại (product.utils.rename_product_image)
+#   nên được cache "immutable" một năm.
+# - File nén sẵn cạnh file gốc (<tên>.br / <tên>.gz, lệnh compress_media) được ưu tiên theo Accept-Encoding.
+import gzip
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from django.views.decorators.http import require_safe
+
+# Thư mục có tên file không bao giờ bị ghi đè nội dung
+IMMUTABLE_PREFIXES = ('products/',)
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+DEFAULT_MAX_AGE = 3600
+# Định dạng đáng nén (ảnh JPEG/PNG/WebP đã nén sẵn, nén thêm không được gì)
+COMPRESSIBLE_TYPES = ('text/', 'image/svg+xml', 'application/json', 'application/javascript', 'application/xml')
+# Thứ tự ưu tiên: (đuôi file nén sẵn, Content-Encoding)
+PRECOMPRESSED = (('.br', 'br'), ('.gz', 'gzip'))
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def is_compressible(content_type):
+    return bool(content_type) and content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def parse_range(header, size):
+    """
+    Phân tích header Range (chỉ hỗ trợ một đoạn), trả về (start, end) tính cả end,
+    None nếu không có / không hỗ trợ (trả cả file), 'unsatisfiable' nếu đoạn nằm ngoài file.
+    """
+    match = RANGE_RE.match((header or '').strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # bytes=-N: N byte cuối
+        suffix = int(last)
+        if suffix == 0:
+            return 'unsatisfiable'
+        return max(size - suffix, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return 'unsatisfiable'
+    return start, end
+
+
+class RangeFile:
+    """
+    Bọc file đã seek tới đầu đoạn: read() không vượt quá độ dài đoạn,
+    fileno() để server WSGI gửi thẳng bằng sendfile (gunicorn dùng Content-Length làm số byte).
+    """
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        size = self.remaining if size is None or size < 0 else min(size, self.remaining)
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def _cache_control(path):
+    if path.startswith(IMMUTABLE_PREFIXES):
+        return f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return f'public, max-age={DEFAULT_MAX_AGE}'
+
+
+def _pick_encoding(request, full_path, content_type):
+    # Trả về (đường dẫn file sẽ gửi, Content-Encoding hoặc None)
+    if not is_compressible(content_type):
+        return full_path, None
+    accepted = request.headers.get('Accept-Encoding', '')
+    for suffix, encoding in PRECOMPRESSED:
+        if encoding in accepted and os.path.isfile(full_path + suffix):
+            return full_path + suffix, encoding
+    return full_path, None
+
+
+def _offload(path, full_path, content_type, encoding):
+    # full_path: file sẽ gửi (bản nén sẵn nếu đã chọn theo Accept-Encoding)
+    backend = getattr(settings, 'MEDIA_SENDFILE_BACKEND', None)
+    if backend == 'nginx':
+        # nginx tự chọn bản nén (gzip_static) và tự đặt Content-Encoding
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = settings.MEDIA_SENDFILE_URL + quote(path)
+        return response
+    if backend == 'xsendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = full_path
+        if encoding:
+            response['Content-Encoding'] = encoding
+        return response
+    return None
+
+
+@require_safe
+def serve_media(request, path):
+    """Phục vụ file trong MEDIA_ROOT (GET/HEAD)."""
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404()
+    if not os.path.isfile(full_path):
+        raise Http404()
+
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+    full_path, encoding = _pick_encoding(request, full_path, content_type)
+
+    response = _offload(path, full_path, content_type, encoding)
+    if response is None:
+        response = _file_response(request, full_path, content_type, encoding)
+    response['Cache-Control'] = _cache_control(path)
+    if is_compressible(content_type):
+        patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+def _file_response(request, full_path, content_type, encoding):
+    stat = os.stat(full_path)
+    etag = quote_etag(f'{stat.st_size:x}-{stat.st_mtime_ns:x}' + (f'-{encoding}' if encoding else ''))
+    last_modified = int(stat.st_mtime)
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        not_modified['ETag'] = etag
+        return not_modified
+
+    byte_range = parse_range(request.headers.get('Range'), stat.st_size)
+    if byte_range is not None and not _if_range_matches(request, etag, last_modified):
+        byte_range = None
+    if byte_range == 'unsatisfiable':
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+        return response
+
+    file = open(full_path, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, end = byte_range
+        file.seek(start)
+        response = FileResponse(RangeFile(file, end - start + 1), content_type=content_type, status=206)
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+        response['Content-Length'] = end - start + 1
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def _if_range_matches(request, etag, last_modified):
+    # If-Range không khớp (file đã đổi) -> bỏ qua Range, trả cả file
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def precompress_media(root=None, min_size=1024):
+    """
+    Tạo bản nén sẵn (.gz, và .br nếu cài gói brotli) cho các file đáng nén trong MEDIA_ROOT
+    (bỏ qua file nhỏ hơn min_size hoặc đã có bản nén mới hơn). Trả về số file đã ghi.
+    """
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+
+    written = 0
+    for directory, _, names in os.walk(root or settings.MEDIA_ROOT):
+        for name in names:
+            if name.endswith(tuple(suffix for suffix, _ in PRECOMPRESSED)):
+                continue
+            source = os.path.join(directory, name)
+            if not is_compressible(mimetypes.guess_type(source)[0]) or os.path.getsize(source) < min_size:
+                continue
+            targets = [('.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+            if brotli is not None:
+                targets.append(('.br', lambda data: brotli.compress(data, quality=11)))
+            data = None
+            for suffix, compress in targets:
+                target = source + suffix
+                if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(source):
+                    continue
+                if data is None:
+                    with open(source, 'rb') as f:
+                        data = f.read()
+                with open(target, 'wb') as f:
+                    f.write(compress(data))
+                written += 1
+    return written
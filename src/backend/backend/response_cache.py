@@ -0,0 +1,96 @@
+# Cache response cho các API public (đọc nhiều, giống nhau giữa các user).
+# Key cache gồm namespace của endpoint, host, tham số URL, query params và version của
+# các "scope" dữ liệu liên quan (vd: 'catalogue', 'product:12', 'shop:3').
+# Mỗi lần ghi dữ liệu chỉ cần đổi version của scope tương ứng (bump_version): response cũ
+# không còn được dùng tới -> không cần đoán TTL và không trả dữ liệu cũ.
+import hashlib
+import secrets
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+
+RESPONSE_CACHE_ALIAS = getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')
+VERSION_CACHE_ALIAS = getattr(settings, 'RESPONSE_CACHE_VERSION_ALIAS', 'default')
+RESPONSE_CACHE_TIMEOUT = getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 60 * 60)
+
+
+def _version_key(scope):
+    return f'rc:version:{scope}'
+
+
+def _fresh_version():
+    # Mốc thời gian (ns) + phần ngẫu nhiên thay vì bộ đếm: version mới không trùng version cũ đã dùng
+    # kể cả khi key version bị cache xóa (evict) hoặc 2 process cùng đổi version trong một thời điểm.
+    return f'{time.time_ns():x}{secrets.token_hex(4)}'
+
+
+def get_versions(scopes):
+    """Lấy version hiện tại của các scope (khởi tạo nếu chưa có)."""
+    cache = caches[VERSION_CACHE_ALIAS]
+    keys = [_version_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    versions = []
+    for key in keys:
+        if key not in found:
+            cache.add(key, _fresh_version(), timeout=None)
+            found[key] = cache.get(key)
+        versions.append(found[key])
+    return versions
+
+
+def bump_version(*scopes):
+    """Đổi version của các scope, làm mọi response đã cache phụ thuộc vào chúng hết hiệu lực."""
+    # Ghi đè bằng version mới thay vì incr: incr của FileBasedCache là get + set không nguyên tử,
+    # 2 process cùng incr có thể ra cùng một giá trị (hoặc quay về giá trị cũ) và giữ lại response cũ.
+    caches[VERSION_CACHE_ALIAS].set_many({_version_key(scope): _fresh_version() for scope in scopes}, timeout=None)
+
+
+def bump_version_on_commit(*scopes):
+    """
+    Tăng version sau khi transaction hiện tại commit thành công.
+    Nếu tăng ngay trong transaction, request khác có thể đọc dữ liệu cũ và lưu nó dưới version mới.
+    """
+    transaction.on_commit(lambda: bump_version(*scopes))
+
+
+def build_cache_key(namespace, request, view_kwargs, versions):
+    params = sorted((key, tuple(request.query_params.getlist(key))) for key in request.query_params)
+    raw = repr((request.get_host(), sorted(view_kwargs.items()), params, versions))
+    return f'rc:{namespace}:{hashlib.md5(raw.encode("utf-8")).hexdigest()}'
+
+
+def cache_response(namespace, scopes, timeout=None, refresh=None):
+    """
+    Decorator cache response cho view GET (đặt bên dưới @api_view).
+    - namespace: tên endpoint, dùng làm tiền tố key.
+    - scopes: list tên scope, hoặc hàm (request, **kwargs) -> list tên scope.
+    - refresh: hàm (data) sửa tại chỗ dữ liệu lấy từ cache trước khi trả về, cho các trường
+      đổi quá thường xuyên để gắn vào version (vd: tồn kho, xem product.views.refresh_stock).
+    Chỉ cache response 200.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return view_func(request, *args, **kwargs)
+
+            scope_names = scopes(request, **kwargs) if callable(scopes) else scopes
+            cache_key = build_cache_key(namespace, request, kwargs, get_versions(scope_names))
+            cache = caches[RESPONSE_CACHE_ALIAS]
+
+            cached = cache.get(cache_key)
+            if cached is not None:
+                if refresh is not None:
+                    refresh(cached)
+                return Response(cached)
+
+            response = view_func(request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(cache_key, response.data, timeout or RESPONSE_CACHE_TIMEOUT)
+            return response
+        return wrapper
+    return decorator
@@ -14,6 +14,7 @@ from pathlib import Path
 from dotenv import load_dotenv
 import dj_database_url
 import os
+import tempfile
 
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -46,6 +47,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'user',
     'product',
     'category',
@@ -184,6 +186,10 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Giao việc gửi file media cho web server phía trước (xem backend/media_serving.py):
+# 'nginx' (X-Accel-Redirect tới MEDIA_SENDFILE_URL), 'xsendfile' (X-Sendfile) hoặc để trống (gunicorn sendfile)
+MEDIA_SENDFILE_BACKEND = os.environ.get('MEDIA_SENDFILE_BACKEND') or None
+MEDIA_SENDFILE_URL = os.environ.get('MEDIA_SENDFILE_URL', '/protected-media/')
 
 
 IMAGEKIT_PRIVATE_KEY = os.environ.get('IMAGEKIT_PRIVATE_KEY')
@@ -192,6 +198,11 @@ IMAGEKIT_URL_ENDPOINT = os.environ.get('IMAGEKIT_URL_ENDPOINT')
 
 USE_CLOUD_STORAGE=os.environ.get('USE_CLOUD_STORAGE')
 
+# Giới hạn upload ảnh sản phẩm (xem product/ingest.py)
+PRODUCT_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+PRODUCT_UPLOAD_REQUEST_MAX_BYTES = 40 * 1024 * 1024
+PRODUCT_IMAGE_MAX_PIXELS = 40_000_000
+
 
 LOCAL_URL = "http://localhost:10000"
 
@@ -199,18 +210,47 @@ LOCAL_URL = "http://localhost:10000"
 
 DEFAULT_FROM_EMAIL = os.environ.get("DEFAULT_FROM_EMAIL")
 
+# Cache 2 tầng (xem backend/cache_backends.py): LRU trong process phía trước, cache dùng chung phía sau.
+# Tầng dùng chung mặc định là thư mục trên đĩa (dùng chung giữa các worker gunicorn trên cùng máy).
+SHARED_CACHE_DIR = os.environ.get('SHARED_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'ecommerce_cache'))
+
+SHARED_CACHE = {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': SHARED_CACHE_DIR,
+    'OPTIONS': {
+        'MAX_ENTRIES': 10000
+    }
+}
+
 CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
-        'LOCATION': 'my_cache_table',
+    # OTP, danh sách gợi ý: giá trị bị ghi đè / xóa và phải thấy ngay ở mọi worker -> không qua L1
+    'default': SHARED_CACHE,
+    'responses': {
+        'BACKEND': 'backend.cache_backends.TieredCache',
+        'KEY_PREFIX': 'responses',
         'OPTIONS': {
-            'MAX_ENTRIES': 1000
+            'SHARED_ALIAS': 'shared',
+            'LOCAL_MAX_ENTRIES': 2000,
+            # Key response chứa version nên nội dung không đổi -> giữ ở L1 lâu hơn
+            'LOCAL_TIMEOUT': 300,
         }
-    }
+    },
+    'shared': SHARED_CACHE,
 }
 
+# Cache response cho các API public, làm mới theo version (xem backend/response_cache.py)
+RESPONSE_CACHE_ALIAS = 'responses'
+# Version phải thấy ngay ở mọi process -> đọc thẳng tầng dùng chung, không qua L1
+RESPONSE_CACHE_VERSION_ALIAS = 'shared'
+RESPONSE_CACHE_TIMEOUT = 60 * 60
+
 VNPAY_TMN_CODE=os.environ.get('VNPAY_TMNCODE')
 VNPAY_HASH_SECRET_KEY=os.environ.get('VNPAY_HASH_SECRET')
 VNPAY_PAYMENT_URL=os.environ.get('VNPAY_PAYMENT_URL')
 VNPAY_RETURN_URL =os.environ.get('VNPAY_RETURN_URL')
+# Hạn thanh toán (vnp_ExpireDate); hàng của đơn VNPAY được giữ đến hạn này (xem order/reservations.py)
+VNPAY_PAYMENT_TIMEOUT_MINUTES = 15
+
+# Thời gian lưu kết quả theo header Idempotency-Key của request đặt hàng (xem order/idempotency.py)
+IDEMPOTENCY_KEY_TTL_HOURS = 24
 
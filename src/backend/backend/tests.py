@@ -0,0 +1,140 @@
+import os
+import tempfile
+from datetime import datetime, timezone
+from django.test import SimpleTestCase, override_settings
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from .cache_backends import TieredCache
+from .conditional import conditional_get
+from .media_serving import parse_range, serve_media
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tiered-test'},
+})
+class TieredCacheTest(SimpleTestCase):
+
+    def setUp(self):
+        self.cache = TieredCache(None, {
+            'OPTIONS': {'SHARED_ALIAS': 'shared', 'LOCAL_MAX_ENTRIES': 2, 'LOCAL_TIMEOUT': 60},
+        })
+        self.cache.shared.clear()
+        self.cache.clear()
+
+    def test_read_through_and_stats(self):
+        """
+        Giá trị ghi vào được đọc từ L1; key chưa có ở L1 được lấy từ tầng dùng chung rồi giữ lại ở L1.
+        """
+        self.cache.set('a', {'x': 1})
+        self.assertEqual(self.cache.get('a'), {'x': 1})
+
+        self.cache.shared.set(self.cache.make_key('b'), 2)
+        self.assertEqual(self.cache.get('b'), 2)
+        self.assertEqual(self.cache.get('b'), 2)
+        self.assertIsNone(self.cache.get('missing'))
+
+        stats = self.cache.stats()
+        self.assertEqual((stats['local_hits'], stats['shared_hits'], stats['misses']), (2, 1, 1))
+
+    def test_lru_eviction(self):
+        """
+        L1 vượt LOCAL_MAX_ENTRIES thì bỏ key ít dùng nhất; giá trị vẫn còn ở tầng dùng chung.
+        """
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        self.cache.get('a')
+        self.cache.set('c', 3)
+
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+        self.assertEqual(self.cache.get('b'), 2)
+        self.assertEqual(self.cache.stats()['shared_hits'], 1)
+
+    def test_delete_and_incr(self):
+        self.cache.set('n', 1)
+        self.assertEqual(self.cache.incr('n'), 2)
+        self.assertEqual(self.cache.get('n'), 2)
+        self.cache.delete('n')
+        self.assertIsNone(self.cache.get('n'))
+
+    def test_clear_keeps_shared_keys(self):
+        """clear() chỉ xóa L1, không xóa key khác (vd: OTP) trong tầng dùng chung."""
+        self.cache.shared.set('otp:user@example.com', '123456')
+        self.cache.set('a', 1)
+        self.cache.clear()
+
+        self.assertEqual(self.cache.shared.get('otp:user@example.com'), '123456')
+        self.assertEqual(self.cache.get('a'), 1)
+        self.assertEqual(self.cache.stats()['local_entries'], 1)
+
+
+class ConditionalGetTest(SimpleTestCase):
+
+    def setUp(self):
+        self.calls = []
+
+        @api_view(['GET'])
+        @conditional_get(lambda request: ('item-1-v3', datetime(2026, 1, 1, tzinfo=timezone.utc)))
+        def view(request):
+            self.calls.append(1)
+            return Response({'ok': True})
+
+        self.view = view
+        self.factory = APIRequestFactory()
+
+    def test_etag_and_not_modified(self):
+        """
+        Response 200 kèm ETag/Last-Modified; gửi lại If-None-Match khớp thì trả 304 mà không chạy view.
+        """
+        response = self.view(self.factory.get('/'))
+        self.assertEqual(response['ETag'], '"item-1-v3"')
+        self.assertIn('Last-Modified', response)
+
+        response = self.view(self.factory.get('/', HTTP_IF_NONE_MATCH='"item-1-v3"'))
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(self.calls), 1)
+
+    def test_query_string_changes_etag(self):
+        response = self.view(self.factory.get('/', {'fields': 'product_id'}, HTTP_IF_NONE_MATCH='"item-1-v3"'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], '"item-1-v3"')
+
+
+class MediaServingTest(SimpleTestCase):
+
+    def test_parse_range(self):
+        self.assertEqual(parse_range('bytes=0-9', 100), (0, 9))
+        self.assertEqual(parse_range('bytes=90-', 100), (90, 99))
+        self.assertEqual(parse_range('bytes=-10', 100), (90, 99))
+        self.assertEqual(parse_range('bytes=50-500', 100), (50, 99))
+        self.assertEqual(parse_range('bytes=100-', 100), 'unsatisfiable')
+        # Nhiều đoạn / sai cú pháp: trả cả file
+        self.assertIsNone(parse_range('bytes=0-1,5-6', 100))
+        self.assertIsNone(parse_range(None, 100))
+
+    def test_range_response(self):
+        with tempfile.TemporaryDirectory() as root:
+            os.makedirs(os.path.join(root, 'products'))
+            with open(os.path.join(root, 'products', 'a.png'), 'wb') as f:
+                f.write(bytes(range(100)))
+            with override_settings(MEDIA_ROOT=root, MEDIA_SENDFILE_BACKEND=None):
+                request = APIRequestFactory().get('/media/products/a.png', HTTP_RANGE='bytes=10-19')
+                response = serve_media(request, 'products/a.png')
+                body = b''.join(response.streaming_content)
+                response.close()
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/100')
+        self.assertEqual(body, bytes(range(10, 20)))
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_xsendfile_sends_precompressed_file(self):
+        with tempfile.TemporaryDirectory() as root:
+            for name, data in (('logo.svg', b'<svg/>'), ('logo.svg.gz', b'gz')):
+                with open(os.path.join(root, name), 'wb') as f:
+                    f.write(data)
+            with override_settings(MEDIA_ROOT=root, MEDIA_SENDFILE_BACKEND='xsendfile'):
+                request = APIRequestFactory().get('/media/logo.svg', HTTP_ACCEPT_ENCODING='gzip')
+                response = serve_media(request, 'logo.svg')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['X-Sendfile'], os.path.join(root, 'logo.svg.gz'))
@@ -1,8 +1,10 @@
+import re
+
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 from django.conf import settings
-from django.conf.urls.static import static
+from backend.media_serving import serve_media
 from product import admin_views as pav
 from feedback import admin_views as fav
 from user import admin_views as uav
@@ -16,6 +18,7 @@ urlpatterns = [
     path('shopadmin/delete-feedback/<int:feedback_id>/', fav.delete_feedback, name="delete_feedback"),
     path('shopadmin/product-list/', pav.get_products, name='admin-product-list'),
     path('shopadmin/product/<int:product_id>/', pav.handle_admin_product_api, name='admin-product-get-detail-and-update'),
+    path('shopadmin/recommendation-metrics/', pav.get_recommendation_metrics, name='admin-recommendation-metrics'),
     path('shopadmin/users/', uav.get_users, name='get_users'),
     path('shopadmin/pendingusers/', uav.get_pending_users, name='get_pending_user'),
     path('shopadmin/user/<int:user_id>/', uav.handle_admin_user_api, name='handle_admin_user_api'),
@@ -23,6 +26,9 @@ urlpatterns = [
     path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
 ]
 
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Ảnh sản phẩm lưu local (xem backend/media_serving.py), phục vụ cả khi DEBUG tắt
+if settings.MEDIA_URL.startswith('/'):
+    urlpatterns.append(
+        re_path(rf"^{re.escape(settings.MEDIA_URL.lstrip('/'))}(?P<path>.+)$", serve_media, name='media')
+    )
 
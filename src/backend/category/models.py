@@ -1,4 +1,7 @@
 from django.db import models
+from backend.response_cache import bump_version_on_commit
+
+CATEGORY_SCOPE = 'category'
 
 class Category(models.Model):
     category_name = models.CharField(max_length=45, unique=True)
@@ -6,4 +9,13 @@ class Category(models.Model):
         verbose_name_plural = "Categories"
             
     def __str__(self):
-        return self.category_name
\ No newline at end of file
+        return self.category_name
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        bump_version_on_commit(CATEGORY_SCOPE)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        bump_version_on_commit(CATEGORY_SCOPE)
+        return result
@@ -1,20 +1,30 @@
 from rest_framework.decorators import api_view,renderer_classes
 from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
-from .models import Category
+from .models import Category, CATEGORY_SCOPE
+from backend.response_cache import cache_response, get_versions
+from backend.conditional import conditional_get
 from .serializers import CategorySerializer
 from rest_framework import status
 from drf_spectacular.utils import extend_schema
 
 
+def category_list_validators(request):
+    # Version của scope 'category' tăng mỗi khi danh mục thay đổi (Category.save/delete)
+    version, = get_versions([CATEGORY_SCOPE])
+    return f'categories-v{version}', None
+
+
 @extend_schema(
     tags=['Category'],
     responses={200: CategorySerializer(many=True)},
     summary="Lấy danh sách danh mục",
-    description="API trả về toàn bộ danh mục sản phẩm có trong hệ thống."
+    description="API trả về toàn bộ danh mục sản phẩm có trong hệ thống. Hỗ trợ If-None-Match (304 Not Modified)."
 )
 @api_view(['GET'])
 @renderer_classes([JSONRenderer])
+@conditional_get(category_list_validators)
+@cache_response('category-list', scopes=[CATEGORY_SCOPE])
 def get_category_list(request):
     categories = Category.objects.all()
     serializer = CategorySerializer(categories, many=True)
@@ -6,6 +6,7 @@ from rest_framework.response import Response
 from rest_framework import status
 from feedback.models import Feedback
 from feedback.serializers import FeedbackSerializer, NewFeedbackSerializer
+from product.invalidation import feedback_changed
 from drf_spectacular.utils import extend_schema, OpenApiParameter, inline_serializer
 from rest_framework import serializers
 from rest_framework.permissions import IsAdminUser
@@ -97,6 +98,7 @@ def approve_feedback(request, feedback_id):
     try:
         Feedback.objects.filter(id = feedback_id).update(status = 'normal')
         feedback = Feedback.objects.get(id = feedback_id)
+        feedback_changed(feedback.product_id)
         serializer = FeedbackSerializer(feedback)
         return Response(serializer.data, status = status.HTTP_200_OK)
     except Exception as e:
@@ -134,6 +136,7 @@ def delete_feedback(request, feedback_id):
     try:
         feedback = Feedback.objects.get(id=feedback_id)
         feedback.delete()
+        feedback_changed(feedback.product_id)
         return Response(status=status.HTTP_204_NO_CONTENT)
     except Feedback.DoesNotExist:
         return Response({"error": "Feedback không tồn tại"}, status=status.HTTP_404_NOT_FOUND)
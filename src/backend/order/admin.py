@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Order,OrderDetail
+from .models import Order,OrderDetail,StockReservation
 
 admin.site.register(Order)
-admin.site.register(OrderDetail)
\ No newline at end of file
+admin.site.register(OrderDetail)
+admin.site.register(StockReservation)
@@ -0,0 +1,107 @@
+# Header Idempotency-Key cho POST /api/orders/: client (mobile) gửi lại request khi timeout mà không tạo đơn trùng.
+# - Lần đầu: ghi khóa và chạy request trong CÙNG một transaction, lưu response (2xx / 4xx) trước khi commit.
+# - Request trùng đến khi lần đầu chưa xong: INSERT cùng khóa bị unique index chặn đến khi lần đầu commit,
+#   sau đó đọc và trả lại đúng response đã lưu (không chạy lại, không đụng tồn kho).
+# - Lần đầu lỗi 5xx hoặc exception (lỗi DB tạm thời...): rollback cả khóa -> lần gửi lại được xử lý như mới.
+#   Chỉ lưu 2xx và 4xx (lỗi xác định: dữ liệu sai, hết hàng), handler phải trả 5xx cho lỗi tạm thời.
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+KEY_TTL = timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+# Số lần thử ghi khóa khi request cùng khóa vừa rollback
+MAX_CLAIM_ATTEMPTS = 2
+
+
+def _sha256(value):
+    return hashlib.sha256(value.encode('utf-8')).hexdigest()
+
+
+def request_hash(request):
+    """SHA-256 của body request (JSON chuẩn hóa, không phụ thuộc thứ tự key)."""
+    return _sha256(json.dumps(request.data, sort_keys=True, default=str))
+
+
+def _replay(record):
+    return Response(record.response_body, status=record.response_status, headers={'Idempotent-Replayed': 'true'})
+
+
+def idempotent(request, handler):
+    """
+    Chạy handler() (trả về Response) tối đa một lần cho mỗi Idempotency-Key của user.
+    Không có header -> chạy bình thường. Không giành được khóa sau MAX_CLAIM_ATTEMPTS lần -> 409.
+    """
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if not key:
+        return handler()
+    if len(key) > MAX_KEY_LENGTH:
+        return Response(
+            {'error': f'{IDEMPOTENCY_HEADER} tối đa {MAX_KEY_LENGTH} ký tự.'}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    key_hash = _sha256(f'{request.user.pk}:{request.method}:{request.path}:{key}')
+    body_hash = request_hash(request)
+
+    # Request cùng khóa lỗi 5xx và rollback ngay khi request này chờ INSERT -> giành khóa lại,
+    # nhưng chỉ MAX_CLAIM_ATTEMPTS lần (không đệ quy / lặp vô hạn khi nhiều request cùng khóa đến liên tục)
+    for _ in range(MAX_CLAIM_ATTEMPTS):
+        now = timezone.now()
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    # Khóa đã hết hạn thì dùng lại được
+                    IdempotencyKey.objects.filter(key_hash=key_hash, expires_at__lte=now).delete()
+                    record = IdempotencyKey.objects.create(
+                        key_hash=key_hash, request_hash=body_hash, expires_at=now + KEY_TTL
+                    )
+            except IntegrityError:
+                # Đã có request cùng khóa (đã commit xong, vì INSERT chờ đến khi request kia kết thúc)
+                record = None
+
+            if record is not None:
+                response = handler()
+                if response.status_code >= 500:
+                    transaction.set_rollback(True)
+                    return response
+                record.response_status = response.status_code
+                record.response_body = response.data
+                record.save(update_fields=['response_status', 'response_body'])
+                return response
+
+        record = IdempotencyKey.objects.filter(key_hash=key_hash).first()
+        if record is None:
+            # Request kia lỗi 5xx và đã rollback: thử giành khóa lại
+            continue
+        if record.request_hash != body_hash:
+            return Response(
+                {'error': f'{IDEMPOTENCY_HEADER} đã được dùng cho một request khác.'},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+        return _replay(record)
+
+    return Response(
+        {'error': f'Request khác cùng {IDEMPOTENCY_HEADER} đang được xử lý, vui lòng thử lại sau.'},
+        status=status.HTTP_409_CONFLICT
+    )
+
+
+def purge_expired(batch_size=5000):
+    """Xóa khóa hết hạn theo lô (dùng index expires_at). Trả về số dòng đã xóa."""
+    deleted = 0
+    while True:
+        ids = list(
+            IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
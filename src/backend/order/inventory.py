@@ -0,0 +1,84 @@
+# Trừ / hoàn tồn kho variant an toàn khi nhiều đơn hàng tranh cùng một variant (flash sale).
+# - Trừ kho của cả đơn bằng MỘT câu UPDATE có điều kiện (quantity >= số lượng mua): không bao giờ âm kho,
+#   không đọc-so sánh-ghi trong Python, chỉ ghi cột quantity.
+# - Khóa các dòng variant theo thứ tự id tăng dần trước khi ghi: hai đơn cùng chứa variant A và B
+#   luôn khóa A rồi B nên không deadlock.
+from collections import Counter
+
+from django.db import connection
+from django.db.models import F
+from rest_framework import serializers
+
+from product.models import ProductVariant
+
+# Khóa các variant theo id tăng dần rồi cộng / trừ kho bằng một câu UPDATE; {guard} là điều kiện thêm,
+# {lock} là FOR UPDATE (bỏ trống với SQLite: không hỗ trợ, ghi đã khóa cả database)
+STOCK_UPDATE_SQL = """
+WITH wanted (variant_id, qty) AS (VALUES {values}),
+locked AS MATERIALIZED (
+    SELECT v.id AS variant_id FROM {variant_table} AS v
+    WHERE v.id IN (SELECT variant_id FROM wanted)
+    ORDER BY v.id
+    {lock}
+)
+UPDATE {variant_table} AS v
+SET quantity = v.quantity {operator} wanted.qty
+FROM wanted, locked
+WHERE v.id = wanted.variant_id AND v.id = locked.variant_id{guard}
+RETURNING id
+"""
+
+
+def merge_lines(lines):
+    """[(variant_id, quantity), ...] -> {variant_id: tổng quantity} (một variant xuất hiện nhiều dòng được cộng dồn)."""
+    demand = Counter()
+    for variant_id, quantity in lines:
+        demand[variant_id] += quantity
+    return dict(demand)
+
+
+def _update_stock(demand, operator, guard=''):
+    ids = sorted(demand)
+    sql = STOCK_UPDATE_SQL.format(
+        values=', '.join(['(%s, %s)'] * len(ids)),
+        variant_table=ProductVariant._meta.db_table,
+        operator=operator,
+        guard=guard,
+        lock='FOR UPDATE' if connection.features.has_select_for_update else '',
+    )
+    params = [value for variant_id in ids for value in (variant_id, demand[variant_id])]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return {row[0] for row in cursor.fetchall()}
+
+
+def decrement_stock(demand):
+    """
+    Trừ kho {variant_id: quantity} bằng một câu lệnh (chỉ trừ khi quantity >= số cần);
+    phải gọi trong transaction của đơn hàng.
+    Trả về tập variant_id không đủ hàng (rỗng nếu thành công). Khi có variant không đủ hàng
+    các variant khác vẫn đã bị trừ: người gọi phải rollback (raise trong transaction.atomic).
+    """
+    if not demand:
+        return set()
+    return set(demand) - _update_stock(demand, '-', ' AND v.quantity >= wanted.qty')
+
+
+def increment_stock(demand):
+    """Hoàn kho {variant_id: quantity} bằng một câu lệnh (cùng thứ tự khóa với decrement_stock)."""
+    if demand:
+        _update_stock(demand, '+')
+
+
+def reserve_stock(demand):
+    """decrement_stock, raise ValidationError liệt kê variant không đủ hàng."""
+    short = decrement_stock(demand)
+    if short:
+        raise serializers.ValidationError(
+            [f"Phân loại '{variant_id}' không đủ hàng." for variant_id in sorted(short)]
+        )
+
+
+def restock(variant_id, quantity):
+    """Hoàn kho (đơn bị từ chối / hủy): cộng dồn trong DB, không ghi đè giá trị đọc trước đó."""
+    ProductVariant.objects.filter(id=variant_id).update(quantity=F('quantity') + quantity)
@@ -0,0 +1,121 @@
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, close_old_connections
+from rest_framework import serializers
+
+from category.models import Category
+from order.models import Order
+from order.serializers import NewOrderSerializer
+from product.models import Product, ProductVariant
+from shop.models import Shop
+
+
+class Command(BaseCommand):
+    help = (
+        "Đo tranh chấp trừ kho (flash sale): nhiều luồng đồng thời đặt các đơn nhiều variant "
+        "(thứ tự ngẫu nhiên) trên một sản phẩm tạm qua đúng luồng tạo đơn (NewOrderSerializer: tạo Order / "
+        "OrderDetail, trừ kho, giữ chỗ với VNPAY), sau đó đối chiếu tồn kho còn lại với số lượng đã bán. "
+        "Báo lỗi nếu bán vượt tồn kho."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shop', type=int, required=True, help='ID của Shop sở hữu sản phẩm tạm')
+        parser.add_argument('--variants', type=int, default=5, help='Số variant của sản phẩm tạm')
+        parser.add_argument('--stock', type=int, default=200, help='Tồn kho ban đầu của mỗi variant')
+        parser.add_argument('--orders', type=int, default=5000, help='Tổng số đơn thử đặt')
+        parser.add_argument('--threads', type=int, default=32, help='Số luồng (kết nối DB) đặt đơn đồng thời')
+        parser.add_argument('--max-lines', type=int, default=3, help='Số variant tối đa trong một đơn')
+        parser.add_argument('--payment-type', choices=['COD', 'VNPAY'], default='COD',
+                            help='VNPAY: đơn được giữ chỗ (StockReservation) như thanh toán online')
+        parser.add_argument('--keep', action='store_true', help='Không xóa sản phẩm tạm sau khi chạy')
+
+    def handle(self, *args, **options):
+        try:
+            shop = Shop.objects.get(id=options['shop'])
+        except Shop.DoesNotExist:
+            raise CommandError(f"Shop {options['shop']} does not exist.")
+        category = Category.objects.order_by('id').first()
+        if category is None:
+            raise CommandError("At least one category is required.")
+
+        product = Product.objects.create(
+            product_name='[benchmark] flash sale', description='', shop=shop, category=category, is_active=False
+        )
+        variants = ProductVariant.objects.bulk_create([
+            ProductVariant(product=product, price=1, quantity=options['stock'], attributes={'n': n})
+            for n in range(options['variants'])
+        ])
+        variant_ids = [variant.id for variant in variants]
+
+        # Người mua là chủ shop: benchmark không cần tạo user
+        request = SimpleNamespace(user=shop.owner)
+        sold = Counter()
+        outcome = Counter()
+        order_ids = []
+        guard = threading.Lock()
+
+        def place_order(_):
+            close_old_connections()
+            picked = random.sample(variant_ids, random.randint(1, min(options['max_lines'], len(variant_ids))))
+            demand = {variant_id: random.randint(1, 3) for variant_id in picked}
+            serializer = NewOrderSerializer(data={
+                'items': [
+                    {'product_id': product.id, 'variant_id': variant_id, 'quantity': quantity}
+                    for variant_id, quantity in demand.items()
+                ],
+                'payment_type': options['payment_type'],
+                'full_name': 'benchmark', 'phone_number': '0', 'address': '-', 'note': '-',
+            }, context={'request': request})
+            order_id = None
+            try:
+                serializer.is_valid(raise_exception=True)
+                order_id = serializer.save().id
+            except serializers.ValidationError:
+                result = 'rejected'
+            except DatabaseError:
+                # Deadlock / serialization failure: không được xảy ra nếu khóa đúng thứ tự
+                result = 'errors'
+            else:
+                result = 'committed'
+            finally:
+                close_old_connections()
+            with guard:
+                outcome[result] += 1
+                if result == 'committed':
+                    sold.update(demand)
+                    order_ids.append(order_id)
+
+        started = time.monotonic()
+        try:
+            with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+                list(pool.map(place_order, range(options['orders'])))
+            elapsed = time.monotonic() - started
+
+            remaining = dict(ProductVariant.objects.filter(id__in=variant_ids).values_list('id', 'quantity'))
+            mismatched = [
+                variant_id for variant_id in variant_ids
+                if remaining[variant_id] < 0 or options['stock'] - remaining[variant_id] != sold[variant_id]
+            ]
+        finally:
+            if not options['keep']:
+                Order.objects.filter(id__in=order_ids).delete()
+                product.delete()
+
+        self.stdout.write(
+            f"{options['orders']} order(s) in {elapsed:.2f}s ({options['orders'] / elapsed:.0f}/s): "
+            f"{outcome['committed']} committed, {outcome['rejected']} rejected (out of stock), "
+            f"{outcome['errors']} database error(s)."
+        )
+        self.stdout.write(
+            f"Sold {sum(sold.values())} of {options['stock'] * len(variant_ids)} unit(s); "
+            f"remaining {sum(remaining.values())}."
+        )
+        if mismatched or outcome['errors']:
+            raise CommandError(f"Inventory mismatch on variant(s) {mismatched}, {outcome['errors']} error(s).")
+        self.stdout.write(self.style.SUCCESS("No oversell: stock sold equals stock decremented on every variant."))
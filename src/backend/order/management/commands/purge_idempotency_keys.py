@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from order.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = "Xóa các Idempotency-Key đã hết hạn (IDEMPOTENCY_KEY_TTL_HOURS). Chạy định kỳ bằng cron."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Số dòng xóa mỗi lần')
+
+    def handle(self, *args, **options):
+        deleted = purge_expired(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired idempotency key(s)."))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from order.reservations import release_expired
+
+
+class Command(BaseCommand):
+    help = (
+        "Hoàn kho các giữ chỗ của đơn thanh toán online đã quá hạn mà chưa thanh toán. "
+        "Chạy định kỳ (vd: mỗi phút bằng cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Số giữ chỗ hoàn kho trong một transaction')
+
+    def handle(self, *args, **options):
+        released = release_expired(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Released {released} expired reservation(s)."))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0005_idempotency_keys'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stockreservation',
+            name='status',
+            field=models.CharField(choices=[('held', 'Held'), ('confirmed', 'Confirmed'), ('expired', 'Expired'), ('released', 'Released'), ('short', 'Short')], default='held', max_length=10),
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 
 class Order(models.Model):
     # Một Order là một lần mua hàng (gồm nhiều order detail)
@@ -72,3 +73,65 @@ class OrderDetail(models.Model):
 
     def __str__(self):
         return f"OrderDetail {self.id} for Order {self.order_id}"
+
+
+class StockReservation(models.Model):
+    """
+    Giữ hàng cho đơn thanh toán online (xem order.reservations). Tồn kho đã được trừ khi giữ chỗ,
+    nên ProductVariant.quantity luôn là số hàng còn bán được; hết hạn mà chưa thanh toán thì hoàn kho.
+    """
+    STATUS_HELD = 'held'
+    STATUS_CONFIRMED = 'confirmed'
+    STATUS_EXPIRED = 'expired'
+    STATUS_RELEASED = 'released'
+    STATUS_SHORT = 'short'
+    STATUS_CHOICES = (
+        (STATUS_HELD, 'Held'),            # Đang giữ, chờ thanh toán
+        (STATUS_CONFIRMED, 'Confirmed'),  # Đã thanh toán
+        (STATUS_EXPIRED, 'Expired'),      # Quá hạn, đã hoàn kho (IPN thành công đến muộn vẫn trừ lại được)
+        (STATUS_RELEASED, 'Released'),    # Thanh toán thất bại / shop từ chối, đã hoàn kho
+        (STATUS_SHORT, 'Short'),          # Đã thanh toán (IPN đến muộn) nhưng hết hàng: cần hoàn tiền / bổ sung hàng
+    )
+
+    order = models.ForeignKey(
+        'order.Order',
+        on_delete=models.CASCADE,
+        related_name='reservations'
+    )
+    variant = models.ForeignKey(
+        'product.ProductVariant',
+        on_delete=models.CASCADE,
+        related_name='reservations'
+    )
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_HELD)
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Sweeper chỉ quét phần index của giữ chỗ đang 'held', theo thời điểm hết hạn
+            models.Index(fields=['expires_at'], condition=models.Q(status='held'), name='reservation_held_expiry_idx'),
+            # Tổng hàng đang giữ theo variant (held_quantities)
+            models.Index(fields=['variant'], condition=models.Q(status='held'), name='reservation_held_variant_idx'),
+        ]
+
+    def __str__(self):
+        return f"Order {self.order_id}: {self.quantity} x variant {self.variant_id} ({self.status})"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Kết quả của request đặt hàng theo header Idempotency-Key (xem order.idempotency).
+    Khóa và request chỉ lưu dạng SHA-256 (độ dài cố định) để bảng và index gọn.
+    """
+    # SHA-256 của (user, method, path, Idempotency-Key)
+    key_hash = models.CharField(max_length=64, unique=True)
+    # SHA-256 của body request: cùng khóa nhưng body khác -> từ chối
+    request_hash = models.CharField(max_length=64)
+    response_status = models.PositiveSmallIntegerField(default=0)
+    response_body = models.JSONField(encoder=DjangoJSONEncoder, default=dict)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.key_hash[:12]} -> {self.response_status}"
@@ -0,0 +1,155 @@
+# Giữ hàng có thời hạn cho đơn thanh toán online (VNPAY).
+# Đơn online trừ kho ngay khi tạo (order.inventory) và ghi một StockReservation 'held' cho mỗi variant.
+# - IPN thành công -> 'confirmed' (hàng đã bán).
+# - IPN thất bại -> hoàn kho ngay ('released').
+# - Quá hạn thanh toán mà không có IPN -> lệnh release_reservations hoàn kho theo lô ('expired').
+#   IPN thành công đến sau đó: trừ kho lại ('confirmed'), hết hàng thì ghi nhận 'short' để hoàn tiền / bổ sung hàng.
+# ProductVariant.quantity luôn là số hàng còn bán được (không cần cộng trừ lúc đọc);
+# số hàng đang được giữ lấy từ partial index của các dòng 'held' (held_quantities).
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from product.invalidation import stock_changed
+from product.models import ProductVariant
+from .inventory import decrement_stock, increment_stock, merge_lines
+from .models import StockReservation
+
+# Giữ thêm một khoảng sau hạn thanh toán của VNPAY cho IPN đến muộn
+IPN_GRACE = timedelta(minutes=5)
+RESERVATION_TTL = timedelta(minutes=settings.VNPAY_PAYMENT_TIMEOUT_MINUTES) + IPN_GRACE
+
+
+def hold_stock(order, demand):
+    """Ghi giữ chỗ cho {variant_id: quantity} đã được trừ kho của đơn (gọi trong transaction tạo đơn)."""
+    expires_at = timezone.now() + RESERVATION_TTL
+    StockReservation.objects.bulk_create([
+        StockReservation(order=order, variant_id=variant_id, quantity=quantity, expires_at=expires_at)
+        for variant_id, quantity in demand.items()
+    ])
+
+
+def held_quantities(variant_ids):
+    """{variant_id: số hàng đang được giữ chờ thanh toán} (tồn kho thực = quantity + số này)."""
+    return dict(
+        StockReservation.objects.filter(status=StockReservation.STATUS_HELD, variant_id__in=variant_ids)
+        .values_list('variant')
+        .annotate(total=Sum('quantity'))
+        .order_by()
+    )
+
+
+def _give_back(rows, status):
+    # rows: [(id, variant_id, quantity), ...] đã khóa; hoàn kho theo một câu lệnh rồi đổi trạng thái
+    demand = merge_lines((variant_id, quantity) for _, variant_id, quantity in rows)
+    stock_changed(ProductVariant.objects.filter(id__in=demand).values_list('product_id', flat=True))
+    increment_stock(demand)
+    StockReservation.objects.filter(id__in=[row[0] for row in rows]).update(status=status)
+
+
+def release_expired(batch_size=500):
+    """
+    Hoàn kho các giữ chỗ đã quá hạn, mỗi lô một transaction (SKIP LOCKED: nhiều sweeper chạy song song được,
+    không chặn IPN đang xác nhận cùng đơn). Trả về số giữ chỗ đã hoàn.
+    """
+    released = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                StockReservation.objects.select_for_update(skip_locked=True)
+                .filter(status=StockReservation.STATUS_HELD, expires_at__lte=timezone.now())
+                .order_by('expires_at')
+                .values_list('id', 'variant_id', 'quantity')[:batch_size]
+            )
+            if not rows:
+                return released
+            _give_back(rows, StockReservation.STATUS_EXPIRED)
+        released += len(rows)
+
+
+def release_order(order_id):
+    """Thanh toán thất bại: hoàn kho ngay mọi giữ chỗ còn 'held' của đơn."""
+    rows = list(
+        StockReservation.objects.select_for_update()
+        .filter(order_id=order_id, status=StockReservation.STATUS_HELD)
+        .values_list('id', 'variant_id', 'quantity')
+    )
+    if rows:
+        _give_back(rows, StockReservation.STATUS_RELEASED)
+
+
+def confirm_order(order_id):
+    """
+    IPN thành công: giữ chỗ 'held' -> 'confirmed'. Giữ chỗ đã hết hạn (hàng đã hoàn kho) thì trừ kho lại nếu còn hàng,
+    variant không còn đủ hàng được ghi nhận 'short' (đơn đã thanh toán nhưng thiếu hàng).
+    Trả về tập variant_id thiếu hàng (rỗng nếu mọi dòng đều giữ được hàng).
+    """
+    reservations = StockReservation.objects.filter(order_id=order_id)
+    reservations.filter(status=StockReservation.STATUS_HELD).update(status=StockReservation.STATUS_CONFIRMED)
+
+    expired = list(
+        reservations.select_for_update()
+        .filter(status=StockReservation.STATUS_EXPIRED)
+        .values_list('id', 'variant_id', 'quantity')
+    )
+    if not expired:
+        return set()
+    demand = merge_lines((variant_id, quantity) for _, variant_id, quantity in expired)
+    stock_changed(ProductVariant.objects.filter(id__in=demand).values_list('product_id', flat=True))
+
+    # Trừ kho lại các variant còn hàng: mỗi lần thử bỏ ra các variant thiếu hàng (tập demand giảm dần)
+    short = set()
+    while demand:
+        try:
+            with transaction.atomic():
+                missing = decrement_stock(demand)
+                if missing:
+                    raise _OutOfStock(missing)
+            break
+        except _OutOfStock as exc:
+            short |= exc.short
+            demand = {variant_id: qty for variant_id, qty in demand.items() if variant_id not in exc.short}
+
+    for status, ids in (
+        (StockReservation.STATUS_CONFIRMED, [row[0] for row in expired if row[1] not in short]),
+        (StockReservation.STATUS_SHORT, [row[0] for row in expired if row[1] in short]),
+    ):
+        if ids:
+            StockReservation.objects.filter(id__in=ids).update(status=status)
+    return short
+
+
+def cancel_line(order_id, variant_id, quantity):
+    """
+    Shop từ chối một dòng đơn: trả về số lượng người gọi cần hoàn kho (gọi trong transaction, trước restock).
+    - Không có giữ chỗ (COD): cả dòng.
+    - Giữ chỗ 'held' / 'confirmed' (hàng vẫn đang bị trừ): bớt số lượng của dòng khỏi giữ chỗ để sweeper
+      không hoàn kho lần nữa, hoàn cả dòng.
+    - Giữ chỗ 'expired' / 'released': sweeper / IPN thất bại đã hoàn kho rồi -> 0.
+    """
+    # Khóa giữ chỗ: không chạy đua với sweeper (SKIP LOCKED bỏ qua dòng này) hay IPN đang xác nhận đơn
+    reservation = (
+        StockReservation.objects.select_for_update()
+        .filter(order_id=order_id, variant_id=variant_id)
+        .first()
+    )
+    if reservation is None:
+        return quantity
+    if reservation.status not in (StockReservation.STATUS_HELD, StockReservation.STATUS_CONFIRMED):
+        return 0
+
+    # Một variant có thể nằm ở nhiều dòng của đơn (giữ chỗ được cộng dồn): chỉ bớt số lượng của dòng bị từ chối
+    if reservation.quantity > quantity:
+        StockReservation.objects.filter(id=reservation.id).update(quantity=F('quantity') - quantity)
+        return quantity
+    StockReservation.objects.filter(id=reservation.id).update(status=StockReservation.STATUS_RELEASED)
+    return reservation.quantity
+
+
+class _OutOfStock(Exception):
+    def __init__(self, short):
+        super().__init__(short)
+        self.short = short
@@ -3,6 +3,11 @@ from shop.models import Shop
 from .models import Order
 from .models import OrderDetail
 from product.models import Product , ProductVariant
+from product.invalidation import stock_changed
+from .inventory import merge_lines, reserve_stock
+from .reservations import hold_stock
+from product.derivatives import THUMB_SIZE
+from product.recommendations import invalidate_user_recommendations_on_commit
 from django.contrib.auth import get_user_model
 from django.db import transaction
 from django.db import transaction, IntegrityError
@@ -24,16 +29,9 @@ class OrderSerializer(serializers.ModelSerializer):
         fields = ["id", "user", "total_price", "created_at", "items", "full_name", "phone_number", "address", "note"]
 
 class NewOrderDetailSerializer(serializers.ModelSerializer):
-    product_id = serializers.PrimaryKeyRelatedField(
-        source="product", 
-        queryset=Product.objects.all()
-    )
-    variant_id = serializers.PrimaryKeyRelatedField(
-        source="variant", 
-        queryset=ProductVariant.objects.all(),
-        required=False, 
-        allow_null=True
-    )
+    # Chỉ nhận ID; sản phẩm / variant của cả giỏ được lấy một lần trong NewOrderSerializer.validate_items
+    product_id = serializers.IntegerField()
+    variant_id = serializers.IntegerField(required=False, allow_null=True)
     quantity = serializers.IntegerField(min_value=1)
 
     class Meta:
@@ -48,6 +46,33 @@ class NewOrderSerializer(serializers.ModelSerializer):
         model = Order
         fields = ["items", "payment_type", "full_name", "phone_number", "address", "note"]
 
+    def validate_items(self, items):
+        """Lấy toàn bộ Product (kèm Shop) và Variant của giỏ hàng bằng 2 truy vấn, gắn vào từng dòng."""
+        products = Product.objects.select_related('shop').in_bulk({item['product_id'] for item in items})
+        variants = ProductVariant.objects.in_bulk(
+            {item['variant_id'] for item in items if item.get('variant_id') is not None}
+        )
+
+        errors = []
+        for item in items:
+            error = {}
+            if item['product_id'] not in products:
+                error['product_id'] = [f'Invalid pk "{item["product_id"]}" - object does not exist.']
+            if item.get('variant_id') is not None and item['variant_id'] not in variants:
+                error['variant_id'] = [f'Invalid pk "{item["variant_id"]}" - object does not exist.']
+            errors.append(error)
+        if any(errors):
+            raise serializers.ValidationError(errors)
+
+        return [
+            {
+                'product': products[item['product_id']],
+                'variant': variants.get(item.get('variant_id')),
+                'quantity': item['quantity'],
+            }
+            for item in items
+        ]
+
     def create(self, validated_data):
         request = self.context.get("request")
         if not request or not request.user:
@@ -57,56 +82,31 @@ class NewOrderSerializer(serializers.ModelSerializer):
             return self._create_order(validated_data, request)
 
     def _create_order(self, validated_data, request):
-        total_order_price = 0
-        
+        """
+        Số truy vấn không phụ thuộc số dòng trong giỏ: tạo Order (đã có tổng tiền), bulk_create OrderDetail,
+        một câu trừ kho cho mọi variant; cache sản phẩm được làm mới sau commit (không ghi dòng Product).
+        """
         # Lấy payment_type từ dữ liệu đã validate
         payment_type = validated_data.get('payment_type', 'COD')
         items_data = validated_data.get('items')
 
-        full_name = validated_data.get('full_name')
-        phone_number = validated_data.get('phone_number')
-        address = validated_data.get('address')
-        note = validated_data.get('note')
-
-        # 1. Tạo Order cha
-        order = Order.objects.create(
-            user=request.user,
-            total_price=0,
-            full_name=full_name,
-            phone_number=phone_number,
-            address=address,
-            note=note,
-        )
-
-        # 2. Tạo Order Detail
+        # 1. Kiểm tra dòng hàng, tính tiền từng dòng và tổng đơn trước khi ghi
+        lines = []
+        details = []
+        total_order_price = Decimal(0)
         for item in items_data:
             product = item["product"]
-            variant = item.get("variant")
+            variant = item["variant"]
             quantity = item["quantity"]
-            shop = product.shop
-            base_unit_price = 0
 
-            # --- Logic xử lý kho và giá ---
             if variant:
                 if variant.product_id != product.id:
                     raise serializers.ValidationError(f"Biến thể '{variant.id}' không thuộc sản phẩm '{product.product_name}'")
-                
-                # Check kho variant
-                if variant.quantity < quantity:
-                    raise serializers.ValidationError(f"Phân loại '{variant.id}' không đủ hàng.")
-                
-                base_unit_price = variant.price
-                variant.quantity -= quantity
-                variant.save()
-            else:
-                # Check kho product
-                if getattr(product, 'quantity', 0) < quantity:
-                     raise serializers.ValidationError(f"Sản phẩm '{product.product_name}' không đủ hàng.")
-                
-                base_unit_price = product.base_price
-                product.quantity -= quantity
-                product.save()
-            # -----------------------------------------------------------
+                lines.append((variant.id, quantity))
+            elif getattr(product, 'quantity', 0) < quantity:
+                # Product không có cột tồn kho riêng: phải chọn variant
+                raise serializers.ValidationError(f"Sản phẩm '{product.product_name}' không đủ hàng.")
+            base_unit_price = variant.price if variant else product.base_price
 
             # Tính đơn giá sau giảm giá và tổng tiền cho dòng này
             discount_percent = product.discount if product.discount else 0
@@ -119,27 +119,48 @@ class NewOrderSerializer(serializers.ModelSerializer):
             line_total_price = discounted_unit_price * quantity
             total_order_price += line_total_price
 
-            # Tạo OrderDetail
             # LƯU Ý: Lưu price = tổng tiền dòng (line_total_price) để tương thích với frontend hiện tại
-            OrderDetail.objects.create(
-                order=order,
+            details.append(OrderDetail(
                 product=product,
                 variant=variant,
-                shop=shop,
+                shop=product.shop,
                 quantity=quantity,
                 price=line_total_price,
                 payment_type=payment_type,
                 order_status='pending',
-                payment_status='pending' 
-            )
+                payment_status='pending'
+            ))
+
+        # 2. Tạo Order cha (một lần ghi) và các Order Detail
+        order = Order.objects.create(
+            user=request.user,
+            total_price=total_order_price,
+            full_name=validated_data.get('full_name'),
+            phone_number=validated_data.get('phone_number'),
+            address=validated_data.get('address'),
+            note=validated_data.get('note'),
+        )
+        for detail in details:
+            detail.order = order
+        OrderDetail.objects.bulk_create(details)
+
+        # Tồn kho thay đổi -> làm mới cache response của các sản phẩm (sau commit, không khóa dòng Product)
+        stock_changed(item["product"].id for item in items_data)
+
+        # 3. Trừ kho của cả đơn bằng một câu lệnh (xem order.inventory). Làm sau cùng để
+        # khóa dòng variant (điểm tranh chấp khi flash sale) giữ trong thời gian ngắn nhất trước khi commit.
+        demand = merge_lines(lines)
+        reserve_stock(demand)
+        if payment_type != 'COD':
+            # Thanh toán online: giữ hàng đến hạn thanh toán, quá hạn thì hoàn kho (xem order.reservations)
+            hold_stock(order, demand)
 
-        # 3. Cập nhật tổng tiền Order
-        order.total_price = total_order_price
-        order.save()
-        
         # Lưu tạm payment_type vào object order để view sử dụng
         order._temp_payment_type = payment_type 
 
+        # Lịch sử mua thay đổi -> danh sách gợi ý của user cần tính lại
+        invalidate_user_recommendations_on_commit(request.user.id)
+
         return order
 
 class ShopOrderDetailSerializer(serializers.ModelSerializer):
@@ -182,7 +203,8 @@ class ShopOrderDetailSerializer(serializers.ModelSerializer):
         try:
             first_image = obj.product.images.first()
             if first_image:
-                return first_image.image_url
+                # Ảnh nhỏ trong danh sách đơn hàng: dùng bản thu nhỏ thay vì ảnh gốc
+                return first_image.derivative_url(THUMB_SIZE)
         except Exception:
             return None
         return ""
@@ -215,7 +237,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
     @extend_schema_field(OpenApiTypes.STR)
     def get_product_image(self, obj):
         try:
-            return obj.product.images.first().image_url
+            return obj.product.images.first().derivative_url(THUMB_SIZE)
         except:
             return ""
     @extend_schema_field(serializers.DictField)
@@ -1,3 +1,258 @@
-from django.test import TestCase
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from datetime import timedelta
+
+from django.contrib.auth.models import Group
+from django.db import DatabaseError, IntegrityError, OperationalError, close_old_connections, connection
+from django.test import SimpleTestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework import serializers, status
+from rest_framework.test import APITestCase
+
+from category.models import Category
+from product.models import Product, ProductVariant
+from shop.models import Shop
+from user.models import User
+from .idempotency import MAX_CLAIM_ATTEMPTS, request_hash
+from .inventory import merge_lines
+from .models import IdempotencyKey, Order, OrderDetail, StockReservation
+from .reservations import confirm_order, release_expired, release_order
+from .serializers import NewOrderSerializer
+
+# Số truy vấn của POST /api/orders/ (COD), không phụ thuộc số dòng trong giỏ
+QUERIES_PER_ORDER = 16
+
+
+class MergeLinesTest(SimpleTestCase):
+
+    def test_same_variant_is_summed(self):
+        self.assertEqual(merge_lines([(7, 1), (3, 2), (7, 4)]), {7: 5, 3: 2})
+
+    def test_empty_order(self):
+        self.assertEqual(merge_lines([]), {})
+
+
+class ConcurrentOrderTest(TransactionTestCase):
+    STOCK = 10
+
+    def setUp(self):
+        self.buyer = User.objects.create_user(username='buyer', email='buyer@example.com', password='p')
+        shop = Shop.objects.create(shop_name='S', shop_email='shop@example.com', owner=self.buyer)
+        category = Category.objects.create(category_name='C')
+        self.product = Product.objects.create(
+            product_name='P', description='', base_price=1000, category=category, shop=shop
+        )
+        self.variants = [
+            ProductVariant.objects.create(product=self.product, price=1000, quantity=self.STOCK, attributes={'n': n})
+            for n in range(2)
+        ]
+
+    def _place_order(self, n):
+        close_old_connections()
+        # Mỗi đơn lấy cả 2 variant, thứ tự dòng đảo ngược xen kẽ
+        variants = self.variants if n % 2 else self.variants[::-1]
+        serializer = NewOrderSerializer(data={
+            'items': [{'product_id': self.product.id, 'variant_id': v.id, 'quantity': 3} for v in variants],
+            'payment_type': 'COD', 'full_name': 'a', 'phone_number': '0', 'address': '-', 'note': '-',
+        }, context={'request': SimpleNamespace(user=self.buyer)})
+        try:
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+            return 'committed'
+        except serializers.ValidationError:
+            return 'rejected'
+        except DatabaseError:
+            return 'errors'
+        finally:
+            close_old_connections()
+
+    def test_stock_never_negative(self):
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(self._place_order, range(12)))
+
+        for variant in self.variants:
+            variant.refresh_from_db()
+            sold = sum(OrderDetail.objects.filter(variant=variant).values_list('quantity', flat=True))
+            self.assertGreaterEqual(variant.quantity, 0)
+            self.assertEqual(self.STOCK - variant.quantity, sold)
+        if connection.vendor == 'postgresql':
+            # Khóa variant theo thứ tự id: không deadlock dù thứ tự dòng trong đơn khác nhau
+            # (SQLite khóa cả database, luồng chờ quá lâu có thể lỗi "database is locked")
+            self.assertNotIn('errors', results)
+            self.assertEqual(results.count('committed'), self.STOCK // 3)
+
+
+class OrderQueryCountTest(APITestCase):
+
+    def setUp(self):
+        self.buyer = User.objects.create_user(username='buyer', email='buyer@example.com', password='p')
+        shop = Shop.objects.create(shop_name='S', shop_email='shop@example.com', owner=self.buyer)
+        category = Category.objects.create(category_name='C')
+        self.lines = []
+        for n in range(20):
+            product = Product.objects.create(
+                product_name=f'P{n}', description='', base_price=1000, category=category, shop=shop
+            )
+            variant = ProductVariant.objects.create(product=product, price=1000, quantity=5, attributes={})
+            self.lines.append({'product_id': product.id, 'variant_id': variant.id, 'quantity': 1})
+        self.client.force_authenticate(self.buyer)
+
+    def _post(self, lines):
+        return self.client.post('/api/orders/', {
+            'items': lines, 'payment_type': 'COD',
+            'full_name': 'a', 'phone_number': '0', 'address': '-', 'note': '-',
+        }, format='json')
+
+    def test_query_count_does_not_depend_on_cart_size(self):
+        """Giỏ 1 dòng và 20 dòng tốn cùng số truy vấn."""
+        for lines in (self.lines[:1], self.lines):
+            with self.subTest(lines=len(lines)), self.assertNumQueries(QUERIES_PER_ORDER):
+                response = self._post(lines)
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+
+class RejectOrderStockTest(APITestCase):
+    STOCK = 10
+
+    def setUp(self):
+        seller = User.objects.create_user(username='seller', email='seller@example.com', password='p')
+        seller.groups.add(Group.objects.create(name='Seller'))
+        self.buyer = User.objects.create_user(username='buyer', email='buyer@example.com', password='p')
+        shop = Shop.objects.create(shop_name='S', shop_email='shop@example.com', owner=seller)
+        category = Category.objects.create(category_name='C')
+        self.product = Product.objects.create(
+            product_name='P', description='', base_price=1000, category=category, shop=shop
+        )
+        self.variant = ProductVariant.objects.create(
+            product=self.product, price=1000, quantity=self.STOCK, attributes={}
+        )
+        self.client.force_authenticate(seller)
+
+    def _order(self, payment_type='VNPAY'):
+        serializer = NewOrderSerializer(data={
+            'items': [{'product_id': self.product.id, 'variant_id': self.variant.id, 'quantity': 2}],
+            'payment_type': payment_type, 'full_name': 'a', 'phone_number': '0', 'address': '-', 'note': '-',
+        }, context={'request': SimpleNamespace(user=self.buyer)})
+        serializer.is_valid(raise_exception=True)
+        return serializer.save()
+
+    def _reject(self, order):
+        detail = order.items.get()
+        response = self.client.delete(f'/api/shops/my-shop/orders/{detail.id}/reject/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.variant.refresh_from_db()
+        return self.variant.quantity
+
+    def test_expired_hold_is_not_restocked_twice(self):
+        order = self._order()
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(release_expired(), 1)
+        self.assertEqual(self._reject(order), self.STOCK)
+
+    def test_released_hold_is_not_restocked_twice(self):
+        order = self._order()
+        release_order(order.id)
+        self.assertEqual(self._reject(order), self.STOCK)
+
+    def test_confirmed_hold_is_restocked(self):
+        order = self._order()
+        self.assertEqual(confirm_order(order.id), set())
+        self.assertEqual(self._reject(order), self.STOCK)
+
+    def test_late_payment_without_stock_is_recorded(self):
+        order = self._order()
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        release_expired()
+        ProductVariant.objects.filter(id=self.variant.id).update(quantity=1)
+
+        self.assertEqual(confirm_order(order.id), {self.variant.id})
+        self.assertEqual(StockReservation.objects.get().status, StockReservation.STATUS_SHORT)
+        # Hàng chưa từng được trừ lại: từ chối dòng không hoàn kho
+        self.assertEqual(self._reject(order), 1)
+
+    def test_held_and_cod_lines_are_restocked(self):
+        self.assertEqual(self._reject(self._order()), self.STOCK)
+        self.assertEqual(self._reject(self._order('COD')), self.STOCK)
+
+
+class IdempotentOrderTest(APITestCase):
+
+    def setUp(self):
+        self.buyer = User.objects.create_user(username='buyer', email='buyer@example.com', password='p')
+        shop = Shop.objects.create(shop_name='S', shop_email='shop@example.com', owner=self.buyer)
+        category = Category.objects.create(category_name='C')
+        product = Product.objects.create(
+            product_name='P', description='', base_price=1000, category=category, shop=shop
+        )
+        self.variant = ProductVariant.objects.create(product=product, price=1000, quantity=5, attributes={})
+        self.body = {
+            'items': [{'product_id': product.id, 'variant_id': self.variant.id, 'quantity': 1}],
+            'payment_type': 'COD', 'full_name': 'a', 'phone_number': '0', 'address': '-', 'note': '-',
+        }
+        self.client.force_authenticate(self.buyer)
+
+    def _post(self, body, key='key-1'):
+        return self.client.post('/api/orders/', body, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_replay(self):
+        first = self._post(self.body)
+        second = self._post(self.body)
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(second.data['order_id'], first.data['order_id'])
+        self.assertEqual(Order.objects.count(), 1)
+        self.variant.refresh_from_db()
+        self.assertEqual(self.variant.quantity, 4)
+
+    def test_different_body_is_rejected(self):
+        self._post(self.body)
+        response = self._post({**self.body, 'note': 'khác'})
+
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_transient_error_is_not_stored(self):
+        with mock.patch('order.serializers.reserve_stock', side_effect=OperationalError('deadlock detected')):
+            failed = self._post(self.body)
+        self.assertEqual(failed.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        # Gửi lại cùng khóa: xử lý như request mới
+        retried = self._post(self.body)
+        self.assertEqual(retried.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('Idempotent-Replayed', retried)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_out_of_stock_is_stored(self):
+        body = {**self.body, 'items': [{**self.body['items'][0], 'quantity': 6}]}
+        self.assertEqual(self._post(body).status_code, status.HTTP_400_BAD_REQUEST)
+        replayed = self._post(body)
+        self.assertEqual(replayed.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(replayed['Idempotent-Replayed'], 'true')
+
+    def test_key_never_claimed_returns_conflict(self):
+        """Khóa bị chiếm rồi rollback liên tục: thử lại có giới hạn rồi trả 409, không đệ quy."""
+        with mock.patch.object(IdempotencyKey.objects, 'create', side_effect=IntegrityError('duplicate key')) as create:
+            response = self._post(self.body)
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(create.call_count, MAX_CLAIM_ATTEMPTS)
+        self.assertEqual(Order.objects.count(), 0)
+
+
+class RequestHashTest(SimpleTestCase):
+
+    def test_key_order_does_not_matter(self):
+        first = SimpleNamespace(data={'note': 'n', 'items': [{'product_id': 1, 'quantity': 2}]})
+        second = SimpleNamespace(data={'items': [{'quantity': 2, 'product_id': 1}], 'note': 'n'})
+        self.assertEqual(request_hash(first), request_hash(second))
+
+    def test_different_body(self):
+        self.assertNotEqual(
+            request_hash(SimpleNamespace(data={'items': [{'product_id': 1, 'quantity': 2}]})),
+            request_hash(SimpleNamespace(data={'items': [{'product_id': 1, 'quantity': 3}]})),
+        )
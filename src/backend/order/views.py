@@ -9,9 +9,10 @@ from drf_spectacular.utils import  extend_schema, inline_serializer, OpenApiPara
 from rest_framework import serializers
 from .models import Order, OrderDetail
 from .permissions import IsSeller
+from .idempotency import IDEMPOTENCY_HEADER, idempotent
 from shop.models import Shop
 from payment.models import PaymentTransaction
-from django.db import transaction
+from django.db import DatabaseError, transaction
 from payment.payment_factory import PaymentFactory
 
 
@@ -29,7 +30,20 @@ from payment.payment_factory import PaymentFactory
     tags=['Order'],
     methods=['POST'],
     summary="Tạo đơn hàng mới",
-    description="User gửi danh sách sản phẩm để tạo đơn. Hỗ trợ thanh toán COD và VNPAY.",
+    description=(
+        "User gửi danh sách sản phẩm để tạo đơn. Hỗ trợ thanh toán COD và VNPAY. "
+        "Gửi kèm header Idempotency-Key (duy nhất cho mỗi lần đặt) để gửi lại an toàn khi timeout: "
+        "request lặp lại trả về đúng response lần đầu (header Idempotent-Replayed: true), không tạo đơn mới."
+    ),
+    parameters=[
+        OpenApiParameter(
+            name=IDEMPOTENCY_HEADER,
+            type=OpenApiTypes.STR,
+            location=OpenApiParameter.HEADER,
+            required=False,
+            description='Khóa do client sinh (vd: UUID), giữ nguyên khi gửi lại cùng một đơn'
+        ),
+    ],
     request=NewOrderSerializer,
     responses={
         200: inline_serializer(
@@ -53,6 +67,18 @@ from payment.payment_factory import PaymentFactory
         400: inline_serializer(
             name='OrderCreateError',
             fields={'message': serializers.CharField(), 'error_detail': serializers.CharField()}
+        ),
+        409: inline_serializer(
+            name='IdempotencyKeyBusy',
+            fields={'error': serializers.CharField()}
+        ),
+        422: inline_serializer(
+            name='IdempotencyKeyReused',
+            fields={'error': serializers.CharField()}
+        ),
+        503: inline_serializer(
+            name='OrderCreateRetry',
+            fields={'message': serializers.CharField(), 'error_detail': serializers.CharField()}
         )
     }
 )
@@ -65,7 +91,8 @@ def order_api(request):
         return get_order_history(request)    
         
     elif request.method == 'POST':
-        return create_new_order(request)
+        # Gửi lại cùng Idempotency-Key -> trả lại response lần đầu, không tạo đơn mới
+        return idempotent(request, lambda: create_new_order(request))
 
 def get_order_history(request):
     try:
@@ -119,11 +146,18 @@ def create_new_order(request):
                 }, status=status.HTTP_201_CREATED)
 
 
-        except Exception as e:
+        except serializers.ValidationError as e:
+            # Lỗi dữ liệu / hết hàng: gửi lại cùng request vẫn lỗi như vậy (được lưu theo Idempotency-Key)
             return Response({
                 'message': 'Tạo đơn hàng thất bại', 
                 'error_detail': str(e)
             }, status=status.HTTP_400_BAD_REQUEST)
+        except DatabaseError as e:
+            # Deadlock / hết thời gian chờ khóa...: lỗi tạm thời, 5xx để client gửi lại (không lưu theo Idempotency-Key)
+            return Response({
+                'message': 'Hệ thống đang bận, vui lòng thử lại.',
+                'error_detail': str(e)
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
             
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -1,5 +1,6 @@
 import hashlib
 import hmac
+import logging
 import requests
 from datetime import datetime
 from django.conf import settings
@@ -9,6 +10,7 @@ from rest_framework import status
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from .vnpay import VNPAYProvider 
 from order.models import Order
+from order.reservations import confirm_order, release_order
 from decimal import Decimal
 from django.db import transaction
 from rest_framework.permissions import IsAuthenticated
@@ -18,6 +20,8 @@ import pytz
 from ...models import PaymentTransaction
 from payment.utils import get_client_ip
 
+logger = logging.getLogger(__name__)
+
 class VNPAYIPNView(APIView):
     """
     API này để VNPAY gọi server-to-server (Callback) báo kết quả giao dịch.
@@ -57,44 +61,59 @@ class VNPAYIPNView(APIView):
             vnp_TransactionNo = inputData.get('vnp_TransactionNo')
             
             if vnp.validate_response(settings.VNPAY_HASH_SECRET_KEY):
-                try:
-                    order = Order.objects.get(id=order_id)
-                    pay_trans = PaymentTransaction.objects.get(transaction_no=order_id)
-                except (Order.DoesNotExist, PaymentTransaction.DoesNotExist):
-                    return Response({'RspCode': '01', 'Message': 'Order or Transaction not found'})
-
-                # Kiểm tra số tiền
-                vnp_amount_decimal = Decimal(vnp_amount) / 100
-                if order.total_price != vnp_amount_decimal:
-                    return Response({'RspCode': '04', 'Message': 'Invalid amount'})
-
-                # Kiểm tra xem đã xử lý trước đó chưa
-                if pay_trans.status != PaymentTransaction.PaymentStatus.PENDING:
-                    return Response({'RspCode': '02', 'Message': 'Order Already Updated'})
-
-                # Xử lý kết quả
-                if vnp_ResponseCode == '00':
+                with transaction.atomic():
                     try:
+                        order = Order.objects.get(id=order_id)
+                        # Khóa giao dịch: VNPAY gửi lại / gửi đồng thời cùng một IPN thì chỉ lần đầu được xử lý,
+                        # các lần sau chờ lần đầu commit rồi thấy trạng thái đã cập nhật
+                        pay_trans = PaymentTransaction.objects.select_for_update().get(transaction_no=order_id)
+                    except (Order.DoesNotExist, PaymentTransaction.DoesNotExist):
+                        return Response({'RspCode': '01', 'Message': 'Order or Transaction not found'})
+
+                    # Kiểm tra số tiền
+                    vnp_amount_decimal = Decimal(vnp_amount) / 100
+                    if order.total_price != vnp_amount_decimal:
+                        return Response({'RspCode': '04', 'Message': 'Invalid amount'})
+
+                    # Kiểm tra xem đã xử lý trước đó chưa
+                    if pay_trans.status != PaymentTransaction.PaymentStatus.PENDING:
+                        return Response({'RspCode': '02', 'Message': 'Order Already Updated'})
+
+                    # Xử lý kết quả
+                    if vnp_ResponseCode == '00':
+                        try:
+                            with transaction.atomic():
+                                # 1. Cập nhật trạng thái thanh toán trên đơn hàng
+                                order.items.all().update(payment_status='paid')
+
+                                # Hàng đang giữ chờ thanh toán -> đã bán. Giữ chỗ đã hết hạn mà hết hàng
+                                # được lưu trạng thái 'short' (StockReservation) để hoàn tiền / bổ sung hàng
+                                short = confirm_order(order.id)
+                                if short:
+                                    logger.warning(
+                                        "Đơn %s đã thanh toán sau khi hết hạn giữ hàng, thiếu hàng variant %s",
+                                        order.id, sorted(short)
+                                    )
+
+                                # 2. Cập nhật bản ghi Transaction
+                                pay_trans.status = PaymentTransaction.PaymentStatus.SUCCESS
+                                pay_trans.vnp_transaction_no = vnp_TransactionNo
+                                pay_trans.raw_response = inputData.dict()
+                                pay_trans.save()
+
+                            return Response({'RspCode': '00', 'Message': 'Confirm Success'})
+                        except Exception as e:
+                            return Response({'RspCode': '99', 'Message': str(e)})
+                    else:
                         with transaction.atomic():
-                            # 1. Cập nhật trạng thái thanh toán trên đơn hàng
-                            order.items.all().update(payment_status='paid')
-
-                            # 2. Cập nhật bản ghi Transaction
-                            pay_trans.status = PaymentTransaction.PaymentStatus.SUCCESS
+                            pay_trans.status = PaymentTransaction.PaymentStatus.FAILED
                             pay_trans.vnp_transaction_no = vnp_TransactionNo
                             pay_trans.raw_response = inputData.dict()
                             pay_trans.save()
-
-                        return Response({'RspCode': '00', 'Message': 'Confirm Success'})
-                    except Exception as e:
-                        return Response({'RspCode': '99', 'Message': str(e)})
-                else:
-                    pay_trans.status = PaymentTransaction.PaymentStatus.FAILED
-                    pay_trans.vnp_transaction_no = vnp_TransactionNo
-                    pay_trans.raw_response = inputData.dict()
-                    pay_trans.save()
+                            # Thanh toán thất bại: trả hàng đang giữ về kho ngay
+                            release_order(order.id)
                     
-                    return Response({'RspCode': '00', 'Message': 'Confirm Success'})
+                        return Response({'RspCode': '00', 'Message': 'Confirm Success'})
             else:
                 return Response({'RspCode': '97', 'Message': 'Invalid Checksum'})
         return Response({'RspCode': '99', 'Message': 'Invalid request'})
@@ -53,7 +53,7 @@ class VNPAYProvider(PaymentProvider):
         curr_date = datetime.now(tz_vietnam)
         vnp_params['vnp_CreateDate'] = curr_date.strftime('%Y%m%d%H%M%S')
         
-        expire_date = curr_date + timedelta(minutes=15)
+        expire_date = curr_date + timedelta(minutes=settings.VNPAY_PAYMENT_TIMEOUT_MINUTES)
         vnp_params['vnp_ExpireDate'] = expire_date.strftime('%Y%m%d%H%M%S')
 
         # 3. Thông tin mạng (IP khách hàng)
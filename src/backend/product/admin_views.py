@@ -6,6 +6,10 @@ from rest_framework.response import Response
 from rest_framework import status
 from product.models import Product
 from product.serializers import ProductSerializer, ProductVariantSerializer, ProductImageSerializer
+from product.invalidation import product_changed
+from product.recommendations import recommendation_metrics
+from django.core.cache import caches
+from backend.response_cache import RESPONSE_CACHE_ALIAS
 from drf_spectacular.utils import extend_schema, OpenApiParameter, inline_serializer
 from rest_framework import serializers
 from rest_framework.permissions import IsAdminUser
@@ -22,7 +26,7 @@ from rest_framework.permissions import IsAdminUser
 @renderer_classes([JSONRenderer])
 def get_products(request):
     try:
-        products = Product.objects.filter(is_active = False)
+        products = Product.objects.filter(is_active = False).select_related('sales')
         serializer = ProductSerializer(products, many = True)
         return Response(serializer.data, status = status.HTTP_200_OK)
     except Exception as e:
@@ -67,9 +71,36 @@ def get_product(request, product_id):
 def approve_product(request, product_id):
     try:
         Product.objects.filter(id = product_id).update(is_active = True)
+        product_changed(product_id)
         product = Product.objects.get(id = product_id)
         serializer = ProductSerializer(product)
         return Response(serializer.data, status = status.HTTP_200_OK)
     except Exception as e:
         return Response({"error":str(e)}, status=status.HTTP_200_OK)
-    
\ No newline at end of file
+    
+
+@extend_schema(
+    tags=['Admin - Product'],
+    summary="Thống kê cache gợi ý sản phẩm",
+    description="Tỉ lệ cache hit của danh sách gợi ý theo user, thời gian tính lại (ms) và bộ đếm của cache 2 tầng. Số liệu của worker xử lý request.",
+    responses={
+        200: inline_serializer(
+            name='RecommendationMetrics',
+            fields={
+                'recommendations': serializers.DictField(),
+                'cache': serializers.DictField(),
+            }
+        )
+    }
+)
+@api_view(['GET'])
+@authentication_classes([JWTAuthentication])
+@permission_classes([IsAdminUser])
+@renderer_classes([JSONRenderer])
+def get_recommendation_metrics(request):
+    # Bộ đếm của cache 2 tầng chứa response public (cache 'default' là cache thường, không có stats)
+    cache_stats = getattr(caches[RESPONSE_CACHE_ALIAS], 'stats', None)
+    return Response({
+        'recommendations': recommendation_metrics(),
+        'cache': cache_stats() if cache_stats else {},
+    }, status=status.HTTP_200_OK)
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ProductConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'product'
+
+    def ready(self):
+        # Xóa ảnh -> xếp file trên storage vào hàng đợi dọn dẹp
+        from .storage_gc import connect_signals
+        connect_signals()
@@ -0,0 +1,63 @@
+# Khử trùng lặp ảnh theo nội dung: mỗi file trên storage là một ImageBlob định danh bằng SHA-256,
+# ProductImage trỏ tới blob và đếm tham chiếu (ref_count).
+# Upload lại ảnh đã có chỉ tốn một lần tính hash (đã làm khi nhận file, xem product.ingest) và một lần tra index,
+# không ghi file tạm, không gọi API storage, không sinh lại ảnh thu nhỏ.
+# Giảm tham chiếu / xóa blob khi xóa ảnh nằm ở product.storage_gc.release_blob.
+import hashlib
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import ImageBlob
+
+
+def upload_digest(image_file):
+    """SHA-256 của file upload: lấy từ upload handler nếu đã tính, nếu không thì đọc theo chunk."""
+    digest = getattr(image_file, 'sha256', None)
+    if digest:
+        return digest
+    hasher = hashlib.sha256()
+    for chunk in image_file.chunks():
+        hasher.update(chunk)
+    image_file.seek(0)
+    return hasher.hexdigest()
+
+
+def acquire_blob(digest):
+    """
+    Tăng ref_count của blob có nội dung digest và trả về blob, hoặc None nếu chưa có.
+    Khóa dòng blob (gọi trong transaction) để không chạy đua với release_blob xóa blob về 0.
+    """
+    blob = ImageBlob.objects.select_for_update().filter(digest=digest).first()
+    if blob is not None:
+        ImageBlob.objects.filter(id=blob.id).update(ref_count=F('ref_count') + 1)
+        blob.ref_count += 1
+    return blob
+
+
+def register_blob(digest, image_url, file_id, derivatives):
+    """
+    Ghi nhận file vừa tải lên storage cho nội dung digest (gọi trong transaction).
+    Trả về (blob, created); created=False nghĩa là nội dung này đã có blob khác
+    (hai ảnh giống nhau tải lên cùng lúc) -> người gọi tự dọn file vừa tải.
+    """
+    blob = acquire_blob(digest)
+    if blob is not None:
+        return blob, False
+    try:
+        with transaction.atomic():
+            return ImageBlob.objects.create(
+                digest=digest, image_url=image_url, file_id=file_id,
+                derivatives=derivatives, ref_count=1
+            ), True
+    except IntegrityError:
+        # Worker khác vừa tạo blob cùng digest
+        return acquire_blob(digest), False
+
+
+def apply_blob(image, blob):
+    """Chép thông tin file của blob sang ProductImage (các API đọc ảnh không cần join blob)."""
+    image.blob = blob
+    image.image_url = blob.image_url
+    image.file_id = blob.file_id
+    image.derivatives = blob.derivatives
@@ -0,0 +1,191 @@
+# Nhập sản phẩm hàng loạt từ file CSV / JSONL.
+# File được đọc tuần tự từng dòng (không nạp cả file vào bộ nhớ), validate và ghi theo từng lô
+# (bulk_create cho Product / ProductVariant / ProductImage), dòng lỗi được ghi vào báo cáo thay vì dừng cả file.
+import csv
+import io
+import json
+from itertools import islice
+
+from django.db import transaction
+from rest_framework import serializers
+
+from category.models import Category
+from .models import Product, ProductImage, ProductVariant
+from .serializers import ProductVariantSerializer
+from .search import build_search_vector
+from .pricing import update_effective_prices
+from .invalidation import products_imported
+
+CSV_FORMAT = 'csv'
+JSONL_FORMAT = 'jsonl'
+IMPORT_FORMATS = (CSV_FORMAT, JSONL_FORMAT)
+
+# Số dòng được validate và ghi trong một transaction
+DEFAULT_CHUNK_SIZE = 500
+# Số dòng lỗi tối đa giữ trong báo cáo (error_count vẫn đếm đủ)
+MAX_REPORTED_ERRORS = 1000
+# Cột ảnh trong CSV: nhiều URL cách nhau bởi '|'
+CSV_IMAGE_SEPARATOR = '|'
+
+
+class BulkProductRowSerializer(serializers.Serializer):
+    """
+    Một dòng dữ liệu nhập. context['category_ids'] là tập ID danh mục hợp lệ
+    (nạp một lần cho cả file thay vì truy vấn từng dòng).
+    """
+    product_name = serializers.CharField(max_length=250)
+    description = serializers.CharField(allow_blank=True, required=False, default='')
+    base_price = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=0)
+    discount = serializers.IntegerField(min_value=0, max_value=100, required=False, default=0)
+    category = serializers.IntegerField()
+    is_active = serializers.BooleanField(required=False, default=True)
+    variants = ProductVariantSerializer(many=True, required=False)
+    # URL ảnh đã upload (http/https) hoặc đường dẫn trên storage local (/media/...)
+    image_urls = serializers.ListField(
+        child=serializers.CharField(max_length=500), required=False, default=list
+    )
+
+    def validate_category(self, value):
+        if value not in self.context['category_ids']:
+            raise serializers.ValidationError("Danh mục không tồn tại.")
+        return value
+
+    def validate_image_urls(self, value):
+        for url in value:
+            if not url.startswith(('http://', 'https://', '/')):
+                raise serializers.ValidationError(f"Đường dẫn ảnh không hợp lệ: {url}")
+        return value
+
+
+def detect_format(file_name, requested=None):
+    """Định dạng file theo tham số format, nếu không có thì theo phần mở rộng."""
+    fmt = (requested or file_name.rsplit('.', 1)[-1]).lower()
+    if fmt == 'ndjson':
+        fmt = JSONL_FORMAT
+    if fmt not in IMPORT_FORMATS:
+        raise serializers.ValidationError({'format': f"Chỉ hỗ trợ: {', '.join(IMPORT_FORMATS)}."})
+    return fmt
+
+
+def _csv_row(row):
+    # Ô trống = không có giá trị (dùng mặc định); variants là chuỗi JSON, image_urls cách nhau bởi '|'
+    data = {key.strip(): value for key, value in row.items() if key and value not in (None, '')}
+    if 'variants' in data:
+        try:
+            data['variants'] = json.loads(data['variants'])
+        except json.JSONDecodeError:
+            raise serializers.ValidationError({'variants': "Dữ liệu JSON không hợp lệ."})
+    if 'image_urls' in data:
+        data['image_urls'] = [url.strip() for url in data['image_urls'].split(CSV_IMAGE_SEPARATOR) if url.strip()]
+    return data
+
+
+def iter_rows(binary_file, fmt):
+    """
+    Đọc tuần tự file nhị phân, yield (số dòng, dict dữ liệu hoặc ValidationError).
+    Số dòng tính theo file gốc (CSV: dòng 1 là header) để người bán dễ đối chiếu.
+    """
+    text = io.TextIOWrapper(binary_file, encoding='utf-8-sig', newline='' if fmt == CSV_FORMAT else None)
+    try:
+        if fmt == CSV_FORMAT:
+            reader = csv.DictReader(text)
+            for row in reader:
+                try:
+                    yield reader.line_num, _csv_row(row)
+                except serializers.ValidationError as exc:
+                    yield reader.line_num, exc
+            return
+
+        for line_no, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError:
+                yield line_no, serializers.ValidationError({'non_field_errors': ["Dòng không phải JSON hợp lệ."]})
+                continue
+            if not isinstance(data, dict):
+                yield line_no, serializers.ValidationError({'non_field_errors': ["Mỗi dòng phải là một object JSON."]})
+                continue
+            yield line_no, data
+    finally:
+        # Không đóng file gốc (do caller quản lý)
+        text.detach()
+
+
+def _write_chunk(shop, rows):
+    """Ghi một lô dòng đã validate. Trả về danh sách ID sản phẩm đã tạo."""
+    products = Product.objects.bulk_create([
+        Product(
+            shop=shop,
+            product_name=data['product_name'],
+            description=data['description'],
+            base_price=data['base_price'],
+            discount=data['discount'],
+            category_id=data['category'],
+            is_active=data['is_active'],
+        )
+        for data in rows
+    ])
+
+    variants, images = [], []
+    for product, data in zip(products, rows):
+        # Giống tạo sản phẩm đơn lẻ: không có variant thì tạo variant mặc định theo base_price
+        for variant in data.get('variants') or [{'price': product.base_price, 'quantity': 0}]:
+            variants.append(ProductVariant(product=product, **variant))
+        for order, url in enumerate(data['image_urls']):
+            images.append(ProductImage(product=product, image_url=url, order=order))
+
+        product.search_vector = build_search_vector(product.product_name, product.description)
+
+    ProductVariant.objects.bulk_create(variants, batch_size=1000)
+    ProductImage.objects.bulk_create(images, batch_size=1000)
+    Product.objects.bulk_update(products, ['search_vector'], batch_size=500)
+
+    product_ids = [product.id for product in products]
+    update_effective_prices(product_ids)
+    return product_ids
+
+
+def import_products(shop, binary_file, fmt, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Nhập sản phẩm cho shop từ file (đã mở ở chế độ nhị phân).
+    Mỗi lô chunk_size dòng được ghi trong một transaction riêng: dòng lỗi bị bỏ qua và ghi vào báo cáo,
+    các dòng hợp lệ vẫn được tạo.
+    Trả về {'total_rows', 'created', 'error_count', 'errors': [{'row', 'errors'}, ...]}.
+    """
+    # Dùng lại một serializer cho mọi dòng (tạo serializer mới mỗi dòng phải deepcopy toàn bộ field)
+    row_serializer = BulkProductRowSerializer(
+        context={'category_ids': set(Category.objects.values_list('id', flat=True))}
+    )
+    report = {'total_rows': 0, 'created': 0, 'error_count': 0, 'errors': []}
+
+    def add_error(line_no, detail):
+        report['error_count'] += 1
+        if len(report['errors']) < MAX_REPORTED_ERRORS:
+            report['errors'].append({'row': line_no, 'errors': detail})
+
+    rows = iter_rows(binary_file, fmt)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        report['total_rows'] += len(chunk)
+
+        valid = []
+        for line_no, data in chunk:
+            if isinstance(data, serializers.ValidationError):
+                add_error(line_no, data.detail)
+                continue
+            try:
+                valid.append(row_serializer.run_validation(data))
+            except serializers.ValidationError as exc:
+                add_error(line_no, exc.detail)
+
+        if valid:
+            with transaction.atomic():
+                product_ids = _write_chunk(shop, valid)
+                products_imported(product_ids)
+            report['created'] += len(product_ids)
+
+    return report
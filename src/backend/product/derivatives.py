@@ -0,0 +1,71 @@
+# Sinh ảnh kích thước cố định (thumb / card / full) định dạng WebP + JPEG từ ảnh gốc bằng Pillow.
+# Module này chỉ dùng Pillow (không import model Django) để chạy được trong process con của ProcessPoolExecutor.
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageOps
+
+# Tên kích thước -> cạnh dài tối đa (px), sắp từ lớn đến nhỏ để thu nhỏ nối tiếp
+DERIVATIVE_SIZES = {
+    'full': 1200,
+    'card': 400,
+    'thumb': 128,
+}
+DERIVATIVE_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+# Kích thước dùng cho ảnh nhỏ trong đơn hàng / thẻ sản phẩm
+THUMB_SIZE = 'thumb'
+CARD_SIZE = 'card'
+
+_pool = None
+
+
+def get_derivative_pool(processes=None):
+    """ProcessPoolExecutor dùng chung trong process hiện tại (mặc định số CPU)."""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=processes or os.cpu_count())
+    return _pool
+
+
+def _to_rgb(image):
+    # JPEG không có kênh alpha: ghép lên nền trắng
+    if image.mode == 'RGBA':
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image
+
+
+def render_derivatives(source, max_pixels=None):
+    """
+    source: đường dẫn file hoặc bytes của ảnh gốc.
+    Trả về {size: {'width', 'height', 'webp': bytes, 'jpeg': bytes}}.
+    Ảnh nhỏ hơn kích thước đích không bị phóng to.
+    max_pixels: từ chối ảnh lớn hơn (kiểm tra từ header, trước khi giải mã).
+    """
+    with Image.open(source if isinstance(source, str) else io.BytesIO(source)) as original:
+        if max_pixels and original.width * original.height > max_pixels:
+            raise ValueError(f"Ảnh quá lớn ({original.width}x{original.height}).")
+        # JPEG: giải mã ở độ phân giải thấp hơn khi có thể (nhanh hơn và ít bộ nhớ hơn)
+        largest = max(DERIVATIVE_SIZES.values())
+        original.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ('RGB', 'RGBA'):
+            has_alpha = image.mode in ('LA', 'PA') or 'transparency' in image.info
+            image = image.convert('RGBA' if has_alpha else 'RGB')
+
+        results = {}
+        for name, edge in DERIVATIVE_SIZES.items():
+            image = image.copy()
+            image.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+            rendered = {'width': image.width, 'height': image.height}
+            for fmt, (pil_format, options) in DERIVATIVE_FORMATS.items():
+                buffer = io.BytesIO()
+                (image if pil_format == 'WEBP' else _to_rgb(image)).save(buffer, pil_format, **options)
+                rendered[fmt] = buffer.getvalue()
+            results[name] = rendered
+        return results
@@ -0,0 +1,92 @@
+from django.db import transaction
+from django.db.models import Avg, Count, Q
+
+from .models import Product, ProductDocument
+from .serializers import ProductSerializer, build_image_url
+from .derivatives import DERIVATIVE_FORMATS
+
+# Chỉ tính đánh giá gốc đã được duyệt
+RATED_FEEDBACK = Q(feedbacks__parent__isnull=True, feedbacks__status='normal', feedbacks__rating__isnull=False)
+
+
+def build_documents(product_ids):
+    """
+    Serialize đầy đủ các sản phẩm (giống ProductSerializer) kèm tóm tắt đánh giá.
+    Ảnh giữ đường dẫn gốc, được chuyển thành URL tuyệt đối lúc trả về (render_document).
+    """
+    products = Product.objects.filter(id__in=product_ids).select_related('sales', 'shop').prefetch_related(
+        'variants', 'images'
+    ).annotate(
+        rating_average=Avg('feedbacks__rating', filter=RATED_FEEDBACK),
+        rating_count=Count('feedbacks', filter=RATED_FEEDBACK),
+    )
+
+    documents = {}
+    for product in products:
+        data = ProductSerializer(product, context={'raw_image_urls': True}).data
+        data['rating_average'] = round(product.rating_average, 2) if product.rating_average is not None else None
+        data['rating_count'] = product.rating_count
+        documents[product.id] = data
+    return documents
+
+
+def rebuild_documents(product_ids):
+    """Dựng lại và lưu document của các sản phẩm. Sản phẩm đã bị xóa thì document bị xóa theo (CASCADE)."""
+    product_ids = set(product_ids)
+    if not product_ids:
+        return {}
+
+    documents = build_documents(product_ids)
+    ProductDocument.objects.bulk_create(
+        [ProductDocument(product_id=pid, data=data) for pid, data in documents.items()],
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=['product'],
+        update_fields=['data', 'updated_at'],
+    )
+    return documents
+
+
+def rebuild_documents_on_commit(product_ids):
+    """Dựng lại document sau khi transaction hiện tại commit (đọc được dữ liệu mới nhất)."""
+    product_ids = list(product_ids)
+    transaction.on_commit(lambda: rebuild_documents(product_ids))
+
+
+def invalidate_documents_on_commit(product_ids):
+    """
+    Xóa document sau khi transaction hiện tại commit; lần đọc tiếp theo (get_documents) dựng lại.
+    Dùng cho thay đổi xảy ra liên tục như tồn kho khi đặt hàng: request ghi không phải chờ serialize sản phẩm.
+    """
+    product_ids = list(product_ids)
+    transaction.on_commit(lambda: ProductDocument.objects.filter(product_id__in=product_ids).delete())
+
+
+def get_documents(product_ids):
+    """
+    Lấy document theo danh sách ID (một truy vấn theo khóa chính), giữ nguyên thứ tự.
+    Document chưa có (vd: dữ liệu cũ trước khi có bảng này) được dựng ngay.
+    """
+    documents = dict(ProductDocument.objects.filter(product_id__in=product_ids).values_list('product_id', 'data'))
+    missing = [pid for pid in product_ids if pid not in documents]
+    if missing:
+        documents.update(rebuild_documents(missing))
+    return [documents[pid] for pid in product_ids if pid in documents]
+
+
+def _render_image(image, request):
+    derivatives = {
+        size: {
+            **entry,
+            **{fmt: build_image_url(entry[fmt], request) for fmt in DERIVATIVE_FORMATS},
+        }
+        for size, entry in image.get('derivatives', {}).items()
+    }
+    return {**image, 'image_url': build_image_url(image.get('image_url'), request), 'derivatives': derivatives}
+
+
+def render_document(data, request=None):
+    """Chuyển đường dẫn ảnh (cả ảnh thu nhỏ) trong document thành URL tuyệt đối theo request hiện tại."""
+    if not any(image.get('image_url') for image in data.get('images', [])):
+        return data
+    return {**data, 'images': [_render_image(image, request) for image in data['images']]}
@@ -0,0 +1,181 @@
+from decimal import Decimal, InvalidOperation
+
+from django.db import connection
+from django.db.models import Exists, F, OuterRef
+from drf_spectacular.utils import OpenApiParameter
+from rest_framework import serializers
+
+from .models import ProductVariant
+from .pricing import effective_price_expression
+
+ATTRIBUTE_PARAM_PREFIX = 'attr_'
+
+# Mốc chia khoảng giá (VND) cho facet giá
+PRICE_BUCKET_BOUNDS = [0, 100000, 200000, 500000, 1000000, 2000000, 5000000]
+
+PRODUCT_FILTER_PARAMETERS = [
+    OpenApiParameter(name='category', type=str, location=OpenApiParameter.QUERY, required=False,
+                     description='Lọc theo danh mục, nhiều giá trị cách nhau bởi dấu phẩy (vd: 1,3)'),
+    OpenApiParameter(name='min_price', type=float, location=OpenApiParameter.QUERY, required=False,
+                     description='Giá thực trả (sau giảm giá) tối thiểu'),
+    OpenApiParameter(name='max_price', type=float, location=OpenApiParameter.QUERY, required=False,
+                     description='Giá thực trả (sau giảm giá) tối đa'),
+    OpenApiParameter(name='attr_<tên thuộc tính>', type=str, location=OpenApiParameter.QUERY, required=False,
+                     description='Lọc theo thuộc tính variant, vd: attr_color=White&attr_type=S'),
+]
+
+# Thứ tự sắp xếp theo giá thực trả thấp nhất của sản phẩm (dùng index product_active_min_price_idx)
+PRODUCT_SORT_ORDERINGS = {
+    'price_asc': ('min_effective_price', 'id'),
+    'price_desc': ('-min_effective_price', '-id'),
+}
+
+PRODUCT_SORT_PARAMETER = OpenApiParameter(
+    name='sort', type=str, location=OpenApiParameter.QUERY, required=False, enum=list(PRODUCT_SORT_ORDERINGS),
+    description='Sắp xếp theo giá thực trả: price_asc (thấp đến cao), price_desc (cao đến thấp)'
+)
+
+
+def _parse_decimal(params, name):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise serializers.ValidationError({name: "Giá trị không hợp lệ."})
+
+
+def parse_product_filters(params):
+    """Đọc các tham số lọc từ query string. Trả về dict rỗng nếu không có bộ lọc nào."""
+    filters = {}
+
+    categories = [c for raw in params.getlist('category') for c in raw.split(',') if c.strip()]
+    if categories:
+        try:
+            filters['category_ids'] = [int(c) for c in categories]
+        except ValueError:
+            raise serializers.ValidationError({'category': "Danh mục không hợp lệ."})
+
+    min_price = _parse_decimal(params, 'min_price')
+    max_price = _parse_decimal(params, 'max_price')
+    if min_price is not None:
+        filters['min_price'] = min_price
+    if max_price is not None:
+        filters['max_price'] = max_price
+
+    attributes = {
+        key[len(ATTRIBUTE_PARAM_PREFIX):]: value
+        for key, value in params.items()
+        if key.startswith(ATTRIBUTE_PARAM_PREFIX) and len(key) > len(ATTRIBUTE_PARAM_PREFIX) and value != ''
+    }
+    if attributes:
+        filters['attributes'] = attributes
+
+    return filters
+
+
+def parse_product_sort(params, default):
+    """Thứ tự sắp xếp theo ?sort=, trả về default nếu không truyền."""
+    sort = params.get('sort')
+    if not sort:
+        return default
+    if sort not in PRODUCT_SORT_ORDERINGS:
+        raise serializers.ValidationError({'sort': f"Chỉ hỗ trợ: {', '.join(PRODUCT_SORT_ORDERINGS)}."})
+    return PRODUCT_SORT_ORDERINGS[sort]
+
+
+def apply_product_filters(queryset, filters):
+    """
+    Áp dụng bộ lọc lên queryset Product.
+    Chỉ lọc giá: dùng cột min/max_effective_price đã lưu (có index; sản phẩm không có variant đang bán
+    thì hai cột này là giá base_price sau giảm giá).
+    Có lọc thuộc tính: thuộc tính và khoảng giá được kiểm tra trên cùng một variant (EXISTS), thuộc tính dùng
+    toán tử @> để tận dụng GIN index jsonb_path_ops trên ProductVariant.attributes.
+    """
+    if 'category_ids' in filters:
+        queryset = queryset.filter(category_id__in=filters['category_ids'])
+
+    if 'min_price' in filters:
+        queryset = queryset.filter(max_effective_price__gte=filters['min_price'])
+    if 'max_price' in filters:
+        queryset = queryset.filter(min_effective_price__lte=filters['max_price'])
+
+    if 'attributes' in filters:
+        variant_conditions = {'attributes__contains': filters['attributes']}
+        if 'min_price' in filters:
+            variant_conditions['effective_price__gte'] = filters['min_price']
+        if 'max_price' in filters:
+            variant_conditions['effective_price__lte'] = filters['max_price']
+
+        matching_variants = ProductVariant.objects.filter(
+            product=OuterRef('pk'), is_active=True
+        ).annotate(
+            effective_price=effective_price_expression(F('price'), OuterRef('discount'))
+        ).filter(**variant_conditions)
+        queryset = queryset.filter(Exists(matching_variants))
+
+    return queryset
+
+
+FACET_SQL = """
+SELECT category_id, attr_key, attr_value, price_bucket,
+       COUNT(DISTINCT product_id),
+       GROUPING(category_id), GROUPING(attr_key, attr_value), GROUPING(price_bucket)
+FROM (
+    SELECT f.id AS product_id, f.category_id,
+           kv.key AS attr_key, kv.value AS attr_value,
+           width_bucket(COALESCE(v.price * (100 - f.discount) / 100, f.min_effective_price), %s::numeric[]) AS price_bucket
+    FROM ({filtered}) f
+    LEFT JOIN {variant_table} v ON v.product_id = f.id AND v.is_active
+    LEFT JOIN LATERAL jsonb_each_text(v.attributes) kv ON true
+) facet_rows
+GROUP BY GROUPING SETS ((category_id), (attr_key, attr_value), (price_bucket))
+"""
+
+
+def _price_range(bucket):
+    """width_bucket trả về i với BOUNDS[i-1] <= giá < BOUNDS[i]; i = len(BOUNDS) là khoảng cuối."""
+    lower = PRICE_BUCKET_BOUNDS[bucket - 1] if bucket > 0 else None
+    upper = PRICE_BUCKET_BOUNDS[bucket] if bucket < len(PRICE_BUCKET_BOUNDS) else None
+    return lower, upper
+
+
+def compute_facets(queryset):
+    """
+    Đếm số sản phẩm theo danh mục, theo từng giá trị thuộc tính và theo khoảng giá
+    trên tập sản phẩm đã lọc, bằng một câu truy vấn GROUPING SETS duy nhất.
+    Sản phẩm không có variant đang bán được xếp khoảng giá theo min_effective_price (giá base_price sau giảm),
+    giống cột mà bộ lọc min_price / max_price dùng.
+    """
+    filtered_sql, filtered_params = queryset.order_by().values(
+        'id', 'category_id', 'discount', 'min_effective_price'
+    ).query.sql_with_params()
+    sql = FACET_SQL.format(filtered=filtered_sql, variant_table=ProductVariant._meta.db_table)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [PRICE_BUCKET_BOUNDS, *filtered_params])
+        rows = cursor.fetchall()
+
+    categories, attributes, price_ranges = [], {}, []
+    for category_id, key, value, bucket, count, g_category, g_attribute, g_price in rows:
+        if g_category == 0:
+            categories.append({'category_id': category_id, 'count': count})
+        elif g_attribute == 0:
+            if key is not None:
+                attributes.setdefault(key, []).append({'value': value, 'count': count})
+        elif g_price == 0:
+            if bucket is not None:
+                lower, upper = _price_range(bucket)
+                price_ranges.append({'min': lower, 'max': upper, 'count': count})
+
+    categories.sort(key=lambda item: -item['count'])
+    for values in attributes.values():
+        values.sort(key=lambda item: -item['count'])
+    price_ranges.sort(key=lambda item: item['min'] if item['min'] is not None else -1)
+
+    return {
+        'categories': categories,
+        'attributes': attributes,
+        'price_ranges': price_ranges,
+    }
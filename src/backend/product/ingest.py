@@ -0,0 +1,87 @@
+# Nhận file ảnh upload với bộ nhớ giới hạn:
+# - Upload handler ghi thẳng từng chunk ra file tạm trên đĩa (không giữ cả file trong RAM),
+#   đồng thời tính SHA-256 và đếm số byte để chặn sớm file / request vượt giới hạn.
+# - Kiểm tra kích thước ảnh (số pixel) chỉ từ header để chặn "decompression bomb" trước khi giải mã.
+import hashlib
+
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from PIL import Image
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
+
+# Dung lượng tối đa của một ảnh và của toàn bộ ảnh trong một request
+MAX_IMAGE_BYTES = getattr(settings, 'PRODUCT_IMAGE_MAX_BYTES', 10 * 1024 * 1024)
+MAX_REQUEST_BYTES = getattr(settings, 'PRODUCT_UPLOAD_REQUEST_MAX_BYTES', 40 * 1024 * 1024)
+# Số pixel tối đa (rộng x cao) của ảnh gốc
+MAX_IMAGE_PIXELS = getattr(settings, 'PRODUCT_IMAGE_MAX_PIXELS', 40_000_000)
+
+# Pillow từ chối mở ảnh lớn hơn 2 lần ngưỡng này (DecompressionBombError), áp dụng cho cả process sinh ảnh thu nhỏ
+Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+
+
+class UploadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Dung lượng upload vượt quá giới hạn.'
+    default_code = 'upload_too_large'
+
+
+class BoundedHashingUploadHandler(TemporaryFileUploadHandler):
+    """
+    Luôn ghi file upload ra file tạm (kể cả file nhỏ) theo từng chunk, tính SHA-256 trong lúc ghi.
+    File đã nhận có thêm thuộc tính 'sha256'.
+    Vượt MAX_IMAGE_BYTES (một file) hoặc MAX_REQUEST_BYTES (cả request) -> 413 ngay khi phát hiện.
+    """
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        # Biết trước Content-Length thì từ chối luôn, không cần đọc body
+        if content_length and content_length > MAX_REQUEST_BYTES + 1024 * 1024:
+            raise UploadTooLarge()
+        self.request_bytes = 0
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.digest = hashlib.sha256()
+        self.file_bytes = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.file_bytes += len(raw_data)
+        self.request_bytes += len(raw_data)
+        if self.file_bytes > MAX_IMAGE_BYTES:
+            raise UploadTooLarge(f'Mỗi ảnh tối đa {MAX_IMAGE_BYTES // (1024 * 1024)}MB.')
+        if self.request_bytes > MAX_REQUEST_BYTES:
+            raise UploadTooLarge(f'Tổng dung lượng ảnh mỗi lần gửi tối đa {MAX_REQUEST_BYTES // (1024 * 1024)}MB.')
+        self.digest.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        uploaded = super().file_complete(file_size)
+        uploaded.sha256 = self.digest.hexdigest()
+        return uploaded
+
+
+class BoundedUploadMixin:
+    """Cho APIView nhận ảnh sản phẩm: thay upload handler mặc định bằng BoundedHashingUploadHandler."""
+
+    def initial(self, request, *args, **kwargs):
+        # Phải gán trước khi request.data được đọc lần đầu
+        request._request.upload_handlers = [BoundedHashingUploadHandler(request._request)]
+        super().initial(request, *args, **kwargs)
+
+
+def validate_image_dimensions(image_file):
+    """Kiểm tra số pixel từ header ảnh (không giải mã toàn bộ ảnh)."""
+    image = getattr(image_file, 'image', None)
+    if image is None:
+        image_file.seek(0)
+        with Image.open(image_file) as opened:
+            size = opened.size
+        image_file.seek(0)
+    else:
+        # DRF ImageField đã mở ảnh (chỉ header) khi validate
+        size = image.size
+    if size[0] * size[1] > MAX_IMAGE_PIXELS:
+        raise serializers.ValidationError(
+            f"Ảnh {image_file.name} quá lớn ({size[0]}x{size[1]}), tối đa {MAX_IMAGE_PIXELS:,} pixel."
+        )
+    return image_file
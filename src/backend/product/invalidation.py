@@ -0,0 +1,102 @@
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+
+from backend.conditional import bump_row_version
+from backend.response_cache import VERSION_CACHE_ALIAS, bump_version_on_commit, get_versions
+from shop.models import Shop
+from .models import Product
+
+# Các scope version dùng cho cache response (xem backend.response_cache)
+CATALOGUE_SCOPE = 'catalogue'
+TRENDING_SCOPE = 'trending'
+
+
+def product_scope(product_id):
+    return f'product:{product_id}'
+
+
+def shop_scope(shop_id):
+    return f'shop:{shop_id}'
+
+
+def _rebuild_documents(product_ids):
+    # Import trễ: product.documents -> serializers -> invalidation
+    from .documents import rebuild_documents_on_commit
+    # Đăng ký trước khi tăng version để response cache mới luôn đọc document đã dựng lại
+    rebuild_documents_on_commit(product_ids)
+
+
+def _invalidate_documents(product_ids):
+    from .documents import invalidate_documents_on_commit
+    invalidate_documents_on_commit(product_ids)
+
+
+def product_changed(product_id):
+    """Gọi sau mọi thao tác ghi Product / Variant / Image của một sản phẩm."""
+    bump_row_version(Product.objects.filter(id=product_id), touch_updated_at=True)
+    _rebuild_documents([product_id])
+    bump_version_on_commit(CATALOGUE_SCOPE, product_scope(product_id))
+
+
+def _stock_changed_key(product_id):
+    return f'stock:changed_at:{product_id}'
+
+
+def _record_stock_change(product_ids):
+    now = timezone.now()
+    caches[VERSION_CACHE_ALIAS].set_many({_stock_changed_key(pid): now for pid in product_ids}, timeout=None)
+
+
+def stock_state(product_id):
+    """
+    (version của product_scope, thời điểm tồn kho đổi lần cuối hoặc None) đọc từ cache dùng chung,
+    để ETag / Last-Modified của sản phẩm đổi theo tồn kho mà không phải ghi dòng Product.
+    """
+    version = get_versions([product_scope(product_id)])[0]
+    return version, caches[VERSION_CACHE_ALIAS].get(_stock_changed_key(product_id))
+
+
+def stock_changed(product_ids):
+    """
+    Tồn kho của nhiều sản phẩm thay đổi (đặt hàng, hoàn kho giữ chỗ, shop từ chối đơn).
+    Không khóa / ghi dòng Product: nếu ghi thì mọi đơn của cùng sản phẩm phải chờ nhau đến lúc commit.
+    Chỉ làm mới cache (sau khi commit): version của product_scope và thời điểm đổi tồn kho (stock_state).
+    """
+    product_ids = sorted(set(product_ids))
+    # Document được dựng lại khi đọc (get_documents), không làm chậm request đặt hàng
+    _invalidate_documents(product_ids)
+    # Không tăng CATALOGUE_SCOPE: đơn hàng diễn ra liên tục, nếu tăng thì cache danh sách / tìm kiếm / facet
+    # gần như không bao giờ trúng. Tồn kho trong danh sách được đọc lại mỗi request (product.views.refresh_stock).
+    bump_version_on_commit(*[product_scope(product_id) for product_id in product_ids])
+    transaction.on_commit(lambda: _record_stock_change(product_ids))
+
+
+def products_imported(product_ids):
+    """
+    Sản phẩm mới tạo hàng loạt (product.bulk_import): chưa có ETag/cache chi tiết nào nên chỉ làm mới danh sách.
+    Document được dựng khi đọc lần đầu (get_documents) để không làm chậm việc nhập.
+    """
+    bump_version_on_commit(CATALOGUE_SCOPE)
+
+
+def shop_changed(shop_id):
+    """Thông tin Shop được nhúng trong response sản phẩm nên cũng làm mới danh sách."""
+    bump_row_version(Shop.objects.filter(id=shop_id))
+    bump_row_version(Product.objects.filter(shop_id=shop_id), touch_updated_at=True)
+    _rebuild_documents(Product.objects.filter(shop_id=shop_id).values_list('id', flat=True))
+    bump_version_on_commit(CATALOGUE_SCOPE, shop_scope(shop_id))
+
+
+def sales_changed(product_id):
+    """Số lượng đã bán (total_sold) và bảng xếp hạng Trendy thay đổi."""
+    bump_row_version(Product.objects.filter(id=product_id), touch_updated_at=True)
+    _rebuild_documents([product_id])
+    bump_version_on_commit(CATALOGUE_SCOPE, TRENDING_SCOPE, product_scope(product_id))
+
+
+def feedback_changed(product_id):
+    """Tóm tắt đánh giá trong document sản phẩm thay đổi (duyệt / xóa feedback)."""
+    bump_row_version(Product.objects.filter(id=product_id), touch_updated_at=True)
+    _rebuild_documents([product_id])
+    bump_version_on_commit(product_scope(product_id))
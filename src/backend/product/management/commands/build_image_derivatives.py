@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from product.uploads import backfill_derivatives
+
+
+class Command(BaseCommand):
+    help = (
+        "Sinh ảnh thu nhỏ (thumb / card / full, WebP + JPEG) cho các ảnh sản phẩm đã có nhưng chưa có bản thu nhỏ. "
+        "Ảnh mới tải lên được worker process_image_uploads xử lý tự động."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50, help='Số ảnh xử lý mỗi lô')
+        parser.add_argument('--processes', type=int, default=None,
+                            help='Số process sinh ảnh (mặc định bằng số CPU)')
+
+    def handle(self, *args, **options):
+        succeeded, failed = backfill_derivatives(batch_size=options['batch_size'], processes=options['processes'])
+        self.stdout.write(self.style.SUCCESS(f"Built derivatives for {succeeded} image(s), {failed} failed."))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from product.recommendations import DEFAULT_TOP_K, rebuild_product_neighbors
+
+
+class Command(BaseCommand):
+    help = (
+        "Job định kỳ (khuyến nghị mỗi đêm): tính ma trận đồng xuất hiện sản phẩm từ lịch sử đơn hàng "
+        "và lưu top-K sản phẩm hay mua cùng cho từng sản phẩm (dùng cho API gợi ý)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=DEFAULT_TOP_K,
+                            help='Số sản phẩm tương tự giữ lại cho mỗi sản phẩm')
+        parser.add_argument('--min-support', type=int, default=1,
+                            help='Số user tối thiểu cùng mua 2 sản phẩm để tính là tương tự')
+
+    def handle(self, *args, **options):
+        count = rebuild_product_neighbors(top_k=options['top_k'], min_support=options['min_support'])
+        self.stdout.write(self.style.SUCCESS(f"Stored {count} product neighbor(s)."))
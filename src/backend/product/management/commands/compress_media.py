@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from backend.media_serving import precompress_media
+
+
+class Command(BaseCommand):
+    help = (
+        "Tạo bản nén sẵn (.gz / .br) cho các file đáng nén (SVG, JSON, text...) trong MEDIA_ROOT "
+        "để serve_media / nginx gzip_static gửi thẳng, không nén lúc request."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-size', type=int, default=1024, help='Bỏ qua file nhỏ hơn số byte này')
+
+    def handle(self, *args, **options):
+        written = precompress_media(min_size=options['min_size'])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} precompressed file(s)."))
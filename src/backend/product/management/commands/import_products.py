@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+
+from shop.models import Shop
+from product.bulk_import import DEFAULT_CHUNK_SIZE, IMPORT_FORMATS, detect_format, import_products
+
+
+class Command(BaseCommand):
+    help = (
+        "Nhập sản phẩm hàng loạt cho một Shop từ file CSV / JSONL (đọc tuần tự, ghi theo lô). "
+        "In ra số dòng đã tạo và các dòng lỗi."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Đường dẫn file CSV / JSONL')
+        parser.add_argument('--shop', type=int, required=True, help='ID của Shop sở hữu sản phẩm')
+        parser.add_argument('--format', choices=IMPORT_FORMATS, help='Mặc định đoán theo phần mở rộng file')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                            help='Số dòng validate và ghi trong một transaction')
+
+    def handle(self, *args, **options):
+        try:
+            shop = Shop.objects.get(id=options['shop'])
+        except Shop.DoesNotExist:
+            raise CommandError(f"Shop {options['shop']} does not exist.")
+
+        try:
+            fmt = detect_format(options['path'], options['format'])
+        except ValidationError as exc:
+            raise CommandError(exc.detail['format'])
+        with open(options['path'], 'rb') as f:
+            report = import_products(shop, f, fmt, chunk_size=options['chunk_size'])
+
+        for error in report['errors']:
+            self.stderr.write(f"Row {error['row']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Read {report['total_rows']} row(s): created {report['created']}, {report['error_count']} error(s)."
+        ))
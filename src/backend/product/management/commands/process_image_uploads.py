@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from product.uploads import DEFAULT_CONCURRENCY, retry_failed_jobs, run_upload_worker
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker tải ảnh sản phẩm đang chờ (ImageUploadJob) lên storage chính (ImageKit hoặc MEDIA_ROOT). "
+        "Chạy liên tục; có thể chạy nhiều worker song song."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                            help='Số ảnh được tải lên đồng thời')
+        parser.add_argument('--processes', type=int, default=None,
+                            help='Số process sinh ảnh thu nhỏ (mặc định bằng số CPU)')
+        parser.add_argument('--once', action='store_true',
+                            help='Xử lý hết các job đến hạn rồi thoát (dùng cho cron)')
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Số giây chờ khi hàng đợi trống')
+        parser.add_argument('--retry-failed', action='store_true',
+                            help='Đưa các job đã thất bại (quá số lần thử) về hàng đợi trước khi chạy')
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            self.stdout.write(f"Requeued {retry_failed_jobs()} failed job(s).")
+        succeeded, failed = run_upload_worker(
+            concurrency=options['concurrency'],
+            once=options['once'],
+            poll_interval=options['poll_interval'],
+            processes=options['processes'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Uploaded {succeeded} image(s), {failed} failed attempt(s)."))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from product.documents import rebuild_documents
+from product.models import Product
+
+
+class Command(BaseCommand):
+    help = "Dựng lại toàn bộ document JSON của sản phẩm (chạy sau khi deploy hoặc khi đổi cấu trúc ProductSerializer)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        product_ids = list(Product.objects.order_by('id').values_list('id', flat=True))
+
+        for start in range(0, len(product_ids), batch_size):
+            rebuild_documents(product_ids[start:start + batch_size])
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(product_ids)} product document(s)."))
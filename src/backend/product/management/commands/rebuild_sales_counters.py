@@ -0,0 +1,76 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+
+from order.models import OrderDetail
+from product.models import ProductSales, VariantSales
+from product.sales import SHIPPED_STATUS
+
+
+class Command(BaseCommand):
+    help = (
+        "Tính lại bộ đếm số lượng đã bán (ProductSales, VariantSales) từ OrderDetail 'shipped'. "
+        "Dùng --check để chỉ báo cáo sai lệch mà không ghi."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Chỉ kiểm tra sai lệch (drift), không cập nhật dữ liệu. Trả mã lỗi 1 nếu có sai lệch.'
+        )
+
+    def handle(self, *args, **options):
+        check_only = options['check']
+        shipped = OrderDetail.objects.filter(order_status=SHIPPED_STATUS)
+
+        product_totals = dict(
+            shipped.values_list('product_id').annotate(total=Sum('quantity')).order_by()
+        )
+        variant_totals = dict(
+            shipped.exclude(variant__isnull=True)
+            .values_list('variant_id').annotate(total=Sum('quantity')).order_by()
+        )
+
+        with transaction.atomic():
+            product_drift = self._sync(ProductSales, 'product_id', product_totals, check_only)
+            variant_drift = self._sync(VariantSales, 'variant_id', variant_totals, check_only)
+
+        total_drift = len(product_drift) + len(variant_drift)
+        for label, drift in (('product', product_drift), ('variant', variant_drift)):
+            for key, (stored, expected) in sorted(drift.items()):
+                self.stdout.write(f"  {label} {key}: stored={stored} expected={expected}")
+
+        if not total_drift:
+            self.stdout.write(self.style.SUCCESS("Sales counters are consistent."))
+        elif check_only:
+            raise CommandError(f"Found {total_drift} drifted counter(s).")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt {total_drift} counter(s)."))
+
+    def _sync(self, model, key_field, expected_totals, check_only):
+        """So sánh bộ đếm hiện tại với giá trị tính lại, trả về {key: (stored, expected)} bị lệch."""
+        counters = model.objects.select_for_update() if not check_only else model.objects.all()
+        stored = {getattr(c, key_field): c for c in counters}
+
+        drift = {}
+        for key in set(stored) | set(expected_totals):
+            current = stored[key].total_sold if key in stored else 0
+            expected = expected_totals.get(key, 0)
+            if current != expected:
+                drift[key] = (current, expected)
+
+        if check_only or not drift:
+            return drift
+
+        to_update, to_create = [], []
+        for key, (_, expected) in drift.items():
+            if key in stored:
+                stored[key].total_sold = expected
+                to_update.append(stored[key])
+            else:
+                to_create.append(model(**{key_field: key, 'total_sold': expected}))
+
+        model.objects.bulk_update(to_update, ['total_sold'], batch_size=500)
+        model.objects.bulk_create(to_create, batch_size=500)
+        return drift
@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from product.storage_gc import reconcile_local_storage
+
+
+class Command(BaseCommand):
+    help = (
+        "Quét thư mục ảnh trong MEDIA_ROOT, tìm file không còn ProductImage / ImageUploadJob nào tham chiếu "
+        "và xếp vào hàng đợi xóa (sweep_storage)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-age-hours', type=float, default=24,
+                            help='Chỉ xét file cũ hơn số giờ này')
+        parser.add_argument('--dry-run', action='store_true', help='Chỉ đếm, không xếp hàng xóa')
+
+    def handle(self, *args, **options):
+        report = reconcile_local_storage(
+            min_age=timedelta(hours=options['min_age_hours']), dry_run=options['dry_run']
+        )
+        action = 'found' if options['dry_run'] else 'queued'
+        self.stdout.write(self.style.SUCCESS(
+            f"Scanned {report['scanned']} file(s), {action} {report['orphaned']} orphan(s)."
+        ))
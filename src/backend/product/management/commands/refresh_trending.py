@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from product.sales import compact_sales_buckets, refresh_trending_scores
+
+
+class Command(BaseCommand):
+    help = (
+        "Job định kỳ (khuyến nghị mỗi giờ): gộp bucket bán hàng cũ thành bucket theo ngày, "
+        "xóa bucket hết hạn và tính lại điểm Trendy cho các cửa sổ 24h/7d/30d."
+    )
+
+    def handle(self, *args, **options):
+        merged, expired = compact_sales_buckets()
+        refresh_trending_scores()
+        self.stdout.write(self.style.SUCCESS(
+            f"Compacted {merged} hourly bucket(s), removed {expired} expired bucket(s), trending scores refreshed."
+        ))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from product.storage_gc import sweep_deletions
+
+
+class Command(BaseCommand):
+    help = (
+        "Job định kỳ: xóa hàng loạt các file ảnh trong hàng đợi StorageDeletion khỏi ImageKit / MEDIA_ROOT, "
+        "có giới hạn số request mỗi giây."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--storage', choices=['cloud', 'local'], help='Chỉ xử lý một loại storage')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Số file mỗi lần gọi xóa (mặc định tối đa storage cho phép)')
+        parser.add_argument('--rate', type=float, default=2.0, help='Số lần gọi xóa tối đa mỗi giây')
+
+    def handle(self, *args, **options):
+        report = sweep_deletions(
+            storage_types=[options['storage']] if options['storage'] else None,
+            batch_size=options['batch_size'],
+            max_requests_per_second=options['rate'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {report['deleted']} file(s), {report['failed']} failed (will retry)."
+        ))
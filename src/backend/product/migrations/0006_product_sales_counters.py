@@ -0,0 +1,51 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill_sales_counters(apps, schema_editor):
+    # Khởi tạo bộ đếm từ các OrderDetail đã 'shipped' hiện có
+    OrderDetail = apps.get_model('order', 'OrderDetail')
+    ProductSales = apps.get_model('product', 'ProductSales')
+    VariantSales = apps.get_model('product', 'VariantSales')
+
+    shipped = OrderDetail.objects.filter(order_status='shipped')
+    ProductSales.objects.bulk_create([
+        ProductSales(product_id=product_id, total_sold=total)
+        for product_id, total in shipped.values_list('product_id').annotate(total=Sum('quantity')).order_by()
+    ], batch_size=500)
+    VariantSales.objects.bulk_create([
+        VariantSales(variant_id=variant_id, total_sold=total)
+        for variant_id, total in shipped.exclude(variant__isnull=True)
+        .values_list('variant_id').annotate(total=Sum('quantity')).order_by()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0003_order_address_order_full_name_order_note_and_more'),
+        ('product', '0005_product_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSales',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='sales', serialize=False, to='product.product')),
+                ('total_sold', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VariantSales',
+            fields=[
+                ('variant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='sales', serialize=False, to='product.productvariant')),
+                ('total_sold', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_sales_counters, migrations.RunPython.noop),
+    ]
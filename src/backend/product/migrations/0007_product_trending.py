@@ -0,0 +1,80 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:38
+
+import django.db.models.deletion
+from datetime import timedelta
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+
+def backfill_trending(apps, schema_editor):
+    # Khởi tạo bucket theo giờ và điểm Trendy từ các OrderDetail 'shipped' trong 30 ngày qua
+    OrderDetail = apps.get_model('order', 'OrderDetail')
+    ProductSalesBucket = apps.get_model('product', 'ProductSalesBucket')
+    TrendingScore = apps.get_model('product', 'TrendingScore')
+
+    now = timezone.now()
+    buckets = (
+        OrderDetail.objects.filter(order_status='shipped', order__created_at__gte=now - timedelta(days=30))
+        .annotate(bucket_start=TruncHour('order__created_at'))
+        .values_list('product_id', 'bucket_start')
+        .annotate(total=Sum('quantity'))
+        .order_by()
+    )
+    rows = [
+        ProductSalesBucket(product_id=product_id, bucket_start=bucket_start, quantity=total)
+        for product_id, bucket_start, total in buckets
+    ]
+    ProductSalesBucket.objects.bulk_create(rows, batch_size=500)
+
+    windows = {'24h': timedelta(hours=24), '7d': timedelta(days=7), '30d': timedelta(days=30)}
+    for window, length in windows.items():
+        start = (now - length).replace(minute=0, second=0, microsecond=0)
+        totals = {}
+        for row in rows:
+            if row.bucket_start >= start:
+                totals[row.product_id] = totals.get(row.product_id, 0) + row.quantity
+        TrendingScore.objects.bulk_create([
+            TrendingScore(product_id=product_id, window=window, quantity=total)
+            for product_id, total in totals.items()
+        ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0003_order_address_order_full_name_order_note_and_more'),
+        ('product', '0006_product_sales_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSalesBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket_start', models.DateTimeField()),
+                ('quantity', models.IntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_buckets', to='product.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['bucket_start'], name='sales_bucket_start_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'bucket_start'), name='unique_product_sales_bucket')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TrendingScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window', models.CharField(choices=[('24h', '24 giờ'), ('7d', '7 ngày'), ('30d', '30 ngày')], max_length=3)),
+                ('quantity', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trending_scores', to='product.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['window', '-quantity'], name='trending_window_quantity_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'window'), name='unique_product_trending_window')],
+            },
+        ),
+        migrations.RunPython(backfill_trending, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:39
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import Value
+
+
+def backfill_search_vector(apps, schema_editor):
+    # Tạo chỉ mục tìm kiếm cho các sản phẩm đã có
+    from product.search import SEARCH_CONFIG, fold_text
+
+    Product = apps.get_model('product', 'Product')
+    for product in Product.objects.only('id', 'product_name', 'description').iterator(chunk_size=500):
+        Product.objects.filter(pk=product.pk).update(
+            search_vector=SearchVector(Value(fold_text(product.product_name)), config=SEARCH_CONFIG, weight='A')
+            + SearchVector(Value(fold_text(product.description)), config=SEARCH_CONFIG, weight='B')
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('category', '0001_initial'),
+        ('product', '0007_product_trending'),
+        ('shop', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='product_search_vector_idx'),
+        ),
+        migrations.RunPython(backfill_search_vector, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:40
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0008_product_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='productvariant',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['attributes'], name='variant_attributes_gin_idx', opclasses=['jsonb_path_ops']),
+        ),
+    ]
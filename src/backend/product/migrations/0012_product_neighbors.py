@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0011_row_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductNeighbor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('neighbor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='product.product')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbors', to='product.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', '-score'], name='product_neighbor_score_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'neighbor'), name='unique_product_neighbor')],
+            },
+        ),
+    ]
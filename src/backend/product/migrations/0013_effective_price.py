@@ -0,0 +1,49 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:52
+
+from django.db import migrations, models
+from django.db.models import DecimalField, ExpressionWrapper, F, Max, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_effective_prices(apps, schema_editor):
+    # Tính giá thực trả min/max cho các sản phẩm đã có (cùng công thức với product.pricing)
+    Product = apps.get_model('product', 'Product')
+    ProductVariant = apps.get_model('product', 'ProductVariant')
+
+    def effective(aggregate):
+        prices = ProductVariant.objects.filter(product=OuterRef('pk'), is_active=True).order_by().values('product')
+        price = Coalesce(Subquery(prices.annotate(value=aggregate('price')).values('value')), F('base_price'))
+        return ExpressionWrapper(price * (100 - F('discount')) / 100, output_field=DecimalField(max_digits=12, decimal_places=2))
+
+    Product.objects.update(min_effective_price=effective(Min), max_effective_price=effective(Max))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('category', '0001_initial'),
+        ('product', '0012_product_neighbors'),
+        ('shop', '0003_row_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='max_effective_price',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='min_effective_price',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_active', 'min_effective_price', 'id'], name='product_active_min_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_active', 'max_effective_price', 'id'], name='product_active_max_price_idx'),
+        ),
+        migrations.RunPython(backfill_effective_prices, migrations.RunPython.noop),
+    ]
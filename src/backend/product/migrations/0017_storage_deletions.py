@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:06
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0016_upload_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StorageDeletion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('storage_type', models.CharField(max_length=10)),
+                ('file_id', models.CharField(max_length=500)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['storage_type', 'available_at'], name='storage_deletion_due_idx')],
+                'constraints': [models.UniqueConstraint(fields=('storage_type', 'file_id'), name='unique_storage_deletion')],
+            },
+        ),
+    ]
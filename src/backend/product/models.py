@@ -1,7 +1,12 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.utils import timezone
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from .utils import rename_product_image
+from backend.conditional import RowVersionMixin
 
-class Product(models.Model):
+class Product(RowVersionMixin, models.Model):
 
     product_name = models.CharField(max_length=250)
     description = models.TextField()
@@ -24,6 +29,25 @@ class Product(models.Model):
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Giá thực trả (sau giảm giá) thấp/cao nhất trong các variant, tính lại bởi product.pricing
+    min_effective_price = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
+    max_effective_price = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
+    # Tăng mỗi khi dữ liệu trả về của sản phẩm thay đổi (kể cả variant/ảnh/đã bán/đánh giá), dùng làm ETag
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    # tsvector (tên + mô tả đã bỏ dấu) cho tìm kiếm full-text, xem product.search
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        # Composite index phục vụ phân trang keyset trên các danh sách public
+        indexes = [
+            models.Index(fields=['is_active', '-created_at', '-id'], name='product_active_created_idx'),
+            models.Index(fields=['is_active', '-discount', '-id'], name='product_active_discount_idx'),
+            # Sắp xếp / lọc theo giá thực trả (?sort=price_asc|price_desc, min_price/max_price)
+            models.Index(fields=['is_active', 'min_effective_price', 'id'], name='product_active_min_price_idx'),
+            models.Index(fields=['is_active', 'max_effective_price', 'id'], name='product_active_max_price_idx'),
+            GinIndex(fields=['search_vector'], name='product_search_vector_idx'),
+        ]
 
     def __str__(self):
         return self.product_name
@@ -46,11 +70,39 @@ class ProductVariant(models.Model):
     
     is_active = models.BooleanField(default=True)
 
+    class Meta:
+        indexes = [
+            # Phục vụ lọc thuộc tính bằng toán tử @> (attributes__contains)
+            GinIndex(fields=['attributes'], opclasses=['jsonb_path_ops'], name='variant_attributes_gin_idx'),
+        ]
+
     def __str__(self):
         return f"{self.product.product_name}"
 
 
+class ImageBlob(models.Model):
+    # File ảnh trên storage, định danh theo SHA-256 nội dung; nhiều ProductImage có thể dùng chung (xem product.blobs)
+    digest = models.CharField(max_length=64, unique=True)
+    image_url = models.URLField(max_length=500)
+    file_id = models.CharField(max_length=255, blank=True, null=True)
+    derivatives = models.JSONField(default=dict, blank=True)
+    # Số ProductImage đang trỏ tới blob, về 0 thì blob bị xóa và file được xếp hàng dọn dẹp
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.digest[:12]} x{self.ref_count}"
+
+
 class ProductImage(models.Model):
+    STATUS_PENDING = 'pending'
+    STATUS_READY = 'ready'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_PENDING, 'Đang tải lên'),
+        (STATUS_READY, 'Sẵn sàng'),
+        (STATUS_FAILED, 'Tải lên thất bại'),
+    )
 
     product = models.ForeignKey(
         Product,
@@ -63,6 +115,203 @@ class ProductImage(models.Model):
     file_id = models.CharField(max_length=255, blank=True, null=True)
 
     order = models.IntegerField(default=0) 
+    # pending: file mới nằm ở thư mục tạm (image_url trỏ tới bản tạm), chờ worker tải lên storage chính
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_READY)
+    # Ảnh thu nhỏ sinh sẵn (xem product.derivatives):
+    # {size: {'width', 'height', 'webp': {'url', 'file_id'}, 'jpeg': {'url', 'file_id'}}}, rỗng = chỉ có ảnh gốc
+    derivatives = models.JSONField(default=dict, blank=True)
+    # File dùng chung theo nội dung; image_url / file_id / derivatives ở trên là bản sao từ blob để đọc nhanh.
+    # Ảnh cũ (trước khi có blob) hoặc ảnh từ URL ngoài không có blob.
+    blob = models.ForeignKey(
+        ImageBlob,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='images'
+    )
+
+    def derivative_url(self, size, fmt='jpeg'):
+        """Đường dẫn ảnh thu nhỏ kích thước size (xem product.derivatives), chưa có thì trả về ảnh gốc."""
+        entry = self.derivatives.get(size)
+        return entry[fmt]['url'] if entry else self.image_url
+
+    def __str__(self):
+        return f"Image for {self.product.product_name}"
+
+
+class ImageUploadJob(models.Model):
+    # Hàng đợi tải ảnh lên storage (xem product.uploads), worker: lệnh process_image_uploads
+    STATUS_PENDING = 'pending'
+    STATUS_PROCESSING = 'processing'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_PENDING, 'Chờ xử lý'),
+        (STATUS_PROCESSING, 'Đang xử lý'),
+        (STATUS_FAILED, 'Thất bại'),
+    )
+
+    image = models.OneToOneField(
+        ProductImage,
+        on_delete=models.CASCADE,
+        related_name='upload_job'
+    )
+    # Đường dẫn file tạm trong default_storage
+    staged_path = models.CharField(max_length=500)
+    file_name = models.CharField(max_length=255)
+    # SHA-256 tính trong lúc nhận upload (product.ingest), worker kiểm tra lại trước khi tải lên
+    content_hash = models.CharField(max_length=64, blank=True, default='')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    available_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='upload_job_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Upload {self.image_id} [{self.status}]"
+
+
+class StorageDeletion(models.Model):
+    # File trên storage (ImageKit / MEDIA_ROOT) chờ xóa, do lệnh sweep_storage xử lý (xem product.storage_gc)
+    storage_type = models.CharField(max_length=10)
+    file_id = models.CharField(max_length=500)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    available_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['storage_type', 'file_id'], name='unique_storage_deletion'),
+        ]
+        indexes = [
+            models.Index(fields=['storage_type', 'available_at'], name='storage_deletion_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.storage_type}:{self.file_id}"
+
+
+class ProductSales(models.Model):
+    # Bộ đếm số lượng đã bán (denormalized), cập nhật khi OrderDetail chuyển sang 'shipped'
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='sales'
+    )
+    total_sold = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.product_id}: {self.total_sold}"
+
+
+class VariantSales(models.Model):
+    variant = models.OneToOneField(
+        ProductVariant,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='sales'
+    )
+    total_sold = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.variant_id}: {self.total_sold}"
+
+
+class ProductSalesBucket(models.Model):
+    # Số lượng bán theo từng giờ (theo thời điểm tạo đơn), dùng để tính xếp hạng Trendy
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='sales_buckets'
+    )
+    bucket_start = models.DateTimeField()
+    quantity = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'bucket_start'], name='unique_product_sales_bucket'),
+        ]
+        indexes = [
+            models.Index(fields=['bucket_start'], name='sales_bucket_start_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} @ {self.bucket_start}: {self.quantity}"
+
+
+class TrendingScore(models.Model):
+    # Bảng xếp hạng Trendy đã tính sẵn cho từng cửa sổ thời gian
+    WINDOW_CHOICES = (
+        ('24h', '24 giờ'),
+        ('7d', '7 ngày'),
+        ('30d', '30 ngày'),
+    )
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='trending_scores'
+    )
+    window = models.CharField(max_length=3, choices=WINDOW_CHOICES)
+    quantity = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'window'], name='unique_product_trending_window'),
+        ]
+        indexes = [
+            models.Index(fields=['window', '-quantity'], name='trending_window_quantity_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} [{self.window}]: {self.quantity}"
+
+
+class ProductDocument(models.Model):
+    # Bản JSON đã serialize sẵn của sản phẩm (xem product.documents), dựng lại mỗi khi dữ liệu liên quan thay đổi
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='document'
+    )
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Document of {self.product_id}"
+
+
+class ProductNeighbor(models.Model):
+    # Top-K sản phẩm hay được mua cùng (co-purchase), tính offline bởi lệnh build_product_neighbors
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='neighbors'
+    )
+    neighbor = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'neighbor'], name='unique_product_neighbor'),
+        ]
+        indexes = [
+            models.Index(fields=['product', '-score'], name='product_neighbor_score_idx'),
+        ]
 
     def __str__(self):
-        return f"Image for {self.product.product_name}"
\ No newline at end of file
+        return f"{self.product_id} -> {self.neighbor_id}: {self.score:.3f}"
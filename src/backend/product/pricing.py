@@ -0,0 +1,32 @@
+from django.db.models import DecimalField, ExpressionWrapper, F, Max, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Product, ProductVariant
+
+
+def effective_price_expression(price, discount):
+    """Giá thực trả = price * (100 - discount) / 100."""
+    return ExpressionWrapper(
+        price * (100 - discount) / 100,
+        output_field=DecimalField(max_digits=12, decimal_places=2)
+    )
+
+
+def _variant_price(aggregate):
+    # Giá min/max của các variant đang bán; sản phẩm không có variant nào thì dùng base_price
+    prices = ProductVariant.objects.filter(product=OuterRef('pk'), is_active=True).order_by().values('product')
+    return Coalesce(
+        Subquery(prices.annotate(value=aggregate('price')).values('value')),
+        F('base_price')
+    )
+
+
+def update_effective_prices(product_ids):
+    """
+    Tính lại min_effective_price / max_effective_price (một câu UPDATE).
+    Gọi sau khi variant, base_price hoặc discount của sản phẩm thay đổi.
+    """
+    return Product.objects.filter(id__in=product_ids).update(
+        min_effective_price=effective_price_expression(_variant_price(Min), F('discount')),
+        max_effective_price=effective_price_expression(_variant_price(Max), F('discount')),
+    )
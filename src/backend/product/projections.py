@@ -0,0 +1,119 @@
+from django.db.models import OuterRef, Subquery
+from drf_spectacular.utils import OpenApiParameter
+from rest_framework import serializers
+
+from .models import ProductImage
+from .documents import get_documents, render_document
+from .serializers import ProductSerializer, ProductCardSerializer
+
+CARD_VIEW = 'card'
+
+# Trường output của ProductSerializer -> cột/quan hệ cần tải
+PRODUCT_FIELD_COLUMNS = {
+    'product_id': ['id'],
+    'product_name': ['product_name'],
+    'description': ['description'],
+    'base_price': ['base_price'],
+    'discount': ['discount'],
+    'min_effective_price': ['min_effective_price'],
+    'max_effective_price': ['max_effective_price'],
+    'category': ['category'],
+    'shop': ['shop'],
+    'is_active': ['is_active'],
+    'created_at': ['created_at'],
+    'updated_at': ['updated_at'],
+    'images': [],
+    'variants': [],
+    'total_sold': ['sales__total_sold'],
+}
+
+CARD_COLUMNS = ['id', 'product_name', 'base_price', 'discount', 'min_effective_price', 'category', 'sales__total_sold']
+
+PROJECTION_PARAMETERS = [
+    OpenApiParameter(name='view', type=str, location=OpenApiParameter.QUERY, required=False, enum=[CARD_VIEW],
+                     description='card: trả về dạng rút gọn (tên, giá, ảnh đại diện, đã bán) cho lưới sản phẩm'),
+    OpenApiParameter(name='fields', type=str, location=OpenApiParameter.QUERY, required=False,
+                     description=f'Chỉ trả về các trường chỉ định, cách nhau bởi dấu phẩy. '
+                                 f'Hợp lệ: {", ".join(PRODUCT_FIELD_COLUMNS)}'),
+]
+
+
+class ProductProjection:
+    """
+    Cách trình bày sản phẩm do client chọn qua ?view=card hoặc ?fields=a,b,c.
+    Quyết định cả serializer lẫn các cột/prefetch cần tải để không đọc dữ liệu thừa.
+    Mặc định (đầy đủ) trả về document đã serialize sẵn (xem product.documents).
+    """
+
+    def __init__(self, card=False, fields=None):
+        self.card = card
+        self.fields = fields
+
+    @classmethod
+    def from_request(cls, request):
+        params = request.query_params
+        view = params.get('view')
+        if view and view != CARD_VIEW:
+            raise serializers.ValidationError({'view': f"Chỉ hỗ trợ view={CARD_VIEW}."})
+
+        raw_fields = params.get('fields')
+        fields = None
+        if raw_fields:
+            fields = [name.strip() for name in raw_fields.split(',') if name.strip()]
+            unknown = [name for name in fields if name not in PRODUCT_FIELD_COLUMNS]
+            if unknown:
+                raise serializers.ValidationError({'fields': f"Trường không hợp lệ: {', '.join(unknown)}"})
+
+        return cls(card=view == CARD_VIEW, fields=fields)
+
+    @property
+    def uses_documents(self):
+        return not self.card and self.fields is None
+
+    def _wants(self, name):
+        return self.fields is None or name in self.fields
+
+    def apply(self, queryset, ordering=()):
+        """
+        Giới hạn cột (.only()) và prefetch theo projection.
+        Các cột trong ordering luôn được tải vì KeysetPagination đọc chúng để tạo cursor.
+        """
+        model_fields = {f.name for f in queryset.model._meta.concrete_fields}
+        ordering_columns = [name.lstrip('-') for name in ordering if name.lstrip('-') in model_fields]
+
+        if self.card:
+            first_image = ProductImage.objects.filter(product=OuterRef('pk')).order_by('order', 'id')
+            return queryset.select_related('sales').only(*CARD_COLUMNS, *ordering_columns).annotate(
+                thumbnail_url=Subquery(first_image.values('image_url')[:1]),
+                thumbnail_derivatives=Subquery(first_image.values('derivatives')[:1]),
+            )
+
+        if self.uses_documents:
+            # Chỉ cần ID (và cột sắp xếp), nội dung lấy từ ProductDocument
+            return queryset.only('id', *ordering_columns)
+
+        columns = ['id', *ordering_columns]
+        for name in self.fields:
+            columns.extend(PRODUCT_FIELD_COLUMNS[name])
+        if self._wants('total_sold'):
+            queryset = queryset.select_related('sales')
+        if self._wants('shop'):
+            queryset = queryset.select_related('shop')
+        if self._wants('variants'):
+            queryset = queryset.prefetch_related('variants')
+        if self._wants('images'):
+            queryset = queryset.prefetch_related('images')
+        return queryset.only(*columns)
+
+    def get_serializer(self, instance, many=False, context=None):
+        if self.card:
+            return ProductCardSerializer(instance, many=many, context=context)
+        return ProductSerializer(instance, many=many, context=context, fields=self.fields)
+
+    def serialize(self, instance, request, many=False):
+        """Dữ liệu trả về cho một sản phẩm (hoặc danh sách nếu many=True)."""
+        if self.uses_documents:
+            products = instance if many else [instance]
+            data = [render_document(doc, request) for doc in get_documents([p.id for p in products])]
+            return data if many else data[0]
+        return self.get_serializer(instance, many=many, context={'request': request}).data
@@ -0,0 +1,174 @@
+import threading
+import time
+
+import numpy as np
+from scipy import sparse
+from django.core.cache import cache
+from django.db import transaction
+
+from order.models import OrderDetail
+from .models import Product, ProductNeighbor
+
+# Số sản phẩm "hay mua cùng" giữ lại cho mỗi sản phẩm
+DEFAULT_TOP_K = 20
+# Số sản phẩm mua gần nhất của user dùng để gợi ý
+RECENT_PURCHASES = 20
+# Trọng số giảm dần theo độ cũ của lần mua (lần mua thứ i có trọng số RECENCY_DECAY ** i)
+RECENCY_DECAY = 0.9
+# Độ dài tối đa danh sách gợi ý của một user
+RECOMMENDATION_LIMIT = 100
+# Thời gian giữ danh sách gợi ý của user trong cache (bị xóa sớm hơn khi user đặt đơn mới)
+RECOMMENDATION_CACHE_TIMEOUT = 60 * 30
+
+# Bộ đếm của process hiện tại (mỗi worker gunicorn có bộ đếm riêng)
+_metrics = {'hits': 0, 'misses': 0, 'rebuild_ms_total': 0.0, 'rebuild_ms_max': 0.0}
+_metrics_lock = threading.Lock()
+
+
+def compute_neighbors(user_ids, product_ids, top_k=DEFAULT_TOP_K, min_support=1):
+    """
+    Tính top-K sản phẩm tương tự cho từng sản phẩm từ các cặp (user, product) đã mua.
+    - Ma trận mua hàng X (user x product, nhị phân) dạng sparse.
+    - Ma trận đồng xuất hiện C = X^T X: C[i, j] = số user mua cả i và j.
+    - Độ tương tự cosine: C[i, j] / sqrt(n_i * n_j), n_i = số user mua i.
+    Trả về 3 mảng numpy (product_id, neighbor_id, score), mỗi sản phẩm tối đa top_k dòng,
+    sắp theo score giảm dần.
+    """
+    user_ids = np.asarray(user_ids, dtype=np.int64)
+    product_ids = np.asarray(product_ids, dtype=np.int64)
+    if user_ids.size == 0:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, np.array([], dtype=np.float64)
+
+    users, user_index = np.unique(user_ids, return_inverse=True)
+    products, product_index = np.unique(product_ids, return_inverse=True)
+
+    purchases = sparse.csr_matrix(
+        (np.ones(user_index.size, dtype=np.float64), (user_index, product_index)),
+        shape=(users.size, products.size)
+    )
+    purchases.sum_duplicates()
+    purchases.data[:] = 1.0  # Mua nhiều lần vẫn tính là 1
+
+    buyers = np.asarray(purchases.sum(axis=0)).ravel()
+    cooccurrence = (purchases.T @ purchases).tocoo()
+
+    mask = (cooccurrence.row != cooccurrence.col) & (cooccurrence.data >= min_support)
+    rows, cols = cooccurrence.row[mask], cooccurrence.col[mask]
+    scores = cooccurrence.data[mask] / np.sqrt(buyers[rows] * buyers[cols])
+
+    # Sắp theo (sản phẩm, score giảm dần) rồi giữ top_k phần tử đầu của mỗi sản phẩm
+    order = np.lexsort((-scores, rows))
+    rows, cols, scores = rows[order], cols[order], scores[order]
+    position = np.arange(rows.size) - np.searchsorted(rows, rows, side='left')
+    keep = position < top_k
+
+    return products[rows[keep]], products[cols[keep]], scores[keep]
+
+
+def rebuild_product_neighbors(top_k=DEFAULT_TOP_K, min_support=1):
+    """Tính lại toàn bộ bảng ProductNeighbor từ lịch sử OrderDetail. Trả về số dòng đã ghi."""
+    pairs = np.array(
+        list(OrderDetail.objects.values_list('order__user_id', 'product_id').distinct().order_by()),
+        dtype=np.int64
+    ).reshape(-1, 2)
+    product_ids, neighbor_ids, scores = compute_neighbors(pairs[:, 0], pairs[:, 1], top_k, min_support)
+
+    with transaction.atomic():
+        ProductNeighbor.objects.all().delete()
+        ProductNeighbor.objects.bulk_create(
+            [
+                ProductNeighbor(product_id=int(pid), neighbor_id=int(nid), score=float(score))
+                for pid, nid, score in zip(product_ids, neighbor_ids, scores)
+            ],
+            batch_size=1000
+        )
+    return len(scores)
+
+
+def recent_purchases(user, limit=RECENT_PURCHASES):
+    """ID các sản phẩm user mua gần nhất (không trùng), mới nhất trước."""
+    recent = []
+    rows = OrderDetail.objects.filter(order__user=user).order_by('-order__created_at', '-id').values_list(
+        'product_id', flat=True
+    )[:limit * 5]
+    for product_id in rows:
+        if product_id not in recent:
+            recent.append(product_id)
+            if len(recent) == limit:
+                break
+    return recent
+
+
+def recommend_product_ids(user, limit=RECOMMENDATION_LIMIT):
+    """
+    Danh sách ID sản phẩm gợi ý cho user theo thứ tự ưu tiên:
+    cộng điểm neighbor của các sản phẩm mua gần đây (có trọng số theo độ mới),
+    bỏ sản phẩm vừa mua; thiếu thì bù bằng sản phẩm mới nhất.
+    """
+    recent = recent_purchases(user)
+    weights = {product_id: RECENCY_DECAY ** i for i, product_id in enumerate(recent)}
+
+    scores = {}
+    neighbors = ProductNeighbor.objects.filter(
+        product_id__in=recent, neighbor__is_active=True
+    ).values_list('product_id', 'neighbor_id', 'score')
+    for product_id, neighbor_id, score in neighbors:
+        if neighbor_id in weights:
+            continue
+        scores[neighbor_id] = scores.get(neighbor_id, 0.0) + score * weights[product_id]
+
+    ranked = sorted(scores, key=lambda pid: (-scores[pid], pid))[:limit]
+
+    if len(ranked) < limit:
+        ranked += list(
+            Product.objects.filter(is_active=True).exclude(id__in=[*ranked, *recent])
+            .order_by('-created_at', '-id').values_list('id', flat=True)[:limit - len(ranked)]
+        )
+    return ranked
+
+
+def _user_cache_key(user_id):
+    return f'recommend:user:{user_id}'
+
+
+def get_user_recommendations(user):
+    """Danh sách gợi ý của user, đọc từ cache; nếu chưa có thì tính lại và lưu cache."""
+    key = _user_cache_key(user.id)
+    ranked = cache.get(key)
+    if ranked is not None:
+        with _metrics_lock:
+            _metrics['hits'] += 1
+        return ranked
+
+    started = time.perf_counter()
+    ranked = recommend_product_ids(user)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    cache.set(key, ranked, RECOMMENDATION_CACHE_TIMEOUT)
+
+    with _metrics_lock:
+        _metrics['misses'] += 1
+        _metrics['rebuild_ms_total'] += elapsed_ms
+        _metrics['rebuild_ms_max'] = max(_metrics['rebuild_ms_max'], elapsed_ms)
+    return ranked
+
+
+def invalidate_user_recommendations_on_commit(user_id):
+    """Xóa danh sách gợi ý đã cache sau khi đơn hàng mới được commit (lần tải sau sẽ tính lại)."""
+    transaction.on_commit(lambda: cache.delete(_user_cache_key(user_id)))
+
+
+def recommendation_metrics():
+    """Tỉ lệ cache hit và thời gian tính lại danh sách gợi ý của process hiện tại."""
+    with _metrics_lock:
+        hits, misses = _metrics['hits'], _metrics['misses']
+        total_ms, max_ms = _metrics['rebuild_ms_total'], _metrics['rebuild_ms_max']
+    requests = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / requests, 4) if requests else None,
+        'rebuilds': misses,
+        'rebuild_avg_ms': round(total_ms / misses, 2) if misses else None,
+        'rebuild_max_ms': round(max_ms, 2),
+    }
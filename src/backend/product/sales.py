@@ -0,0 +1,152 @@
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import ProductSales, VariantSales, ProductSalesBucket, TrendingScore
+from .invalidation import sales_changed, TRENDING_SCOPE
+from backend.response_cache import bump_version_on_commit
+
+SHIPPED_STATUS = 'shipped'
+
+# Các cửa sổ thời gian hỗ trợ cho bảng xếp hạng Trendy
+TRENDING_WINDOWS = {
+    '24h': timedelta(hours=24),
+    '7d': timedelta(days=7),
+    '30d': timedelta(days=30),
+}
+DEFAULT_TRENDING_WINDOW = '7d'
+
+# Bucket theo giờ cũ hơn mốc này sẽ được gộp thành bucket theo ngày khi compaction
+HOURLY_RETENTION = timedelta(days=7)
+
+
+def _increment(model, lookup, quantity, field='total_sold'):
+    """
+    Cộng dồn bộ đếm bằng UPDATE ... SET field = field + n (không đọc-ghi lại).
+    Nếu chưa có dòng bộ đếm thì tạo mới (xử lý trường hợp 2 request cùng tạo).
+    """
+    if model.objects.filter(**lookup).update(**{field: F(field) + quantity}):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**{field: quantity}, **lookup)
+    except IntegrityError:
+        model.objects.filter(**lookup).update(**{field: F(field) + quantity})
+
+
+def hour_bucket(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def record_sale(order_detail, sign=1):
+    """
+    Ghi nhận (sign=1) hoặc hoàn tác (sign=-1) số lượng đã bán của một OrderDetail:
+    - Bộ đếm tổng của Product và Variant.
+    - Bucket theo giờ (theo thời điểm tạo đơn) và điểm Trendy của các cửa sổ còn hiệu lực.
+    """
+    quantity = order_detail.quantity * sign
+    _increment(ProductSales, {'product_id': order_detail.product_id}, quantity)
+    if order_detail.variant_id:
+        _increment(VariantSales, {'variant_id': order_detail.variant_id}, quantity)
+
+    bucket_start = hour_bucket(order_detail.order.created_at)
+    _increment(
+        ProductSalesBucket,
+        {'product_id': order_detail.product_id, 'bucket_start': bucket_start},
+        quantity,
+        field='quantity'
+    )
+
+    now = timezone.now()
+    for window, length in TRENDING_WINDOWS.items():
+        if bucket_start >= hour_bucket(now - length):
+            _increment(
+                TrendingScore,
+                {'product_id': order_detail.product_id, 'window': window},
+                quantity,
+                field='quantity'
+            )
+
+    sales_changed(order_detail.product_id)
+
+
+def apply_status_change(order_detail, previous_status):
+    """
+    Cập nhật bộ đếm khi trạng thái OrderDetail thay đổi:
+    - Chuyển sang 'shipped': cộng số lượng.
+    - Rời khỏi 'shipped': trừ số lượng.
+    """
+    was_shipped = previous_status == SHIPPED_STATUS
+    is_shipped = order_detail.order_status == SHIPPED_STATUS
+
+    if is_shipped and not was_shipped:
+        record_sale(order_detail, sign=1)
+    elif was_shipped and not is_shipped:
+        record_sale(order_detail, sign=-1)
+
+
+def compact_sales_buckets(now=None):
+    """
+    Gộp các bucket theo giờ cũ hơn HOURLY_RETENTION thành bucket theo ngày
+    và xóa các bucket nằm ngoài cửa sổ dài nhất. Trả về (số dòng đã gộp, số dòng đã xóa).
+    """
+    now = now or timezone.now()
+    longest = max(TRENDING_WINDOWS.values())
+    expire_before = hour_bucket(now - longest)
+    compact_before = (now - HOURLY_RETENTION).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    with transaction.atomic():
+        deleted, _ = ProductSalesBucket.objects.filter(bucket_start__lt=expire_before).delete()
+
+        old_buckets = list(
+            ProductSalesBucket.objects.select_for_update()
+            .filter(bucket_start__lt=compact_before)
+            .values_list('id', 'product_id', 'bucket_start', 'quantity')
+        )
+        # Bucket đã nằm đúng mốc đầu ngày và là duy nhất trong ngày thì không cần gộp
+        daily = {}
+        for _, product_id, bucket_start, quantity in old_buckets:
+            day = bucket_start.replace(hour=0, minute=0, second=0, microsecond=0)
+            daily.setdefault((product_id, day), []).append((bucket_start, quantity))
+
+        to_delete, to_create = [], []
+        for (product_id, day), rows in daily.items():
+            if len(rows) == 1 and rows[0][0] == day:
+                continue
+            to_create.append(ProductSalesBucket(
+                product_id=product_id, bucket_start=day, quantity=sum(q for _, q in rows)
+            ))
+        merged_keys = {(b.product_id, b.bucket_start) for b in to_create}
+        for bucket_id, product_id, bucket_start, _ in old_buckets:
+            day = bucket_start.replace(hour=0, minute=0, second=0, microsecond=0)
+            if (product_id, day) in merged_keys:
+                to_delete.append(bucket_id)
+
+        ProductSalesBucket.objects.filter(id__in=to_delete).delete()
+        ProductSalesBucket.objects.bulk_create(to_create, batch_size=500)
+
+    return len(to_delete), deleted
+
+
+def refresh_trending_scores(now=None):
+    """
+    Tính lại điểm Trendy của mọi cửa sổ từ bảng bucket (loại bỏ phần đã trôi ra khỏi cửa sổ).
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        for window, length in TRENDING_WINDOWS.items():
+            totals = dict(
+                ProductSalesBucket.objects.filter(bucket_start__gte=hour_bucket(now - length))
+                .values_list('product_id').annotate(total=Sum('quantity')).order_by()
+            )
+            TrendingScore.objects.filter(window=window).exclude(product_id__in=list(totals)).delete()
+            TrendingScore.objects.bulk_create(
+                [TrendingScore(product_id=pid, window=window, quantity=total) for pid, total in totals.items()],
+                batch_size=500,
+                update_conflicts=True,
+                unique_fields=['product', 'window'],
+                update_fields=['quantity', 'updated_at'],
+            )
+        bump_version_on_commit(TRENDING_SCOPE)
@@ -0,0 +1,49 @@
+import unicodedata
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db.models import F, Value
+
+from .models import Product
+
+# Dùng cấu hình 'simple' (không stemming) vì tiếng Việt không có dictionary có sẵn trong Postgres
+SEARCH_CONFIG = 'simple'
+
+
+def fold_text(text):
+    """
+    Chuẩn hóa chuỗi để tìm kiếm: bỏ dấu tiếng Việt và chuyển về chữ thường.
+    Ví dụ: "Áo thun Đẹp" -> "ao thun dep".
+    """
+    if not text:
+        return ''
+    # 'đ'/'Đ' không phải ký tự tổ hợp nên NFD không tách được dấu -> thay thủ công
+    text = text.replace('đ', 'd').replace('Đ', 'D')
+    decomposed = unicodedata.normalize('NFD', text)
+    stripped = ''.join(ch for ch in decomposed if unicodedata.category(ch) != 'Mn')
+    return unicodedata.normalize('NFC', stripped).lower()
+
+
+def build_search_vector(product_name, description):
+    """tsvector từ tên (trọng số A) và mô tả (trọng số B) đã bỏ dấu."""
+    return (
+        SearchVector(Value(fold_text(product_name)), config=SEARCH_CONFIG, weight='A')
+        + SearchVector(Value(fold_text(description)), config=SEARCH_CONFIG, weight='B')
+    )
+
+
+def update_search_vector(product):
+    """Cập nhật cột search_vector của một sản phẩm (gọi sau khi tạo/sửa tên hoặc mô tả)."""
+    Product.objects.filter(pk=product.pk).update(
+        search_vector=build_search_vector(product.product_name, product.description)
+    )
+
+
+def search_products(queryset, query):
+    """
+    Lọc và chấm điểm sản phẩm theo từ khóa (đã bỏ dấu), dùng GIN index trên search_vector.
+    Trả về queryset có annotate 'rank'.
+    """
+    search_query = SearchQuery(fold_text(query), config=SEARCH_CONFIG, search_type='websearch')
+    return queryset.filter(search_vector=search_query).annotate(
+        rank=SearchRank(F('search_vector'), search_query)
+    )
@@ -1,10 +1,16 @@
 from rest_framework import serializers
+from drf_spectacular.utils import extend_schema_field
+from django.core.exceptions import ObjectDoesNotExist
 from django.db import transaction
-from django.db.models import Sum
 from .models import Product, ProductImage, ProductVariant
-from .utils import upload_image, rename_product_image
+from .uploads import enqueue_image_upload
+from .ingest import validate_image_dimensions
+from .search import update_search_vector
+from .pricing import update_effective_prices
+from .variants import sync_variants
+from .invalidation import product_changed
+from .derivatives import DERIVATIVE_FORMATS, CARD_SIZE
 from shop.serializers import ShopSerializer
-from order.models import OrderDetail
 import json
 from django.conf import settings
 
@@ -14,31 +20,77 @@ class ProductVariantSerializer(serializers.ModelSerializer):
         model = ProductVariant
         fields = ['id', 'price', 'quantity', 'attributes', 'is_active']
 
+def build_image_url(image_url, request=None):
+    """Chuyển đường dẫn ảnh lưu trong DB thành URL tuyệt đối."""
+    if not image_url:
+        return None
+
+    if image_url.startswith('http'):
+        return image_url
+    if request is not None:
+        return request.build_absolute_uri(image_url)
+
+    base = getattr(settings, 'LOCAL_URL', 'http://localhost:10000').rstrip('/')
+    path = image_url if image_url.startswith('/') else f"/{image_url}"
+    return f"{base}{path}"
+
+
+def derivative_urls(derivatives, request=None, raw=False):
+    """
+    {size: {'width', 'height', 'webp': url, 'jpeg': url}} từ ProductImage.derivatives.
+    raw=True giữ đường dẫn gốc (dùng khi dựng document).
+    """
+    urls = {}
+    for size, entry in (derivatives or {}).items():
+        urls[size] = {'width': entry['width'], 'height': entry['height']}
+        for fmt in DERIVATIVE_FORMATS:
+            url = entry[fmt]['url']
+            urls[size][fmt] = url if raw else build_image_url(url, request)
+    return urls
+
+
+def pick_image_url(image_url, derivatives, size, request=None, fmt='jpeg'):
+    """URL ảnh thu nhỏ kích thước size, không có thì dùng ảnh gốc."""
+    entry = (derivatives or {}).get(size)
+    return build_image_url(entry[fmt]['url'] if entry else image_url, request)
+
+
+class DynamicFieldsMixin:
+    """
+    Cho phép chỉ định tập trường trả về: Serializer(..., fields=['product_id', 'product_name']).
+    Trường không nằm trong danh sách sẽ bị bỏ khỏi output.
+    """
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
 # 2. Serializer cho Image (Hiển thị)
 class ProductImageSerializer(serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
+    derivatives = serializers.SerializerMethodField()
 
     class Meta:
         model = ProductImage
-        fields = ['id', 'image_url', 'file_id', 'order']
+        fields = ['id', 'image_url', 'file_id', 'order', 'status', 'derivatives']
 
     def get_image_url(self, obj):
-            if not obj.image_url:
-                return None
-            
-            if obj.image_url.startswith('http'):
-                return obj.image_url
-            request = self.context.get('request')
-            if request is not None:
-                return request.build_absolute_uri(obj.image_url)
-            
-            base = getattr(settings, 'LOCAL_URL', 'http://localhost:10000').rstrip('/')
-            path = obj.image_url if obj.image_url.startswith('/') else f"/{obj.image_url}"
-            return f"{base}{path}"
+        # Document sản phẩm lưu đường dẫn gốc, URL tuyệt đối được dựng khi trả về
+        if self.context.get('raw_image_urls'):
+            return obj.image_url
+        return build_image_url(obj.image_url, self.context.get('request'))
+
+    @extend_schema_field(serializers.DictField)
+    def get_derivatives(self, obj):
+        """Ảnh thu nhỏ theo kích thước (thumb / card / full), mỗi kích thước có bản WebP và JPEG."""
+        return derivative_urls(obj.derivatives, self.context.get('request'), raw=self.context.get('raw_image_urls', False))
 
 
 # 3. Serializer CHÍNH 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     # --- READ ONLY FIELDS (Để hiển thị ra JSON) ---
     product_id = serializers.IntegerField(source='id', read_only=True)
     images = ProductImageSerializer(many=True, read_only=True)
@@ -67,20 +119,26 @@ class ProductSerializer(serializers.ModelSerializer):
         model = Product
         fields = [
             'product_id', 'product_name', 'description', 
-            'base_price', 'discount', 'category', 'shop',
+            'base_price', 'discount', 'min_effective_price', 'max_effective_price', 'category', 'shop',
             'is_active', 'created_at', 'updated_at',
             'images', 'variants', 'total_sold',           # Output
             'uploaded_images', 'variants_input', 'images_to_delete' # Input
         ]
         read_only_fields = ['shop', 'created_at', 'updated_at']
     
+    def validate_uploaded_images(self, images):
+        # Chặn ảnh có số pixel quá lớn (decompression bomb) trước khi worker giải mã
+        return [validate_image_dimensions(image) for image in images]
+
     def get_total_sold(self, obj):
-        """Tính tổng số lượng sản phẩm đã bán từ các đơn hàng đã giao thành công (shipped)"""
-        total = OrderDetail.objects.filter(
-            product=obj,
-            order_status='shipped'
-        ).aggregate(total=Sum('quantity'))['total']
-        return total if total else 0
+        """
+        Số lượng đã bán (đơn 'shipped'), đọc từ bộ đếm ProductSales.
+        Queryset nên select_related('sales') để không phát sinh thêm query.
+        """
+        try:
+            return obj.sales.total_sold
+        except ObjectDoesNotExist:
+            return 0
 
     def _parse_variant_attributes(self, variants_data):
             """Hỗ trợ parse dữ liệu variant từ JSON string hoặc List."""
@@ -103,12 +161,16 @@ class ProductSerializer(serializers.ModelSerializer):
                 if price is None or price == '':
                     raise serializers.ValidationError({f"variants_input[{index}]": "Thiếu trường 'price'."})
                 
-                parsed_variants.append({
+                parsed = {
+                    'id': variant.get('id'),
                     'price': price,
-                    'quantity': variant.get('quantity', 0),
                     'attributes': variant.get('attributes', {}),
                     'is_active': variant.get('is_active', True)
-                })
+                }
+                # Không gửi quantity thì giữ tồn kho đang có (variant mới mặc định 0)
+                if 'quantity' in variant:
+                    parsed['quantity'] = variant['quantity']
+                parsed_variants.append(parsed)
             return parsed_variants
 
     def create(self, validated_data):
@@ -131,19 +193,20 @@ class ProductSerializer(serializers.ModelSerializer):
                     is_active=True
                 )
             else:
-                for v_data in parsed_variants:
-                    ProductVariant.objects.create(product=product, **v_data)
-
-            # 3. Xử lý Ảnh
-            for image in uploaded_images:
-                file_name = rename_product_image(image.name)
-                upload_res = upload_image(image, file_name)
-                if upload_res:
-                    ProductImage.objects.create(
-                        product=product,
-                        image_url=upload_res['url'],
-                        file_id=upload_res['fileId']
-                    )
+                ProductVariant.objects.bulk_create([
+                    ProductVariant(product=product, **{k: v for k, v in v_data.items() if k != 'id'})
+                    for v_data in parsed_variants
+                ])
+
+            # 3. Xử lý Ảnh: chỉ ghi vào thư mục tạm, worker tải lên storage sau (xem product.uploads)
+            for order, image in enumerate(uploaded_images):
+                enqueue_image_upload(product, image, order=order)
+
+            # 4. Cập nhật chỉ mục tìm kiếm và giá thực trả
+            update_search_vector(product)
+            update_effective_prices([product.id])
+
+            product_changed(product.id)
             
             return product
 
@@ -158,6 +221,10 @@ class ProductSerializer(serializers.ModelSerializer):
                 setattr(instance, attr, value)
             instance.save()
 
+            # Chỉ cập nhật chỉ mục tìm kiếm khi tên/mô tả thay đổi
+            if 'product_name' in validated_data or 'description' in validated_data:
+                update_search_vector(instance)
+
             # 2. Xóa ảnh cũ
             if images_to_delete:
                 if isinstance(images_to_delete, str):
@@ -167,23 +234,61 @@ class ProductSerializer(serializers.ModelSerializer):
                 if isinstance(images_to_delete, list):
                     ProductImage.objects.filter(product=instance, id__in=images_to_delete).delete()
 
-            # 3. Thêm ảnh mới
-            for image in uploaded_images:
-                file_name = rename_product_image(image.name)
-                upload_res = upload_image(image, file_name)
-                if upload_res:
-                    ProductImage.objects.create(
-                        product=instance,
-                        image_url=upload_res['url'],
-                        file_id=upload_res['fileId']
-                    )
-
-            # 4. Cập nhật Variant (Xóa cũ tạo mới nếu có data)
+            # 3. Thêm ảnh mới (xếp hàng tải lên, nối tiếp sau các ảnh đang có)
+            if uploaded_images:
+                next_order = ProductImage.objects.filter(product=instance).count()
+                for offset, image in enumerate(uploaded_images):
+                    enqueue_image_upload(instance, image, order=next_order + offset)
+
+            # 4. Cập nhật Variant: so khớp với variant đang có, chỉ ghi phần thay đổi (giữ nguyên ID)
+            variants_changed = False
             if variants_data is not None:
                 parsed_variants = self._parse_variant_attributes(variants_data)
                 if parsed_variants:
-                    ProductVariant.objects.filter(product=instance).delete()
-                    for v_data in parsed_variants:
-                        ProductVariant.objects.create(product=instance, **v_data)
+                    variants_changed = sync_variants(instance, parsed_variants)
+
+            if variants_changed or 'base_price' in validated_data or 'discount' in validated_data:
+                update_effective_prices([instance.id])
+
+            product_changed(instance.id)
+
+            return instance
+
 
-            return instance
\ No newline at end of file
+# 4. Serializer rút gọn cho thẻ sản phẩm trên lưới (?view=card)
+class ProductCardSerializer(serializers.ModelSerializer):
+    """
+    Chỉ gồm các trường cần để hiển thị thẻ sản phẩm.
+    Queryset cần annotate 'thumbnail_url' (xem product.projections) thay vì prefetch toàn bộ ảnh.
+    """
+    product_id = serializers.IntegerField(source='id', read_only=True)
+    thumbnail = serializers.SerializerMethodField()
+    thumbnail_webp = serializers.SerializerMethodField()
+    total_sold = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Product
+        fields = [
+            'product_id', 'product_name', 'base_price', 'discount', 'min_effective_price',
+            'category', 'thumbnail', 'thumbnail_webp', 'total_sold'
+        ]
+        read_only_fields = fields
+
+    def _thumbnail(self, obj, fmt):
+        # Ảnh cỡ 'card' nếu đã sinh, nếu chưa thì ảnh gốc
+        return pick_image_url(
+            getattr(obj, 'thumbnail_url', None), getattr(obj, 'thumbnail_derivatives', None),
+            CARD_SIZE, self.context.get('request'), fmt=fmt
+        )
+
+    def get_thumbnail(self, obj):
+        return self._thumbnail(obj, 'jpeg')
+
+    def get_thumbnail_webp(self, obj):
+        return self._thumbnail(obj, 'webp')
+
+    def get_total_sold(self, obj):
+        try:
+            return obj.sales.total_sold
+        except ObjectDoesNotExist:
+            return 0
@@ -0,0 +1,186 @@
+# Dọn file ảnh không còn được tham chiếu trên storage (ImageKit / MEDIA_ROOT).
+# - Xóa ProductImage / ImageUploadJob (kể cả xóa dây chuyền khi xóa Product) -> xếp file vào StorageDeletion
+#   trong cùng transaction (rollback thì không xóa file).
+# - Lệnh sweep_storage xóa hàng loạt theo lô, có giới hạn tốc độ gọi API.
+# - Ảnh dùng chung blob (product.blobs): chỉ giảm ref_count, file chỉ bị xóa khi tham chiếu cuối cùng mất đi.
+# - Lệnh reconcile_storage quét MEDIA_ROOT tìm file không còn dòng nào tham chiếu (dữ liệu cũ, lỗi giữa chừng).
+import os
+import time
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete
+from django.utils import timezone
+
+from .models import ImageBlob, ImageUploadJob, ProductImage, StorageDeletion
+from .utils import LocalImageStorage, get_image_storage, storage_type_of
+
+LOCAL = LocalImageStorage.storage_type
+# Thời gian chờ trước lần thử lại thứ n: RETRY_DELAY * 2 ** (n - 1), tối đa MAX_RETRY_DELAY
+RETRY_DELAY = timedelta(minutes=1)
+MAX_RETRY_DELAY = timedelta(hours=6)
+# Dòng đã được một sweeper nhận sẽ bị ẩn trong khoảng này (sweeper chết thì dòng tự xuất hiện lại)
+CLAIM_LEASE = timedelta(minutes=10)
+# Thư mục trong MEDIA_ROOT chứa ảnh sản phẩm (xem product.utils / product.uploads)
+RECONCILE_DIRECTORIES = ('products', 'uploads/staging')
+
+
+def file_refs(image_url, file_id, derivatives):
+    """Các file (storage_type, file_id) của một ảnh: ảnh gốc và các ảnh thu nhỏ."""
+    refs = []
+    if file_id:
+        refs.append((storage_type_of(image_url), file_id))
+    for entry in (derivatives or {}).values():
+        for value in entry.values():
+            if isinstance(value, dict) and value.get('file_id'):
+                refs.append((storage_type_of(value['url']), value['file_id']))
+    return refs
+
+
+def enqueue_deletions(refs):
+    """Xếp hàng xóa các file (storage_type, file_id); file đã có trong hàng đợi thì bỏ qua."""
+    StorageDeletion.objects.bulk_create(
+        [StorageDeletion(storage_type=storage_type, file_id=file_id) for storage_type, file_id in set(refs)],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+def release_blob(blob_id):
+    """Giảm ref_count của blob; tham chiếu cuối cùng -> xóa blob và xếp file của nó vào hàng đợi xóa."""
+    with transaction.atomic():
+        blob = ImageBlob.objects.select_for_update().filter(id=blob_id).first()
+        if blob is None:
+            return
+        if blob.ref_count > 1:
+            ImageBlob.objects.filter(id=blob.id).update(ref_count=F('ref_count') - 1)
+            return
+        blob.delete()
+        enqueue_deletions(file_refs(blob.image_url, blob.file_id, blob.derivatives))
+
+
+def _image_deleted(sender, instance, **kwargs):
+    if instance.blob_id:
+        # File thuộc blob, có thể đang được ảnh khác dùng
+        release_blob(instance.blob_id)
+        return
+    enqueue_deletions(file_refs(instance.image_url, instance.file_id, instance.derivatives))
+
+
+def _upload_job_deleted(sender, instance, **kwargs):
+    # Bản tạm trong MEDIA_ROOT/uploads/staging (job xong hoặc ảnh bị xóa)
+    enqueue_deletions([(LOCAL, instance.staged_path)])
+
+
+def connect_signals():
+    post_delete.connect(_image_deleted, sender=ProductImage, dispatch_uid='product_image_storage_gc')
+    post_delete.connect(_upload_job_deleted, sender=ImageUploadJob, dispatch_uid='upload_job_storage_gc')
+
+
+def _claim(storage_type, limit):
+    now = timezone.now()
+    with transaction.atomic():
+        rows = list(
+            StorageDeletion.objects.select_for_update(skip_locked=True)
+            .filter(storage_type=storage_type, available_at__lte=now)
+            .order_by('available_at', 'id')[:limit]
+        )
+        StorageDeletion.objects.filter(id__in=[row.id for row in rows]).update(available_at=now + CLAIM_LEASE)
+    return rows
+
+
+def _retry(rows, error):
+    for row in rows:
+        delay = min(RETRY_DELAY * 2 ** row.attempts, MAX_RETRY_DELAY)
+        StorageDeletion.objects.filter(id=row.id).update(
+            attempts=row.attempts + 1, last_error=error, available_at=timezone.now() + delay
+        )
+
+
+def sweep_deletions(storage_types=None, batch_size=None, max_requests_per_second=2.0):
+    """
+    Xóa các file đến hạn trong StorageDeletion, mỗi lô một lần gọi delete_many,
+    tối đa max_requests_per_second lô mỗi giây. Chạy đến khi hết dòng đến hạn.
+    Trả về {'deleted': n, 'failed': n}.
+    """
+    interval = 1.0 / max_requests_per_second if max_requests_per_second else 0
+    report = {'deleted': 0, 'failed': 0}
+    storage_types = storage_types or list(
+        StorageDeletion.objects.order_by().values_list('storage_type', flat=True).distinct()
+    )
+
+    for storage_type in storage_types:
+        storage = get_image_storage(storage_type)
+        limit = min(batch_size or storage.max_delete_batch, storage.max_delete_batch)
+        last_request = 0.0
+        while True:
+            rows = _claim(storage_type, limit)
+            if not rows:
+                break
+
+            wait = interval - (time.monotonic() - last_request)
+            if wait > 0:
+                time.sleep(wait)
+            last_request = time.monotonic()
+
+            try:
+                storage.delete_many([row.file_id for row in rows])
+            except Exception as exc:
+                _retry(rows, str(exc))
+                report['failed'] += len(rows)
+                continue
+            StorageDeletion.objects.filter(id__in=[row.id for row in rows]).delete()
+            report['deleted'] += len(rows)
+    return report
+
+
+def referenced_local_files():
+    """Tập đường dẫn (trong default_storage) của mọi file local đang được ProductImage / ImageUploadJob dùng."""
+    referenced = set()
+    images = ProductImage.objects.values_list('image_url', 'file_id', 'derivatives').iterator(chunk_size=2000)
+    for image_url, file_id, derivatives in images:
+        referenced.update(
+            ref_id for storage_type, ref_id in file_refs(image_url, file_id, derivatives) if storage_type == LOCAL
+        )
+    referenced.update(ImageUploadJob.objects.values_list('staged_path', flat=True).iterator(chunk_size=2000))
+    return referenced
+
+
+def reconcile_local_storage(min_age=timedelta(days=1), dry_run=False):
+    """
+    Quét các thư mục ảnh trong MEDIA_ROOT, file không được tham chiếu và cũ hơn min_age
+    (tránh đụng file vừa ghi nhưng chưa commit) được xếp hàng xóa.
+    Trả về {'scanned': n, 'orphaned': n}.
+    """
+    referenced = referenced_local_files()
+    cutoff = time.time() - min_age.total_seconds()
+    report = {'scanned': 0, 'orphaned': 0}
+    orphans = []
+
+    for directory in RECONCILE_DIRECTORIES:
+        root = default_storage.path(directory)
+        if not os.path.isdir(root):
+            continue
+        # scandir đọc thư mục tuần tự, không dựng cả danh sách file trong bộ nhớ
+        with os.scandir(root) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                report['scanned'] += 1
+                name = f"{directory}/{entry.name}"
+                # Bản nén sẵn (lệnh compress_media) sống cùng file gốc
+                original = name.rsplit('.', 1)[0] if name.endswith(('.gz', '.br')) else name
+                if original in referenced or entry.stat().st_mtime > cutoff:
+                    continue
+                report['orphaned'] += 1
+                orphans.append((LOCAL, name))
+                if len(orphans) >= 1000:
+                    if not dry_run:
+                        enqueue_deletions(orphans)
+                    orphans = []
+
+    if orphans and not dry_run:
+        enqueue_deletions(orphans)
+    return report
@@ -0,0 +1,517 @@
+import hashlib
+import io
+import tempfile
+from unittest import mock, skipUnless
+from datetime import datetime, timezone
+from decimal import Decimal
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.http import QueryDict
+from django.test import SimpleTestCase, TestCase, override_settings, skipUnlessDBFeature
+from PIL import Image
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.decorators import api_view
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory
+from .models import ImageBlob, ImageUploadJob, Product, ProductImage, ProductVariant, StorageDeletion
+from .pagination import KeysetPagination
+from .search import fold_text
+from .filters import apply_product_filters, compute_facets, parse_product_filters
+from .projections import ProductProjection
+from .serializers import ProductSerializer, ProductCardSerializer
+from .recommendations import compute_neighbors
+from .bulk_import import BulkProductRowSerializer, iter_rows
+from .variants import diff_variants
+from .utils import LocalImageStorage
+from .derivatives import render_derivatives
+from .ingest import BoundedHashingUploadHandler, UploadTooLarge
+from .storage_gc import file_refs
+from .blobs import upload_digest
+from .uploads import MAX_ATTEMPTS, PROCESSING_LEASE, RETRY_DELAY, claim_jobs, enqueue_image_upload, process_job, retry_failed_jobs
+from .pricing import update_effective_prices
+from category.models import Category
+from shop.models import Shop
+from user.models import User
+from backend.response_cache import bump_version, cache_response, get_versions
+
+
+class KeysetPaginationTest(SimpleTestCase):
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.paginator = KeysetPagination(ordering=('-created_at', '-id'))
+
+    def test_cursor_round_trip(self):
+        """
+        Cursor mã hóa rồi giải mã phải trả lại đúng giá trị (kể cả datetime).
+        """
+        created_at = datetime(2026, 1, 2, 3, 4, 5, 678901, tzinfo=timezone.utc)
+        cursor = self.paginator.encode_cursor([created_at, 42])
+
+        request = Request(self.factory.get('/', {'cursor': cursor}))
+        values = self.paginator.decode_cursor(request, Product.objects.all())
+
+        self.assertEqual(values, [created_at, 42])
+
+    def test_invalid_cursor(self):
+        """
+        Cursor không hợp lệ phải trả về lỗi 404 thay vì lỗi hệ thống.
+        """
+        request = Request(self.factory.get('/', {'cursor': 'not-a-cursor'}))
+        with self.assertRaises(NotFound):
+            self.paginator.decode_cursor(request, Product.objects.all())
+
+    def test_page_size_is_capped(self):
+        """
+        page_size do client gửi lên không được vượt quá max_page_size.
+        """
+        request = Request(self.factory.get('/', {'page_size': 100000}))
+        self.assertEqual(self.paginator.get_page_size(request), KeysetPagination.max_page_size)
+
+    def test_keyset_filter(self):
+        """
+        Điều kiện keyset: created_at < v OR (created_at = v AND id < 42).
+        """
+        created_at = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        condition = self.paginator.build_keyset_filter([created_at, 42])
+
+        self.assertEqual(condition.connector, 'OR')
+        self.assertIn(('created_at__lt', created_at), condition.children)
+        self.assertIn(('id__lt', 42), condition.children[1].children)
+
+
+class FoldTextTest(SimpleTestCase):
+
+    def test_fold_vietnamese_diacritics(self):
+        """
+        Chuỗi tiếng Việt có dấu phải được chuẩn hóa về không dấu, chữ thường.
+        """
+        self.assertEqual(fold_text('Áo thun Đẹp'), 'ao thun dep')
+        self.assertEqual(fold_text('Quần jean ỐNG RỘNG'), 'quan jean ong rong')
+
+    def test_fold_empty(self):
+        self.assertEqual(fold_text(None), '')
+
+
+class ProductFilterParsingTest(SimpleTestCase):
+
+    def test_parse_filters(self):
+        """
+        Đọc danh mục (nhiều giá trị), khoảng giá và thuộc tính variant từ query string.
+        """
+        filters = parse_product_filters(QueryDict('category=1,2&category=5&min_price=1000&attr_color=White&attr_type=S'))
+
+        self.assertEqual(filters['category_ids'], [1, 2, 5])
+        self.assertEqual(filters['min_price'], Decimal('1000'))
+        self.assertNotIn('max_price', filters)
+        self.assertEqual(filters['attributes'], {'color': 'White', 'type': 'S'})
+
+    def test_invalid_price(self):
+        with self.assertRaises(ValidationError):
+            parse_product_filters(QueryDict('max_price=abc'))
+
+
+class ProductPriceFilterTest(TestCase):
+
+    def setUp(self):
+        owner = User.objects.create_user(username='seller', email='seller@example.com', password='p')
+        shop = Shop.objects.create(shop_name='S', shop_email='shop@example.com', owner=owner)
+        category = Category.objects.create(category_name='C')
+        self.base_only = Product.objects.create(
+            product_name='Base', description='', base_price=150000, discount=0, category=category, shop=shop
+        )
+        self.with_variant = Product.objects.create(
+            product_name='Variant', description='', base_price=150000, discount=0, category=category, shop=shop
+        )
+        ProductVariant.objects.create(product=self.with_variant, price=300000, quantity=1, attributes={'color': 'red'})
+        update_effective_prices([self.base_only.id, self.with_variant.id])
+
+    def _filter(self, query):
+        return set(apply_product_filters(Product.objects.all(), parse_product_filters(QueryDict(query))))
+
+    def test_product_priced_by_base_price(self):
+        """Sản phẩm không có variant vẫn được lọc theo base_price."""
+        self.assertEqual(self._filter('min_price=100000&max_price=200000'), {self.base_only})
+        self.assertEqual(self._filter('min_price=250000'), {self.with_variant})
+
+    @skipUnless(connection.vendor == 'postgresql', 'FACET_SQL dùng GROUPING SETS / width_bucket của PostgreSQL')
+    def test_price_facet_matches_price_filter(self):
+        facets = compute_facets(Product.objects.all())
+        self.assertEqual(
+            [(bucket['min'], bucket['max'], bucket['count']) for bucket in facets['price_ranges']],
+            [(100000, 200000, 1), (200000, 500000, 1)]
+        )
+
+    @skipUnlessDBFeature('supports_json_field_contains')
+    def test_attribute_and_price_on_same_variant(self):
+        self.assertEqual(self._filter('attr_color=red&max_price=400000'), {self.with_variant})
+        self.assertEqual(self._filter('attr_color=red&max_price=200000'), set())
+
+
+@override_settings(CACHES={
+    alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': alias}
+    for alias in ('default', 'responses', 'shared')
+})
+class ResponseCacheTest(SimpleTestCase):
+
+    def test_cached_until_version_bump(self):
+        """
+        Response được cache theo version của scope; tăng version thì view chạy lại.
+        """
+        calls = []
+
+        @api_view(['GET'])
+        @cache_response('test-view', scopes=['test-scope'])
+        def view(request):
+            calls.append(1)
+            return Response({'count': len(calls)})
+
+        factory = APIRequestFactory()
+        self.assertEqual(view(factory.get('/')).data, {'count': 1})
+        self.assertEqual(view(factory.get('/')).data, {'count': 1})
+        self.assertEqual(view(factory.get('/', {'page_size': 5})).data, {'count': 2})
+
+        bump_version('test-scope')
+        self.assertEqual(view(factory.get('/')).data, {'count': 3})
+
+    def test_bump_version_writes_new_version(self):
+        """Mỗi lần bump là một version mới, kể cả các lần liên tiếp."""
+        seen = {get_versions(['test-scope'])[0]}
+        for _ in range(3):
+            bump_version('test-scope')
+            seen.add(get_versions(['test-scope'])[0])
+        self.assertEqual(len(seen), 4)
+
+
+@override_settings(CACHES={
+    alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': alias}
+    for alias in ('default', 'responses', 'shared')
+})
+class CachedStockTest(TestCase):
+
+    def test_cached_list_reads_current_stock(self):
+        """Danh sách lấy từ cache vẫn trả tồn kho hiện tại của variant."""
+        owner = User.objects.create_user(username='seller', email='seller@example.com', password='p')
+        shop = Shop.objects.create(shop_name='S', shop_email='shop@example.com', owner=owner)
+        category = Category.objects.create(category_name='C')
+        product = Product.objects.create(
+            product_name='Cached', description='', base_price=100000, category=category, shop=shop, is_active=True
+        )
+        variant = ProductVariant.objects.create(product=product, price=100000, quantity=5, attributes={})
+
+        response = self.client.get('/api/products/public/list/')
+        self.assertEqual(response.data['results'][0]['variants'][0]['quantity'], 5)
+
+        # Ghi thẳng DB, không tăng version: tên vẫn lấy từ cache, tồn kho thì không
+        Product.objects.filter(id=product.id).update(product_name='Renamed')
+        ProductVariant.objects.filter(id=variant.id).update(quantity=2)
+        result = self.client.get('/api/products/public/list/').data['results'][0]
+        self.assertEqual(result['product_name'], 'Cached')
+        self.assertEqual(result['variants'][0]['quantity'], 2)
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'default'},
+    'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'shared'},
+    'responses': {
+        'BACKEND': 'backend.cache_backends.TieredCache', 'KEY_PREFIX': 'responses',
+        'OPTIONS': {'SHARED_ALIAS': 'shared', 'LOCAL_TIMEOUT': 60},
+    },
+})
+class RecommendationMetricsTest(TestCase):
+
+    def test_reports_response_cache_counters(self):
+        """Mục 'cache' lấy bộ đếm L1/L2 của cache response (TieredCache)."""
+        admin = User.objects.create_user(username='admin', email='admin@example.com', password='p', is_staff=True)
+        client = APIClient()
+        client.force_authenticate(admin)
+        client.get('/api/products/public/list/')
+        client.get('/api/products/public/list/')
+
+        stats = client.get('/shopadmin/recommendation-metrics/').data['cache']
+        self.assertEqual((stats['local_hits'], stats['misses']), (1, 1))
+
+
+class ProductProjectionTest(SimpleTestCase):
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+
+    def test_sparse_fields(self):
+        """
+        ?fields= chỉ giữ lại các trường được yêu cầu trong output.
+        """
+        request = Request(self.factory.get('/', {'fields': 'product_id,product_name'}))
+        serializer = ProductProjection.from_request(request).get_serializer([], many=True)
+
+        self.assertIsInstance(serializer.child, ProductSerializer)
+        self.assertEqual(set(serializer.child.fields), {'product_id', 'product_name'})
+
+    def test_card_view(self):
+        request = Request(self.factory.get('/', {'view': 'card'}))
+        serializer = ProductProjection.from_request(request).get_serializer([], many=True)
+        self.assertIsInstance(serializer.child, ProductCardSerializer)
+
+    def test_unknown_field(self):
+        request = Request(self.factory.get('/', {'fields': 'product_name,password'}))
+        with self.assertRaises(ValidationError):
+            ProductProjection.from_request(request)
+
+
+class ComputeNeighborsTest(SimpleTestCase):
+
+    def test_cooccurrence_top_k(self):
+        """
+        Sản phẩm được cùng nhiều user mua hơn có score cao hơn; mỗi sản phẩm giữ tối đa top_k neighbor.
+        """
+        # user 1: A, B, C; user 2: A, B; user 3: A, D (A=10, B=20, C=30, D=40)
+        users = [1, 1, 1, 2, 2, 3, 3]
+        products = [10, 20, 30, 10, 20, 10, 40]
+        product_ids, neighbor_ids, scores = compute_neighbors(users, products, top_k=2)
+
+        neighbors_of_a = [int(n) for p, n in zip(product_ids, neighbor_ids) if p == 10]
+        self.assertEqual(len(neighbors_of_a), 2)
+        self.assertEqual(neighbors_of_a[0], 20)
+        self.assertNotIn(10, neighbors_of_a)
+        self.assertTrue(all(0 < score <= 1 for score in scores))
+
+    def test_empty_history(self):
+        product_ids, neighbor_ids, scores = compute_neighbors([], [])
+        self.assertEqual(len(scores), 0)
+
+
+class BulkImportParsingTest(SimpleTestCase):
+
+    def test_csv_rows(self):
+        content = (
+            'product_name,base_price,category,variants,image_urls\n'
+            'Ao,100,1,"[{""price"": 90, ""quantity"": 2}]",https://cdn/a.jpg|/media/b.jpg\n'
+            'Quan,200,1,{bad,\n'
+        ).encode('utf-8')
+        rows = list(iter_rows(io.BytesIO(content), 'csv'))
+
+        self.assertEqual(rows[0][0], 2)
+        self.assertEqual(rows[0][1]['variants'], [{'price': 90, 'quantity': 2}])
+        self.assertEqual(rows[0][1]['image_urls'], ['https://cdn/a.jpg', '/media/b.jpg'])
+        self.assertIsInstance(rows[1][1], ValidationError)
+
+    def test_jsonl_rows_and_validation(self):
+        content = b'{"product_name": "Ao", "base_price": "100", "category": 1}\n\nnot json\n'
+        rows = list(iter_rows(io.BytesIO(content), 'jsonl'))
+        self.assertEqual([line_no for line_no, _ in rows], [1, 3])
+        self.assertIsInstance(rows[1][1], ValidationError)
+
+        serializer = BulkProductRowSerializer(context={'category_ids': {1}})
+        data = serializer.run_validation(rows[0][1])
+        self.assertEqual(data['base_price'], Decimal('100'))
+        self.assertEqual(data['discount'], 0)
+        with self.assertRaises(ValidationError):
+            serializer.run_validation({'product_name': 'Ao', 'base_price': '1', 'category': 2})
+
+
+class DiffVariantsTest(SimpleTestCase):
+
+    def setUp(self):
+        self.red = ProductVariant(id=1, price=Decimal('100.00'), quantity=5, attributes={'color': 'red'}, is_active=True)
+        self.blue = ProductVariant(id=2, price=Decimal('90.00'), quantity=1, attributes={'color': 'blue'}, is_active=True)
+
+    def test_unchanged_variants_are_not_written(self):
+        incoming = [
+            {'price': '100', 'quantity': 5, 'attributes': {'color': 'red'}, 'is_active': True},
+            {'id': 2, 'price': 90, 'quantity': 1, 'attributes': {'color': 'blue'}, 'is_active': True},
+        ]
+        self.assertEqual(diff_variants([self.red, self.blue], incoming), ([], [], []))
+
+    def test_update_create_delete(self):
+        incoming = [
+            {'price': '120', 'quantity': 5, 'attributes': {'color': 'red'}, 'is_active': True},
+            {'price': '70', 'quantity': 2, 'attributes': {'color': 'green'}, 'is_active': True},
+        ]
+        to_create, to_update, to_delete = diff_variants([self.red, self.blue], incoming)
+
+        self.assertEqual([v.attributes for v in to_create], [{'color': 'green'}])
+        self.assertEqual(to_update, [(self.red, ['price'])])
+        self.assertEqual(self.red.price, Decimal('120'))
+        self.assertEqual(to_delete, [2])
+
+    def test_missing_quantity_keeps_stock(self):
+        """Variant gửi lên không kèm quantity thì không ghi đè tồn kho."""
+        incoming = [{'id': 1, 'price': '120', 'attributes': {'color': 'red'}, 'is_active': True}]
+        _, to_update, _ = diff_variants([self.red], incoming)
+
+        self.assertEqual(to_update, [(self.red, ['price'])])
+        self.assertEqual(self.red.quantity, 5)
+
+    def test_foreign_variant_id(self):
+        with self.assertRaises(ValidationError):
+            diff_variants([self.red], [{'id': 99, 'price': 1, 'quantity': 0, 'attributes': {}, 'is_active': True}])
+
+
+class LocalImageStorageTest(SimpleTestCase):
+
+    def test_upload_to_media_root(self):
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            result = LocalImageStorage().upload(ContentFile(b'image-bytes'), 'photo.jpg')
+
+            self.assertEqual(result['storage_type'], 'local')
+            self.assertTrue(result['fileId'].startswith('products/'))
+            self.assertTrue(result['url'].endswith('.jpg'))
+            with default_storage.open(result['fileId'], 'rb') as f:
+                self.assertEqual(f.read(), b'image-bytes')
+
+
+class RenderDerivativesTest(SimpleTestCase):
+
+    def test_sizes_and_formats(self):
+        buffer = io.BytesIO()
+        Image.new('RGBA', (1600, 800), (0, 0, 255, 128)).save(buffer, 'PNG')
+
+        derivatives = render_derivatives(buffer.getvalue())
+
+        self.assertEqual((derivatives['card']['width'], derivatives['card']['height']), (400, 200))
+        self.assertEqual(derivatives['thumb']['width'], 128)
+        with Image.open(io.BytesIO(derivatives['thumb']['jpeg'])) as jpeg:
+            self.assertEqual((jpeg.format, jpeg.mode), ('JPEG', 'RGB'))
+        with Image.open(io.BytesIO(derivatives['full']['webp'])) as webp:
+            self.assertEqual((webp.format, webp.size), ('WEBP', (1200, 600)))
+
+    def test_small_image_is_not_upscaled(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (50, 40)).save(buffer, 'JPEG')
+        self.assertEqual(render_derivatives(buffer.getvalue())['full']['width'], 50)
+
+
+class BoundedHashingUploadHandlerTest(SimpleTestCase):
+
+    def _start(self):
+        handler = BoundedHashingUploadHandler()
+        handler.handle_raw_input(None, {}, None, 'boundary')
+        handler.new_file('uploaded_images', 'a.png', 'image/png', None)
+        return handler
+
+    def test_hash_while_streaming(self):
+        handler = self._start()
+        handler.receive_data_chunk(b'hello ', 0)
+        handler.receive_data_chunk(b'world', 6)
+        uploaded = handler.file_complete(11)
+
+        self.assertEqual(uploaded.sha256, hashlib.sha256(b'hello world').hexdigest())
+        self.assertTrue(uploaded.temporary_file_path())
+        uploaded.close()
+
+    @mock.patch('product.ingest.MAX_IMAGE_BYTES', 8)
+    def test_file_too_large(self):
+        handler = self._start()
+        handler.receive_data_chunk(b'hello ', 0)
+        with self.assertRaises(UploadTooLarge):
+            handler.receive_data_chunk(b'world', 6)
+
+
+class StorageFileRefsTest(SimpleTestCase):
+
+    def test_original_and_derivatives(self):
+        derivatives = {
+            'thumb': {
+                'width': 128, 'height': 96,
+                'webp': {'url': '/media/products/t.webp', 'file_id': 'products/t.webp'},
+                'jpeg': {'url': 'https://ik.imagekit.io/x/t.jpeg', 'file_id': 'ik-thumb'},
+            }
+        }
+        refs = file_refs('https://ik.imagekit.io/x/a.png', 'ik-original', derivatives)
+        self.assertEqual(sorted(refs), [
+            ('cloud', 'ik-original'), ('cloud', 'ik-thumb'), ('local', 'products/t.webp'),
+        ])
+
+    def test_pending_image_has_no_files(self):
+        self.assertEqual(file_refs('/media/uploads/staging/a.png', None, {}), [])
+
+
+class UploadDigestTest(SimpleTestCase):
+
+    def test_uses_handler_digest(self):
+        image = ContentFile(b'abc', name='a.png')
+        image.sha256 = 'precomputed'
+        self.assertEqual(upload_digest(image), 'precomputed')
+
+    def test_hashes_content_and_rewinds(self):
+        image = ContentFile(b'abc' * 100000, name='a.png')
+        self.assertEqual(upload_digest(image), hashlib.sha256(b'abc' * 100000).hexdigest())
+        self.assertEqual(image.read(3), b'abc')
+
+
+class ImageUploadJobTest(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        owner = User.objects.create_user(username='seller', email='seller@example.com', password='p')
+        shop = Shop.objects.create(shop_name='S', shop_email='shop@example.com', owner=owner)
+        category = Category.objects.create(category_name='C')
+        self.product = Product.objects.create(
+            product_name='P', description='', base_price=1000, category=category, shop=shop
+        )
+        buffer = io.BytesIO()
+        Image.new('RGB', (600, 400), (255, 0, 0)).save(buffer, 'PNG')
+        self.image = enqueue_image_upload(self.product, ContentFile(buffer.getvalue(), name='photo.png'))
+
+    def _claim_one(self):
+        jobs = claim_jobs(10)
+        self.assertEqual(len(jobs), 1)
+        return jobs[0]
+
+    def test_claim_and_lease(self):
+        job = self._claim_one()
+        self.assertEqual((job.status, job.attempts), (ImageUploadJob.STATUS_PROCESSING, 1))
+        # Đang xử lý và chưa hết lease: không worker nào nhận lại
+        self.assertEqual(claim_jobs(10), [])
+
+        ImageUploadJob.objects.filter(id=job.id).update(locked_at=job.locked_at - PROCESSING_LEASE)
+        self.assertEqual(self._claim_one().attempts, 2)
+
+    def test_retry_with_backoff_then_fail(self):
+        ImageUploadJob.objects.filter(image=self.image).update(content_hash='0' * 64)
+        job = self._claim_one()
+        claimed_at = job.locked_at
+        self.assertFalse(process_job(job, LocalImageStorage()))
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImageUploadJob.STATUS_PENDING)
+        self.assertGreaterEqual(job.available_at, claimed_at + RETRY_DELAY)
+
+        ImageUploadJob.objects.filter(id=job.id).update(attempts=MAX_ATTEMPTS - 1, available_at=job.created_at)
+        self.assertFalse(process_job(self._claim_one(), LocalImageStorage()))
+        job.refresh_from_db()
+        self.image.refresh_from_db()
+        self.assertEqual(job.status, ImageUploadJob.STATUS_FAILED)
+        self.assertEqual(self.image.status, ProductImage.STATUS_FAILED)
+
+        self.assertEqual(retry_failed_jobs(), 1)
+        self.assertEqual(self._claim_one().attempts, 1)
+
+    def test_success(self):
+        self.assertTrue(process_job(self._claim_one(), LocalImageStorage()))
+
+        self.image.refresh_from_db()
+        self.assertEqual(self.image.status, ProductImage.STATUS_READY)
+        self.assertIn('products/', self.image.image_url)
+        self.assertIn('thumb', self.image.derivatives)
+        self.assertEqual(ImageBlob.objects.get().ref_count, 1)
+        self.assertFalse(ImageUploadJob.objects.exists())
+
+    def test_stale_worker_does_not_overwrite(self):
+        stale = self._claim_one()
+        ImageUploadJob.objects.filter(id=stale.id).update(locked_at=stale.locked_at - PROCESSING_LEASE)
+        self._claim_one()
+
+        self.assertFalse(process_job(stale, LocalImageStorage()))
+        self.image.refresh_from_db()
+        self.assertEqual(self.image.status, ProductImage.STATUS_PENDING)
+        self.assertTrue(ImageUploadJob.objects.filter(status=ImageUploadJob.STATUS_PROCESSING).exists())
+        # File worker cũ vừa tải lên được xếp vào hàng đợi xóa
+        self.assertTrue(StorageDeletion.objects.exists())
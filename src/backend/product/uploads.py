@@ -0,0 +1,315 @@
+# Hàng đợi tải ảnh sản phẩm (lưu trong DB).
+# Request chỉ ghi file vào thư mục tạm của default_storage và tạo ProductImage 'pending' + ImageUploadJob,
+# việc tải lên ImageKit / storage chính do worker (lệnh process_image_uploads) thực hiện ngoài request.
+# Ảnh có nội dung đã từng tải lên (cùng SHA-256) dùng lại file cũ qua ImageBlob, không cần job (product.blobs).
+import hashlib
+import logging
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import ImageBlob, ImageUploadJob, ProductImage
+from .blobs import acquire_blob, apply_blob, register_blob, upload_digest
+from .utils import get_image_storage, rename_product_image
+from .derivatives import DERIVATIVE_FORMATS, get_derivative_pool, render_derivatives
+from .ingest import MAX_IMAGE_BYTES, MAX_IMAGE_PIXELS
+from .invalidation import product_changed
+from .storage_gc import enqueue_deletions, file_refs
+
+logger = logging.getLogger(__name__)
+
+# Thư mục tạm (trong default_storage) chứa ảnh chờ tải lên
+STAGING_DIR = 'uploads/staging'
+# Số lần thử tối đa trước khi đánh dấu thất bại
+MAX_ATTEMPTS = 5
+# Thời gian chờ trước lần thử lại thứ n: RETRY_DELAY * 2 ** (n - 1)
+RETRY_DELAY = timedelta(seconds=30)
+# Job 'processing' quá thời gian này (worker chết giữa chừng) được nhận lại
+PROCESSING_LEASE = timedelta(minutes=10)
+# Số luồng tải lên đồng thời mặc định của một worker
+DEFAULT_CONCURRENCY = 4
+# Thời gian tối đa chờ process con sinh ảnh thu nhỏ (giây)
+DERIVATIVE_TIMEOUT = 60
+
+
+def enqueue_image_upload(product, image_file, order=0):
+    """
+    Đưa ảnh vào thư mục tạm và xếp hàng tải lên. File upload đã nằm trên đĩa (product.ingest)
+    nên FileSystemStorage chỉ cần di chuyển file, không copy qua bộ nhớ.
+    Trong lúc chờ, image_url trỏ tới bản tạm để sản phẩm vẫn hiển thị được ảnh.
+    Nội dung đã có blob: tạo ảnh 'ready' dùng chung file của blob, không ghi file và không tạo job.
+    """
+    content_hash = upload_digest(image_file)
+    blob = acquire_blob(content_hash)
+    if blob is not None:
+        image = ProductImage(product=product, order=order, status=ProductImage.STATUS_READY)
+        apply_blob(image, blob)
+        image.save()
+        return image
+
+    file_name = rename_product_image(image_file.name)
+    staged_path = default_storage.save(f"{STAGING_DIR}/{file_name}", image_file)
+
+    image = ProductImage.objects.create(
+        product=product,
+        image_url=f"{settings.MEDIA_URL}{staged_path}",
+        order=order,
+        status=ProductImage.STATUS_PENDING
+    )
+    ImageUploadJob.objects.create(
+        image=image, staged_path=staged_path, file_name=file_name,
+        content_hash=content_hash
+    )
+    return image
+
+
+def claim_jobs(limit):
+    """
+    Nhận tối đa limit job đến hạn (kể cả job 'processing' đã quá hạn lease).
+    SKIP LOCKED để nhiều worker chạy song song không nhận trùng job.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            ImageUploadJob.objects.select_for_update(skip_locked=True).filter(
+                Q(status=ImageUploadJob.STATUS_PENDING, available_at__lte=now)
+                | Q(status=ImageUploadJob.STATUS_PROCESSING, locked_at__lt=now - PROCESSING_LEASE)
+            ).order_by('available_at', 'id')[:limit]
+        )
+        ImageUploadJob.objects.filter(id__in=[job.id for job in jobs]).update(
+            status=ImageUploadJob.STATUS_PROCESSING, locked_at=now, attempts=F('attempts') + 1
+        )
+    for job in jobs:
+        job.status = ImageUploadJob.STATUS_PROCESSING
+        job.locked_at = now
+        job.attempts += 1
+    return jobs
+
+
+def _owned(job):
+    """
+    Job vẫn thuộc lần nhận này của worker. Quá PROCESSING_LEASE thì worker khác có thể nhận lại job
+    (locked_at / attempts đổi): kết quả của worker cũ không được ghi đè lên kết quả của worker mới.
+    """
+    return ImageUploadJob.objects.filter(
+        id=job.id, status=ImageUploadJob.STATUS_PROCESSING, locked_at=job.locked_at, attempts=job.attempts
+    )
+
+
+def _fail_job(job, error):
+    """
+    Lần thử thất bại: xếp lại với thời gian chờ tăng dần, hoặc đánh dấu 'failed' sau MAX_ATTEMPTS lần.
+    Ảnh 'failed' vẫn trỏ tới bản tạm (người bán còn thấy ảnh) và job được giữ lại để chạy lại bằng
+    retry_failed_jobs (lệnh process_image_uploads --retry-failed); xóa ảnh thì bản tạm được dọn theo job.
+    """
+    if job.attempts >= MAX_ATTEMPTS:
+        with transaction.atomic():
+            if _owned(job).update(status=ImageUploadJob.STATUS_FAILED, last_error=error, locked_at=None):
+                ProductImage.objects.filter(id=job.image_id).update(status=ProductImage.STATUS_FAILED)
+        return
+
+    _owned(job).update(
+        status=ImageUploadJob.STATUS_PENDING,
+        last_error=error,
+        locked_at=None,
+        available_at=timezone.now() + RETRY_DELAY * 2 ** (job.attempts - 1)
+    )
+
+
+def retry_failed_jobs():
+    """Đưa các job 'failed' về hàng đợi (đếm lại số lần thử). Trả về số job."""
+    with transaction.atomic():
+        jobs = ImageUploadJob.objects.filter(status=ImageUploadJob.STATUS_FAILED)
+        ProductImage.objects.filter(upload_job__in=jobs).update(status=ProductImage.STATUS_PENDING)
+        return jobs.update(status=ImageUploadJob.STATUS_PENDING, attempts=0, available_at=timezone.now())
+
+
+def local_source(name):
+    """Đường dẫn file trên đĩa (process con tự đọc) hoặc bytes nếu storage không phải ổ đĩa local."""
+    try:
+        return default_storage.path(name)
+    except NotImplementedError:
+        with default_storage.open(name, 'rb') as f:
+            return f.read()
+
+
+def file_digest(name, chunk_size=64 * 1024):
+    """SHA-256 của file trong default_storage, đọc theo từng chunk (bộ nhớ không phụ thuộc kích thước file)."""
+    digest = hashlib.sha256()
+    with default_storage.open(name, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def store_derivatives(rendered, file_name, storage):
+    """Tải các ảnh thu nhỏ đã sinh (render_derivatives) lên storage, trả về giá trị cho ProductImage.derivatives."""
+    base_name = file_name.rsplit('.', 1)[0]
+    derivatives = {}
+    for size, data in rendered.items():
+        entry = {'width': data['width'], 'height': data['height']}
+        for fmt in DERIVATIVE_FORMATS:
+            result = storage.upload(ContentFile(data[fmt]), f"{base_name}_{size}.{fmt}")
+            entry[fmt] = {'url': result['url'], 'file_id': result['fileId']}
+        derivatives[size] = entry
+    return derivatives
+
+
+def process_job(job, storage=None):
+    """
+    Tải một ảnh từ thư mục tạm lên storage chính, kèm các ảnh thu nhỏ (sinh trong process pool).
+    Trả về True nếu thành công.
+    """
+    storage = storage or get_image_storage()
+    try:
+        if job.content_hash and file_digest(job.staged_path) != job.content_hash:
+            raise ValueError("File tạm không khớp SHA-256 lúc upload.")
+        # Sinh ảnh thu nhỏ (CPU) song song với việc tải ảnh gốc (I/O)
+        rendering = get_derivative_pool().submit(
+            render_derivatives, local_source(job.staged_path), MAX_IMAGE_PIXELS
+        )
+        with default_storage.open(job.staged_path, 'rb') as staged:
+            result = storage.upload(staged, job.file_name)
+    except Exception as exc:
+        logger.warning("Tải ảnh %s thất bại (lần %s)", job.image_id, job.attempts, exc_info=True)
+        _fail_job(job, str(exc))
+        return False
+
+    try:
+        derivatives = store_derivatives(rendering.result(timeout=DERIVATIVE_TIMEOUT), job.file_name, storage)
+    except Exception:
+        # Không sinh được ảnh thu nhỏ (ảnh hỏng, định dạng lạ...) vẫn dùng ảnh gốc
+        logger.exception("Lỗi sinh ảnh thu nhỏ cho ảnh %s", job.image_id)
+        derivatives = {}
+
+    with transaction.atomic():
+        image = ProductImage.objects.select_for_update().filter(id=job.image_id).first()
+        # Ảnh có thể đã bị người bán xóa trong lúc tải (job bị xóa theo),
+        # hoặc job đã bị worker khác nhận lại khi hết lease: bỏ file vừa tải, không ghi đè
+        if image is not None and _owned(job).select_for_update().exists():
+            image.image_url = result['url']
+            image.file_id = result['fileId']
+            image.status = ProductImage.STATUS_READY
+            image.derivatives = derivatives
+            if job.content_hash:
+                blob, created = register_blob(job.content_hash, result['url'], result['fileId'], derivatives)
+                if not created:
+                    # Cùng nội dung vừa được ảnh khác tải lên: dùng file đã có, bỏ file vừa tải
+                    enqueue_deletions(file_refs(result['url'], result['fileId'], derivatives))
+                apply_blob(image, blob)
+            image.save(update_fields=['image_url', 'file_id', 'status', 'derivatives', 'blob'])
+            # Xóa job -> bản tạm được xếp vào hàng đợi dọn dẹp (product.storage_gc)
+            ImageUploadJob.objects.filter(id=job.id).delete()
+            product_changed(image.product_id)
+        else:
+            enqueue_deletions(file_refs(result['url'], result['fileId'], derivatives))
+            return False
+    return True
+
+
+def _process_in_thread(job, storage):
+    # Mỗi thread có kết nối DB riêng: đóng kết nối hết hạn trước/sau khi dùng
+    close_old_connections()
+    try:
+        return process_job(job, storage)
+    finally:
+        close_old_connections()
+
+
+def run_upload_worker(concurrency=DEFAULT_CONCURRENCY, once=False, poll_interval=2.0, processes=None):
+    """
+    Vòng lặp worker: nhận job theo lô và tải lên bằng tối đa 'concurrency' luồng
+    (dùng chung một client storage), ảnh thu nhỏ sinh trong pool 'processes' process.
+    once=True: dừng khi hết job đến hạn. Trả về (số ảnh thành công, số lần thất bại).
+    """
+    storage = get_image_storage()
+    get_derivative_pool(processes)
+    succeeded = failed = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        while True:
+            jobs = claim_jobs(concurrency)
+            if not jobs:
+                if once:
+                    break
+                time.sleep(poll_interval)
+                continue
+            for ok in pool.map(lambda job: _process_in_thread(job, storage), jobs):
+                if ok:
+                    succeeded += 1
+                else:
+                    failed += 1
+    return succeeded, failed
+
+
+def _image_source(image):
+    # Ảnh gốc của ProductImage đã có: file trong MEDIA_ROOT (local) hoặc tải về từ URL (cloud)
+    if image.file_id and default_storage.exists(image.file_id):
+        return local_source(image.file_id)
+    if image.image_url.startswith(settings.MEDIA_URL):
+        return local_source(image.image_url[len(settings.MEDIA_URL):])
+    with urllib.request.urlopen(image.image_url, timeout=30) as response:
+        data = response.read(MAX_IMAGE_BYTES + 1)
+    if len(data) > MAX_IMAGE_BYTES:
+        raise ValueError("Ảnh gốc vượt quá dung lượng cho phép.")
+    return data
+
+
+def backfill_derivatives(batch_size=50, processes=None):
+    """
+    Sinh ảnh thu nhỏ cho các ảnh đã có từ trước (derivatives rỗng).
+    Mỗi lô được render song song trong process pool. Trả về (số ảnh thành công, số ảnh lỗi).
+    Ảnh dùng chung blob: ảnh thu nhỏ ghi vào blob và chép sang mọi ảnh của blob (chỉ sinh một lần).
+    """
+    storage = get_image_storage()
+    pool = get_derivative_pool(processes)
+    succeeded = failed = 0
+    last_id = 0
+    done_blobs = set()
+    while True:
+        images = list(
+            ProductImage.objects.filter(status=ProductImage.STATUS_READY, derivatives={}, id__gt=last_id)
+            .order_by('id')[:batch_size]
+        )
+        if not images:
+            break
+        last_id = images[-1].id
+        images = [image for image in images if image.blob_id is None or image.blob_id not in done_blobs]
+        done_blobs.update(image.blob_id for image in images if image.blob_id)
+
+        renderings = []
+        for image in images:
+            try:
+                renderings.append(pool.submit(render_derivatives, _image_source(image), MAX_IMAGE_PIXELS))
+            except Exception as exc:
+                renderings.append(exc)
+
+        for image, rendering in zip(images, renderings):
+            try:
+                if isinstance(rendering, Exception):
+                    raise rendering
+                file_name = image.image_url.rsplit('/', 1)[-1]
+                image.derivatives = store_derivatives(rendering.result(timeout=DERIVATIVE_TIMEOUT), file_name, storage)
+            except Exception:
+                logger.exception("Lỗi sinh ảnh thu nhỏ cho ảnh %s", image.id)
+                failed += 1
+                continue
+            with transaction.atomic():
+                if image.blob_id:
+                    ImageBlob.objects.filter(id=image.blob_id).update(derivatives=image.derivatives)
+                    shared = ProductImage.objects.filter(blob_id=image.blob_id)
+                    shared.update(derivatives=image.derivatives)
+                    for product_id in set(shared.values_list('product_id', flat=True)):
+                        product_changed(product_id)
+                else:
+                    image.save(update_fields=['derivatives'])
+                    product_changed(image.product_id)
+            succeeded += 1
+    return succeeded, failed
@@ -3,10 +3,16 @@ import uuid
 from django.utils.deconstruct import deconstructible
 from django.utils import timezone
 from imagekitio import ImageKit
+from imagekitio.constants.url import URL as IMAGEKIT_URL
 from django.conf import settings
-import base64
+import requests
+from requests_toolbelt import MultipartEncoder
 from django.core.files.storage import default_storage
 
+IMAGEKIT_UPLOAD_BASE_URL = IMAGEKIT_URL.UPLOAD_BASE_URL
+IMAGEKIT_API_BASE_URL = IMAGEKIT_URL.API_BASE_URL
+
+
 def rename_product_image(filename):
     ext = filename.split('.')[-1]
 
@@ -16,62 +22,114 @@ def rename_product_image(filename):
 
 
 
-def upload_image(file_obj, file_name):
-    storage_setting = str(settings.USE_CLOUD_STORAGE).upper().strip()
-    # --- TRƯỜNG HỢP 1: LƯU LÊN CLOUD (IMAGEKIT) ---
-    if storage_setting == 'TRUE':
-        try:
-
-            imagekit = ImageKit(
-                private_key=settings.IMAGEKIT_PRIVATE_KEY,
-                public_key=settings.IMAGEKIT_PUBLIC_KEY,
-                url_endpoint=settings.IMAGEKIT_URL_ENDPOINT
-            )
-            
-            if hasattr(file_obj, 'seek'): file_obj.seek(0)
-            file_content = file_obj.read()
-            file_base64 = base64.b64encode(file_content).decode('utf-8')
-
-            result = imagekit.upload_file(
-                file=file_base64, 
-                file_name=file_name
-            )
-            
-
-            url = result.url if hasattr(result, 'url') else result.get('url')
-            file_id = result.file_id if hasattr(result, 'file_id') else result.get('fileId')
-            
-            return {
-                'url': url,
-                'fileId': file_id,
-                'storage_type': 'cloud'
-            }
-        except Exception as e:
-            return None
-
-    # --- TRƯỜNG HỢP 2: LƯU TRÊN MÁY (LOCAL) ---
-    else:
-        try:
-
-            
-            # 1. Đảm bảo tên file không trùng (thêm UUID)
-            ext = file_name.split('.')[-1]
-            new_filename = f"{uuid.uuid4().hex}.{ext}"
-            save_path = f"products/{new_filename}" # Lưu vào thư mục media/products/
-
-            # 2. Lưu file vật lý
-            if hasattr(file_obj, 'seek'): file_obj.seek(0)
-            
-            path = default_storage.save(save_path, file_obj)
-            
-            # 3. Tạo URL đầy đủ
-            full_url = f"{settings.MEDIA_URL}{path}"
-
-            return {
-                'url': full_url,
-                'fileId': path,
-                'storage_type': 'local'
-            }
-        except Exception as e:
-            print(f"Lỗi Lưu Local: {e}")
-            return None
\ No newline at end of file
+class ImageKitStorage:
+    """
+    Tải ảnh lên ImageKit. Client và HTTP session (giữ kết nối) được tạo một lần và dùng lại cho mọi lần tải.
+    Body multipart được stream từ file (MultipartEncoder) thay vì đọc cả file + base64 vào bộ nhớ.
+    """
+    storage_type = 'cloud'
+    upload_url = f"{IMAGEKIT_UPLOAD_BASE_URL}/api/v1/files/upload"
+    timeout = 120
+
+    def __init__(self):
+        self.client = ImageKit(
+            private_key=settings.IMAGEKIT_PRIVATE_KEY,
+            public_key=settings.IMAGEKIT_PUBLIC_KEY,
+            url_endpoint=settings.IMAGEKIT_URL_ENDPOINT
+        )
+        self.session = requests.Session()
+
+    def upload(self, file_obj, file_name):
+        if hasattr(file_obj, 'seek'): file_obj.seek(0)
+        body = MultipartEncoder(fields={
+            'file': (file_name, file_obj, 'application/octet-stream'),
+            'fileName': file_name,
+        })
+        headers = {**self.client.ik_request.create_headers(), 'Content-Type': body.content_type}
+
+        response = self.session.post(self.upload_url, data=body, headers=headers, timeout=self.timeout)
+        response.raise_for_status()
+        result = response.json()
+
+        return {
+            'url': result.get('url'),
+            'fileId': result.get('fileId'),
+            'storage_type': self.storage_type
+        }
+
+    # Số fileId tối đa trong một lần gọi API xóa hàng loạt của ImageKit
+    max_delete_batch = 100
+    delete_url = f"{IMAGEKIT_API_BASE_URL}/v1/files{IMAGEKIT_URL.BULK_FILE_DELETE}"
+
+    def delete_many(self, file_ids):
+        """Xóa nhiều file bằng một request. File không còn tồn tại được coi là đã xóa."""
+        file_ids = list(file_ids)
+        if not file_ids:
+            return
+        response = self.session.post(
+            self.delete_url, json={'fileIds': file_ids},
+            headers=self.client.ik_request.create_headers(), timeout=self.timeout
+        )
+        if response.status_code == 404:
+            # Cả lô bị từ chối nếu có fileId không tồn tại: bỏ các ID đó rồi gửi lại phần còn lại
+            missing = set(response.json().get('missingFileIds', []))
+            if missing:
+                return self.delete_many([file_id for file_id in file_ids if file_id not in missing])
+        response.raise_for_status()
+
+
+class LocalImageStorage:
+    """Lưu ảnh vào MEDIA_ROOT/products/ (chế độ chạy local, cũng dùng thay ImageKit khi test)."""
+    storage_type = 'local'
+
+    def upload(self, file_obj, file_name):
+        # 1. Đảm bảo tên file không trùng (thêm UUID)
+        ext = file_name.split('.')[-1]
+        new_filename = f"{uuid.uuid4().hex}.{ext}"
+        save_path = f"products/{new_filename}" # Lưu vào thư mục media/products/
+
+        # 2. Lưu file vật lý
+        if hasattr(file_obj, 'seek'): file_obj.seek(0)
+
+        path = default_storage.save(save_path, file_obj)
+
+        # 3. Tạo URL đầy đủ
+        full_url = f"{settings.MEDIA_URL}{path}"
+
+        return {
+            'url': full_url,
+            'fileId': path,
+            'storage_type': self.storage_type
+        }
+
+    max_delete_batch = 1000
+
+    def delete_many(self, file_ids):
+        # FileSystemStorage.delete bỏ qua file không tồn tại
+        for file_id in file_ids:
+            default_storage.delete(file_id)
+
+
+IMAGE_STORAGES = {
+    ImageKitStorage.storage_type: ImageKitStorage,
+    LocalImageStorage.storage_type: LocalImageStorage,
+}
+_image_storages = {}
+
+
+def get_image_storage(storage_type=None):
+    """
+    Storage ảnh theo loại ('cloud' / 'local'), mặc định theo USE_CLOUD_STORAGE.
+    Mỗi loại chỉ tạo một lần cho mỗi process.
+    """
+    if storage_type is None:
+        storage_setting = str(settings.USE_CLOUD_STORAGE).upper().strip()
+        storage_type = ImageKitStorage.storage_type if storage_setting == 'TRUE' else LocalImageStorage.storage_type
+    if storage_type not in _image_storages:
+        _image_storages[storage_type] = IMAGE_STORAGES[storage_type]()
+    return _image_storages[storage_type]
+
+
+def storage_type_of(url):
+    """Loại storage chứa file theo URL đã lưu: file local có URL bắt đầu bằng MEDIA_URL."""
+    return LocalImageStorage.storage_type if url.startswith(settings.MEDIA_URL) else ImageKitStorage.storage_type
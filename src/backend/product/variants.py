@@ -0,0 +1,110 @@
+import json
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework import serializers
+
+from .models import ProductVariant
+
+# Các trường của variant được so sánh / ghi khi cập nhật
+VARIANT_FIELDS = ('price', 'quantity', 'attributes', 'is_active')
+
+
+def attribute_signature(attributes):
+    """Khóa so khớp variant theo thuộc tính (không phụ thuộc thứ tự key)."""
+    return json.dumps(attributes or {}, sort_keys=True, ensure_ascii=False)
+
+
+def _normalize(index, data):
+    # Đưa giá trị client gửi lên về kiểu của model để so sánh với dữ liệu đang lưu.
+    # Trường client không gửi (vd: quantity) thì giữ nguyên giá trị đang lưu.
+    try:
+        return {
+            name: ProductVariant._meta.get_field(name).to_python(data[name])
+            for name in VARIANT_FIELDS if name in data
+        }
+    except DjangoValidationError as exc:
+        raise serializers.ValidationError({f"variants_input[{index}]": exc.messages})
+
+
+def _apply_changes(variant, values, to_update):
+    changed = sorted(name for name, value in values.items() if getattr(variant, name) != value)
+    for name in changed:
+        setattr(variant, name, values[name])
+    if changed:
+        to_update.append((variant, changed))
+
+
+def diff_variants(existing, incoming):
+    """
+    So khớp danh sách variant gửi lên với các variant đang có của sản phẩm:
+    - theo 'id' nếu client gửi kèm, nếu không thì theo chữ ký attributes;
+    - variant khớp mà không đổi gì thì bỏ qua (không ghi).
+    Trả về (to_create, to_update, to_delete): to_create là instance ProductVariant,
+    to_update là danh sách (variant, các trường đã đổi), to_delete là danh sách ID.
+    """
+    by_id = {variant.id: variant for variant in existing}
+    by_signature = {}
+    for variant in existing:
+        by_signature.setdefault(attribute_signature(variant.attributes), []).append(variant)
+
+    matched = set()
+    to_create, to_update = [], []
+
+    # Ghép theo ID trước để variant có ID không bị variant khác "giành" mất qua chữ ký attributes
+    pending = []
+    for index, data in enumerate(incoming):
+        values = _normalize(index, data)
+        if data.get('id') in (None, ''):
+            pending.append(values)
+            continue
+        try:
+            variant = by_id.get(int(data['id']))
+        except (TypeError, ValueError):
+            variant = None
+        if variant is None or variant.id in matched:
+            raise serializers.ValidationError({f"variants_input[{index}]": "Variant không thuộc sản phẩm này."})
+        matched.add(variant.id)
+        _apply_changes(variant, values, to_update)
+
+    for values in pending:
+        candidates = [
+            variant for variant in by_signature.get(attribute_signature(values['attributes']), [])
+            if variant.id not in matched
+        ]
+        if not candidates:
+            to_create.append(ProductVariant(**values))
+            continue
+        variant = candidates[0]
+        matched.add(variant.id)
+        _apply_changes(variant, values, to_update)
+
+    to_delete = [variant.id for variant in existing if variant.id not in matched]
+    return to_create, to_update, to_delete
+
+
+def sync_variants(product, incoming):
+    """
+    Cập nhật variant của sản phẩm theo danh sách mới bằng tối đa 4 câu lệnh ghi
+    (bulk_update, bulk_update quantity, bulk_create, delete), giữ nguyên ID của variant không bị xóa.
+    Trả về True nếu có thay đổi.
+    """
+    # Khóa các variant (theo thứ tự ID như luồng đặt hàng) để tồn kho đọc ra không bị đơn hàng trừ song song
+    existing = list(ProductVariant.objects.select_for_update().filter(product=product).order_by('id'))
+    to_create, to_update, to_delete = diff_variants(existing, incoming)
+
+    # quantity chỉ được ghi cho variant mà client đổi tồn kho, các variant khác giữ số đang có trong DB
+    restocked = [variant for variant, fields in to_update if 'quantity' in fields]
+    if restocked:
+        ProductVariant.objects.bulk_update(restocked, ['quantity'])
+    update_fields = sorted({name for _, fields in to_update for name in fields} - {'quantity'})
+    if update_fields:
+        ProductVariant.objects.bulk_update(
+            [variant for variant, fields in to_update if set(fields) - {'quantity'}], update_fields
+        )
+    if to_create:
+        for variant in to_create:
+            variant.product = product
+        ProductVariant.objects.bulk_create(to_create)
+    if to_delete:
+        ProductVariant.objects.filter(id__in=to_delete).delete()
+    return bool(to_create or to_update or to_delete)
@@ -1,9 +1,7 @@
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import transaction
-from django.db.models import Sum, Count, OuterRef, Subquery, IntegerField
-from django.db.models.functions import Coalesce
-from django.utils import timezone
-from datetime import timedelta
+from django.db.models import Case, IntegerField, Value, When
+from django.utils.decorators import method_decorator
 from rest_framework import serializers, status
 from rest_framework.views import APIView
 from rest_framework.decorators import api_view
@@ -14,37 +12,193 @@ from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from drf_spectacular.utils import extend_schema, OpenApiParameter, inline_serializer
 
-from .models import Product
-from order.models import OrderDetail 
+from .models import Product, ProductVariant, TrendingScore
 from .serializers import ProductSerializer 
+from .pagination import KeysetPagination
+from .sales import TRENDING_WINDOWS, DEFAULT_TRENDING_WINDOW
+from .search import search_products
+from .recommendations import get_user_recommendations
+from .filters import (
+    PRODUCT_FILTER_PARAMETERS, PRODUCT_SORT_PARAMETER,
+    apply_product_filters, parse_product_filters, parse_product_sort, compute_facets
+)
+from .projections import ProductProjection, PROJECTION_PARAMETERS
+from .documents import get_documents, render_document
+from .ingest import BoundedUploadMixin
+from .bulk_import import IMPORT_FORMATS, DEFAULT_CHUNK_SIZE, detect_format, import_products
+from .invalidation import CATALOGUE_SCOPE, TRENDING_SCOPE, product_scope, shop_scope, product_changed, stock_state
+from backend.response_cache import cache_response
+from backend.conditional import conditional_get
 
 # --- CONSTANTS ---
 PRODUCT_NOT_FOUND_MSG = {"error": "Product not found or you do not have permission."}
 
+PAGINATION_PARAMETERS = [
+    OpenApiParameter(name='cursor', type=str, location=OpenApiParameter.QUERY, required=False,
+                     description='Cursor trang tiếp theo (lấy từ trường next_cursor của trang trước)'),
+    OpenApiParameter(name='page_size', type=int, location=OpenApiParameter.QUERY, required=False,
+                     description=f'Số sản phẩm mỗi trang (tối đa {KeysetPagination.max_page_size})'),
+]
+
+
+def product_detail_scopes(request, product_id):
+    """Scope cache của trang chi tiết: bản thân sản phẩm và Shop được nhúng trong response."""
+    shop_id = Product.objects.filter(id=product_id).values_list('shop_id', flat=True).first()
+    return [product_scope(product_id), shop_scope(shop_id)]
+
+
+def product_validators(queryset):
+    """
+    (ETag, Last-Modified) của sản phẩm từ version/updated_at của dòng Product và trạng thái tồn kho
+    trong cache (đặt hàng không ghi dòng Product, xem product.invalidation.stock_changed), hoặc None nếu không tìm thấy.
+    """
+    row = queryset.values_list('id', 'version', 'updated_at').first()
+    if row is None:
+        return None
+    product_id, version, updated_at = row
+    stock_version, stock_changed_at = stock_state(product_id)
+    if stock_changed_at is not None and stock_changed_at > updated_at:
+        updated_at = stock_changed_at
+    return f'product-{product_id}-v{version}-s{stock_version}', updated_at
+
+
+def refresh_stock(data):
+    """
+    Ghi đè quantity của các variant trong response danh sách đã cache bằng tồn kho hiện tại (1 query theo khóa chính).
+    Đặt hàng không tăng CATALOGUE_SCOPE (xem product.invalidation.stock_changed) nên tồn kho không được lấy từ cache.
+    """
+    products = data.get('results', []) if isinstance(data, dict) else data
+    variants = [
+        variant for product in products
+        for variant in product.get('variants') or [] if 'quantity' in variant
+    ]
+    if not variants:
+        return
+    quantities = dict(
+        ProductVariant.objects.filter(id__in={variant['id'] for variant in variants}).values_list('id', 'quantity')
+    )
+    for variant in variants:
+        variant['quantity'] = quantities.get(variant['id'], variant['quantity'])
+
+
+def public_product_validators(request, product_id):
+    return product_validators(Product.objects.filter(id=product_id, is_active=True))
+
+
+def seller_product_validators(request, product_id):
+    return product_validators(Product.objects.filter(id=product_id, shop__owner=request.user))
+
+
+def paginate_products(request, queryset, ordering):
+    """
+    Phân trang keyset rồi serialize theo projection (?view=card / ?fields=...),
+    trả về Response gồm next/next_cursor/results.
+    """
+    projection = ProductProjection.from_request(request)
+    paginator = KeysetPagination(ordering=ordering)
+    page = paginator.paginate_queryset(projection.apply(queryset, ordering), request)
+    return paginator.get_paginated_response(projection.serialize(page, request, many=True))
+
 # ============================================================================
 #                               PUBLIC VIEWS
 # ============================================================================
 
 @extend_schema(
     tags=['Product'],
+    parameters=PAGINATION_PARAMETERS + PRODUCT_FILTER_PARAMETERS + [PRODUCT_SORT_PARAMETER] + PROJECTION_PARAMETERS,
     responses={200: ProductSerializer(many=True)},
     summary="Lấy danh sách tất cả sản phẩm",
-    description="Trả về danh sách toàn bộ sản phẩm, sắp xếp mới nhất lên đầu."
+    description="Trả về danh sách sản phẩm theo trang (cursor), mặc định mới nhất lên đầu (hoặc theo giá với ?sort=). Hỗ trợ lọc theo danh mục, khoảng giá và thuộc tính variant."
 )
 @api_view(['GET'])
+@cache_response('product-list', scopes=[CATALOGUE_SCOPE], refresh=refresh_stock)
 def get_list_of_public_product(request):
     """
     Lấy danh sách tất cả sản phẩm đang hoạt động (Mới nhất lên đầu).
     Chỉ trả về sản phẩm đã được admin duyệt (is_active=True).
     """
-    product_list = Product.objects.filter(
-        is_active=True
-    ).prefetch_related(
-        'variants', 'images', 'category', 'shop'
-    ).order_by('-created_at')
-    
-    serializer = ProductSerializer(product_list, many=True, context={'request': request})
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    product_list = apply_product_filters(
+        Product.objects.filter(is_active=True),
+        parse_product_filters(request.query_params)
+    )
+
+    ordering = parse_product_sort(request.query_params, default=('-created_at', '-id'))
+    return paginate_products(request, product_list, ordering=ordering)
+
+
+@extend_schema(
+    tags=['Product'],
+    parameters=PRODUCT_FILTER_PARAMETERS,
+    responses={
+        200: inline_serializer(
+            name='ProductFacets',
+            fields={
+                'categories': serializers.ListField(child=serializers.DictField()),
+                'attributes': serializers.DictField(child=serializers.ListField(child=serializers.DictField())),
+                'price_ranges': serializers.ListField(child=serializers.DictField()),
+            }
+        )
+    },
+    summary="Thống kê bộ lọc (Facets)",
+    description="Đếm số sản phẩm theo danh mục, theo từng giá trị thuộc tính variant và theo khoảng giá, trên tập sản phẩm đã lọc."
+)
+@api_view(['GET'])
+@cache_response('product-facets', scopes=[CATALOGUE_SCOPE])
+def get_public_product_facets(request):
+    """
+    Facet cho trang danh sách: dùng cùng tham số lọc với public/list/.
+    Chỉ tính trên sản phẩm đã được admin duyệt (is_active=True).
+    """
+    product_list = apply_product_filters(
+        Product.objects.filter(is_active=True),
+        parse_product_filters(request.query_params)
+    )
+    return Response(compute_facets(product_list), status=status.HTTP_200_OK)
+
+
+@extend_schema(
+    tags=['Product'],
+    parameters=[
+        OpenApiParameter(
+            name='q',
+            type=str,
+            location=OpenApiParameter.QUERY,
+            required=True,
+            description='Từ khóa tìm kiếm (không phân biệt dấu, vd: "ao thun" khớp "Áo thun")'
+        ),
+        *PAGINATION_PARAMETERS,
+        *PRODUCT_FILTER_PARAMETERS,
+        PRODUCT_SORT_PARAMETER,
+        *PROJECTION_PARAMETERS
+    ],
+    responses={
+        200: ProductSerializer(many=True),
+        400: inline_serializer(name='ProductSearchError', fields={'error': serializers.CharField()})
+    },
+    summary="Tìm kiếm sản phẩm",
+    description="Tìm kiếm full-text theo tên và mô tả sản phẩm, bỏ qua dấu tiếng Việt. Kết quả xếp theo độ liên quan và phân trang theo cursor."
+)
+@api_view(['GET'])
+@cache_response('product-search', scopes=[CATALOGUE_SCOPE], refresh=refresh_stock)
+def search_public_product(request):
+    """
+    Tìm kiếm sản phẩm đang hoạt động theo tên/mô tả.
+    Chỉ trả về sản phẩm đã được admin duyệt (is_active=True).
+    """
+    query = request.query_params.get('q', '').strip()
+    if not query:
+        return Response({"error": "Missing search keyword 'q'"}, status=status.HTTP_400_BAD_REQUEST)
+
+    product_list = search_products(
+        apply_product_filters(
+            Product.objects.filter(is_active=True),
+            parse_product_filters(request.query_params)
+        ),
+        query
+    )
+
+    ordering = parse_product_sort(request.query_params, default=('-rank', '-id'))
+    return paginate_products(request, product_list, ordering=ordering)
 
 
 @extend_schema(
@@ -55,7 +209,8 @@ def get_list_of_public_product(request):
             type=int, 
             location=OpenApiParameter.PATH, 
             description='ID của sản phẩm cần xem'
-        )
+        ),
+        *PROJECTION_PARAMETERS
     ],
     responses={
         200: ProductSerializer,
@@ -65,87 +220,119 @@ def get_list_of_public_product(request):
         )
     },
     summary="Xem chi tiết sản phẩm",
-    description="Lấy thông tin chi tiết (bao gồm variants, images, shop) của một sản phẩm."
+    description="Lấy thông tin chi tiết (bao gồm variants, images, shop) của một sản phẩm. Hỗ trợ If-None-Match / If-Modified-Since (304 Not Modified)."
 )
 @api_view(['GET'])
+@conditional_get(public_product_validators)
+@cache_response('product-detail', scopes=product_detail_scopes)
 def get_public_product_detail(request, product_id):
     """
     Xem chi tiết một sản phẩm cụ thể.
     Chỉ cho phép xem sản phẩm đã được admin duyệt (is_active=True).
     """
+    projection = ProductProjection.from_request(request)
+
+    if projection.uses_documents:
+        # Đọc thẳng document theo khóa chính, không cần truy vấn Product
+        documents = get_documents([product_id])
+        if not documents or not documents[0].get('is_active'):
+            return Response({"error": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(render_document(documents[0], request), status=status.HTTP_200_OK)
+
     try:
-        product = Product.objects.filter(
-            id=product_id,
-            is_active=True
-        ).prefetch_related('variants', 'images', 'shop', 'category').get()
-        serializer = ProductSerializer(product, context={'request': request})
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        product = projection.apply(Product.objects.filter(id=product_id, is_active=True)).get()
+        return Response(projection.serialize(product, request), status=status.HTTP_200_OK)
     except Product.DoesNotExist:
         return Response({"error": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
 
 
 @extend_schema(
     tags=['Product'],
-    responses={200: ProductSerializer(many=True)},
+    parameters=[
+        OpenApiParameter(
+            name='window',
+            type=str,
+            location=OpenApiParameter.QUERY,
+            required=False,
+            enum=list(TRENDING_WINDOWS),
+            description=f'Cửa sổ thời gian tính bán chạy (mặc định {DEFAULT_TRENDING_WINDOW})'
+        ),
+        *PROJECTION_PARAMETERS
+    ],
+    responses={
+        200: ProductSerializer(many=True),
+        400: inline_serializer(name='TrendyWindowError', fields={'error': serializers.CharField()})
+    },
     summary="Top sản phẩm bán chạy (Trendy)",
-    description="Trả về danh sách 10 sản phẩm có số lượng bán cao nhất trong 7 ngày qua."
+    description="Trả về danh sách 10 sản phẩm có số lượng bán cao nhất trong cửa sổ thời gian (24h/7d/30d, mặc định 7 ngày)."
 )
 @api_view(['GET'])
+@cache_response('product-trendy', scopes=[CATALOGUE_SCOPE, TRENDING_SCOPE], refresh=refresh_stock)
 def get_trendy_product(request):
     """
-    Top 10 sản phẩm bán chạy nhất trong 7 ngày qua.
+    Top 10 sản phẩm bán chạy nhất trong cửa sổ thời gian (mặc định 7 ngày qua).
     Chỉ trả về sản phẩm đã được admin duyệt (is_active=True).
+    Đọc từ bảng TrendingScore đã tính sẵn (xem product.sales), không aggregate OrderDetail.
     """
-    # 1. Xác định mốc thời gian (7 ngày trước)
-    last_week = timezone.now() - timedelta(days=7)
+    # 1. Xác định cửa sổ thời gian
+    window = request.query_params.get('window', DEFAULT_TRENDING_WINDOW)
+    if window not in TRENDING_WINDOWS:
+        return Response(
+            {"error": f"window must be one of: {', '.join(TRENDING_WINDOWS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
 
-    # 2. Truy vấn - chỉ lấy sản phẩm đã được duyệt
-    # Tính total_sold từ các đơn hàng đã giao thành công (shipped) trong 7 ngày qua
-    trendy_products = Product.objects.filter(
-        is_active=True,
-        order_details__order__created_at__gte=last_week,
-        order_details__order_status='shipped'
-    ).annotate(
-        total_sold=Sum('order_details__quantity') 
-    ).order_by('-total_sold')[:10]
+    # 2. Lấy top 10 theo index (window, -quantity) - chỉ lấy sản phẩm đã được duyệt
+    top_ids = list(
+        TrendingScore.objects.filter(
+            window=window,
+            quantity__gt=0,
+            product__is_active=True
+        ).order_by('-quantity', 'product_id').values_list('product_id', flat=True)[:10]
+    )
 
-    # 3. Prefetch để lấy ảnh và variant
-    trendy_products = trendy_products.prefetch_related('images', 'variants', 'shop', 'category')
+    # 3. Tải sản phẩm theo projection (?view=card / ?fields=...), giữ đúng thứ tự xếp hạng
+    projection = ProductProjection.from_request(request)
+    if projection.uses_documents:
+        data = [render_document(doc, request) for doc in get_documents(top_ids)]
+        return Response(data, status=status.HTTP_200_OK)
 
-    serializer = ProductSerializer(trendy_products, many=True, context={'request': request})
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    products = projection.apply(Product.objects.filter(id__in=top_ids)).in_bulk()
+    trendy_products = [products[pid] for pid in top_ids if pid in products]
+    return Response(projection.serialize(trendy_products, request, many=True), status=status.HTTP_200_OK)
 
 
 @extend_schema(
     tags=['Product'],
+    parameters=PAGINATION_PARAMETERS + PRODUCT_FILTER_PARAMETERS + [PRODUCT_SORT_PARAMETER] + PROJECTION_PARAMETERS,
     responses={200: ProductSerializer(many=True)},
     summary="Sản phẩm Flash Sale",
     description="Lấy danh sách các sản phẩm đang giảm giá sâu (Discount >= 50%)."
 )
 @api_view(['GET'])
+@cache_response('product-flashsale', scopes=[CATALOGUE_SCOPE], refresh=refresh_stock)
 def get_flashsale_product(request):
     """
     Lấy các sản phẩm đang giảm giá sâu (>= 50%).
     Chỉ trả về sản phẩm đã được admin duyệt (is_active=True).
     """
-    flashsale_product = Product.objects.filter(
-        is_active=True,
-        discount__gte=50
-    ).prefetch_related(
-        'variants', 'images', 'category', 'shop'
-    ).order_by('-discount')
-    
-    serializer = ProductSerializer(flashsale_product, many=True, context={'request': request})
-    return Response(serializer.data, status=status.HTTP_200_OK) 
+    flashsale_product = apply_product_filters(
+        Product.objects.filter(is_active=True, discount__gte=50),
+        parse_product_filters(request.query_params)
+    )
+
+    ordering = parse_product_sort(request.query_params, default=('-discount', '-id'))
+    return paginate_products(request, flashsale_product, ordering=ordering)
 
 
 @extend_schema(
     tags=['Product'],
+    parameters=PAGINATION_PARAMETERS + PROJECTION_PARAMETERS,
     responses={200: ProductSerializer(many=True)},
     summary="Gợi ý sản phẩm (Recommend)",
     description="""
     Gợi ý sản phẩm thông minh:
-    - **Đã đăng nhập:** Ưu tiên hiển thị sản phẩm thuộc Category mà User hay mua nhất.
+    - **Đã đăng nhập:** Sản phẩm hay được mua cùng với các sản phẩm User mua gần đây (bù thêm sản phẩm mới nhất nếu chưa đủ).
     - **Chưa đăng nhập:** Hiển thị sản phẩm mới nhất.
     """
 )
@@ -153,41 +340,32 @@ def get_flashsale_product(request):
 def get_recommend_product(request):
     """
     Gợi ý sản phẩm:
-    - Nếu đã đăng nhập: Ưu tiên Category người dùng hay mua nhất.
+    - Nếu đã đăng nhập: Sản phẩm hay được mua cùng các sản phẩm user mua gần đây
+      (danh sách neighbor tính sẵn, xem product.recommendations).
     - Nếu chưa đăng nhập: Trả về sản phẩm mới nhất.
     """
-    base_query = Product.objects.filter(is_active=True).prefetch_related(
-        'variants', 'images', 'category', 'shop'
-    )
+    base_query = Product.objects.filter(is_active=True)
 
     if request.user.is_authenticated:
-        # 1. Subquery: Đếm số lượng sản phẩm user đã mua theo từng Category
-        # order__user: Truy cập ngược từ OrderDetail -> Order -> User
-        category_purchase_count = OrderDetail.objects.filter(
-            order__user=request.user,
-            product__category=OuterRef('category') 
-        ).values('product__category').annotate(
-            cnt=Count('id')
-        ).values('cnt')
-
-        # 2. Gắn điểm (cat_score) cho Product dựa trên Subquery trên
-        product_list = base_query.annotate(
-            cat_score=Coalesce(Subquery(category_purchase_count, output_field=IntegerField()), 0)
-        ).order_by('-cat_score', '-created_at')
-
-    else:
-        # Logic cho khách vãng lai
-        product_list = base_query.order_by('-created_at')
-    
-    serializer = ProductSerializer(product_list, many=True, context={'request': request})
-    return Response(serializer.data, status=status.HTTP_200_OK)
+        ranked_ids = get_user_recommendations(request.user)
+        # Chỉ làm việc trên tối đa RECOMMENDATION_LIMIT sản phẩm, giữ thứ tự gợi ý bằng rec_rank
+        product_list = base_query.filter(id__in=ranked_ids).annotate(
+            rec_rank=Case(
+                *[When(id=product_id, then=Value(rank)) for rank, product_id in enumerate(ranked_ids)],
+                output_field=IntegerField()
+            )
+        )
+        return paginate_products(request, product_list, ordering=('rec_rank', 'id'))
+
+    # Logic cho khách vãng lai
+    return paginate_products(request, base_query, ordering=('-created_at', '-id'))
 
 
 # ============================================================================
 #                               SELLER VIEWS
 # ============================================================================
 
-class SellerProductListCreateView(APIView):
+class SellerProductListCreateView(BoundedUploadMixin, APIView):
     """
     API dành cho chủ Shop:
     - GET: Lấy danh sách sản phẩm của Shop mình.
@@ -215,7 +393,7 @@ class SellerProductListCreateView(APIView):
         if not shop:
              return Response({"error": "You do not have a shop yet."}, status=status.HTTP_400_BAD_REQUEST)
 
-        products = Product.objects.filter(shop=shop).prefetch_related('variants', 'images', 'category')
+        products = Product.objects.filter(shop=shop).select_related('sales').prefetch_related('variants', 'images', 'category')
         serializer = ProductSerializer(products, many=True, context={'request': request})
         return Response(serializer.data, status=status.HTTP_200_OK)
     
@@ -228,7 +406,7 @@ class SellerProductListCreateView(APIView):
             403: inline_serializer(name='ShopError', fields={'error': serializers.CharField()})
         },
         summary="Tạo sản phẩm mới",
-        description="Người bán tạo sản phẩm mới kèm theo Variants và Images (Hỗ trợ Multipart/Form-data). Với , variant là 1 list gồm {\"price\": 150000,\"quantity\": 50,\"attributes\": {\"color\": \"White\", \"type\": \"S\"}, các trường attributes là người dùng nhập"
+        description="Người bán tạo sản phẩm mới kèm theo Variants và Images (Hỗ trợ Multipart/Form-data). Với , variant là 1 list gồm {\"price\": 150000,\"quantity\": 50,\"attributes\": {\"color\": \"White\", \"type\": \"S\"}, các trường attributes là người dùng nhập. Ảnh được tải lên storage ở nền: ảnh mới có status 'pending' cho đến khi worker (process_image_uploads) xử lý xong."
     )
     def post(self, request):        
         shop = self.get_shop(request.user)
@@ -252,7 +430,58 @@ class SellerProductListCreateView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class SellerProductDetailView(APIView):
+class SellerProductImportView(APIView):
+    """
+    API dành cho chủ Shop: nhập hàng loạt sản phẩm từ file CSV / JSONL.
+    File được đọc tuần tự và ghi theo lô (xem product.bulk_import).
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [JSONRenderer]
+    parser_classes = [MultiPartParser]
+
+    @extend_schema(
+        tags=['Product'],
+        request={
+            'multipart/form-data': inline_serializer(name='ProductImportRequest', fields={
+                'file': serializers.FileField(),
+                'format': serializers.ChoiceField(choices=IMPORT_FORMATS, required=False),
+            })
+        },
+        responses={
+            200: inline_serializer(name='ProductImportReport', fields={
+                'total_rows': serializers.IntegerField(),
+                'created': serializers.IntegerField(),
+                'error_count': serializers.IntegerField(),
+                'errors': serializers.ListField(child=serializers.DictField()),
+            }),
+            400: inline_serializer(name='ProductImportError', fields={'error': serializers.CharField()}),
+            403: inline_serializer(name='ProductImportShopError', fields={'error': serializers.CharField()}),
+        },
+        summary="Nhập sản phẩm hàng loạt (CSV / JSONL)",
+        description=(
+            "Mỗi dòng là một sản phẩm gồm: product_name, description, base_price, discount, category (ID), "
+            "is_active, variants (list {\"price\", \"quantity\", \"attributes\", \"is_active\"}; trong CSV là chuỗi JSON), "
+            "image_urls (list URL ảnh đã upload; trong CSV cách nhau bởi '|'). "
+            "Dòng lỗi không chặn các dòng khác, được trả về trong 'errors' kèm số dòng."
+        )
+    )
+    def post(self, request):
+        try:
+            shop = request.user.shop
+        except ObjectDoesNotExist:
+            return Response({"error": "Please register a shop first."}, status=status.HTTP_403_FORBIDDEN)
+
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"error": "Missing 'file'."}, status=status.HTTP_400_BAD_REQUEST)
+        fmt = detect_format(upload.name, request.data.get('format'))
+
+        report = import_products(shop, upload.file, fmt, chunk_size=DEFAULT_CHUNK_SIZE)
+        return Response(report, status=status.HTTP_200_OK)
+
+
+class SellerProductDetailView(BoundedUploadMixin, APIView):
     """
     API dành cho chủ Shop:
     - GET: Xem chi tiết SP của mình.
@@ -267,19 +496,20 @@ class SellerProductDetailView(APIView):
     def get_object(self, request, product_id):
         # Chỉ lấy sản phẩm thuộc sở hữu của user đang đăng nhập
         try:
-            return Product.objects.get(id=product_id, shop__owner=request.user)
+            return Product.objects.select_related('sales').get(id=product_id, shop__owner=request.user)
         except Product.DoesNotExist:
             return None
 
     @extend_schema(
         tags=['Product'],
         summary="Xem chi tiết sản phẩm của Shop",
-        description="Người bán xem chi tiết một sản phẩm do mình tạo ra.",
+        description="Người bán xem chi tiết một sản phẩm do mình tạo ra. Hỗ trợ If-None-Match / If-Modified-Since (304 Not Modified).",
         responses={
             200: ProductSerializer,
             404: inline_serializer(name='SellerProductNotFound', fields={'error': serializers.CharField()})
         }
     )
+    @method_decorator(conditional_get(seller_product_validators))
     def get(self, request, product_id):
         product = self.get_object(request, product_id)
         if not product:
@@ -292,7 +522,11 @@ class SellerProductDetailView(APIView):
         tags=['Product'],
         request=ProductSerializer,
         summary="Cập nhật sản phẩm",
-        description="Cập nhật thông tin sản phẩm (Partial update cho phép cập nhật từng trường).",
+        description=(
+            "Cập nhật thông tin sản phẩm (Partial update cho phép cập nhật từng trường). "
+            "variants_input là danh sách variant đầy đủ sau khi sửa: variant được so khớp theo 'id' (nếu gửi kèm) "
+            "hoặc theo attributes, variant không đổi được giữ nguyên, variant không còn trong danh sách bị xóa."
+        ),
         responses={
             200: ProductSerializer,
             404: inline_serializer(name='UpdateError', fields={'error': serializers.CharField()})
@@ -335,6 +569,7 @@ class SellerProductDetailView(APIView):
         product_name = product.product_name
 
         product.delete()
+        product_changed(product_id)
 
         return Response(
             {"message": f"Product '{product_name}' deleted successfully"}, 
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shop',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -1,14 +1,17 @@
 from django.db import models
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from backend.conditional import RowVersionMixin
 User = get_user_model()
 
-class Shop(models.Model):
+class Shop(RowVersionMixin, models.Model):
     shop_name = models.CharField(max_length=45)
     shop_phone_number=models.CharField(max_length=20,default="")
     shop_address = models.TextField(max_length=200,default="")
     shop_email = models.EmailField(unique=True)
     description = models.TextField(default="")
+    # Tăng mỗi khi thông tin Shop thay đổi, dùng làm ETag
+    version = models.PositiveIntegerField(default=1, editable=False)
     
     owner = models.OneToOneField(
         User, 
@@ -6,6 +6,7 @@ from .serializers import ShopSerializer, ShopRegisterSerializer,UpdateOrderStatu
 from rest_framework import status
 from rest_framework.views import APIView
 from django.core.exceptions import ObjectDoesNotExist
+from django.utils.decorators import method_decorator
 from drf_spectacular.utils import extend_schema_view, extend_schema, inline_serializer
 from rest_framework import serializers
 from .permissions import IsSeller
@@ -13,10 +14,24 @@ from rest_framework.decorators import api_view
 from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from .models import Shop
 from order.models import OrderDetail, Order
+from order.inventory import restock
+from order.reservations import cancel_line
+from product.sales import SHIPPED_STATUS, apply_status_change, record_sale
+from product.invalidation import shop_changed, stock_changed
 from django.db import transaction
+from backend.conditional import conditional_get
 
 
 
+def shop_validators(request):
+    """ETag của Shop thuộc user đang đăng nhập, từ version của dòng Shop."""
+    row = Shop.objects.filter(owner=request.user).values_list('id', 'version').first()
+    if row is None:
+        return None
+    shop_id, version = row
+    return f'shop-{shop_id}-v{version}', None
+
+
 class ShopView(APIView):
     renderer_classes=[JSONRenderer]
     authentication_classes=[JWTAuthentication]
@@ -33,7 +48,7 @@ class ShopView(APIView):
     @extend_schema(
         tags=['Shop'],
         summary="Lấy thông tin Shop của tôi",
-        description="Trả về thông tin chi tiết Shop của User đang đăng nhập.",
+        description="Trả về thông tin chi tiết Shop của User đang đăng nhập. Hỗ trợ If-None-Match (304 Not Modified).",
         responses={
             200: ShopSerializer,
             404: inline_serializer(
@@ -42,6 +57,7 @@ class ShopView(APIView):
             )
         }
     )
+    @method_decorator(conditional_get(shop_validators))
     def get(self, request):
         shop = self.get_object(request.user)
         if shop is None:
@@ -76,6 +92,7 @@ class ShopView(APIView):
         
         if serializer.is_valid():
             serializer.save()
+            shop_changed(shop.id)
             return Response(serializer.data)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -145,7 +162,13 @@ def update_order_status(request, detail_id):
     serializer = UpdateOrderStatusSerializer(order_detail, data=request.data, partial=True)
     
     if serializer.is_valid():
-        serializer.save()
+        with transaction.atomic():
+            # Khóa dòng để 2 request đồng thời không cộng bộ đếm đã bán 2 lần
+            previous_status = OrderDetail.objects.select_for_update().values_list(
+                'order_status', flat=True
+            ).get(id=order_detail.id)
+            serializer.save()
+            apply_status_change(order_detail, previous_status)
         return Response({
             'message': 'Cập nhật trạng thái thành công',
             'data': serializer.data
@@ -188,17 +211,33 @@ def reject_order(request, detail_id):
 
     try:
         with transaction.atomic():
+            # Khóa dòng rồi đọc lại trạng thái (như update_order_status): dòng vừa chuyển 'shipped'
+            # vẫn được hoàn tác bộ đếm đã bán, dòng vừa bị từ chối ở request khác thì không hoàn kho lần nữa
+            try:
+                order_detail.order_status = OrderDetail.objects.select_for_update().values_list(
+                    'order_status', flat=True
+                ).get(id=order_detail.id)
+            except OrderDetail.DoesNotExist:
+                return Response({'message': 'Không tìm thấy dòng đơn hàng này hoặc không thuộc Shop của bạn.'}, status=status.HTTP_404_NOT_FOUND)
+
             # 1. Hoàn trả số lượng sản phẩm về kho
+            stock_changed([order_detail.product_id])
             if order_detail.variant:
-                # Hoàn trả cho variant
-                order_detail.variant.quantity += order_detail.quantity
-                order_detail.variant.save()
+                # Đơn online: giữ chỗ đã hết hạn / đã hủy thì hàng đã được hoàn, chỉ hoàn phần còn đang bị trừ
+                quantity = cancel_line(order_detail.order_id, order_detail.variant_id, order_detail.quantity)
+                if quantity:
+                    # Hoàn trả cho variant (cộng trong DB, không ghi đè tồn kho mà đơn khác vừa trừ)
+                    restock(order_detail.variant_id, quantity)
             else:
                 # Hoàn trả cho product
                 product = order_detail.product
                 if hasattr(product, 'quantity'):
                     product.quantity += order_detail.quantity
                     product.save()
+
+            # Hoàn tác bộ đếm đã bán nếu dòng này đã được tính là 'shipped'
+            if order_detail.order_status == SHIPPED_STATUS:
+                record_sale(order_detail, sign=-1)
             
             # 2. Lưu thông tin order trước khi xóa để kiểm tra sau
             order = order_detail.order
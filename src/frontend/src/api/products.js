@@ -1,8 +1,23 @@
 import { get, post, put, del, postFormData, putFormData } from './client';
 
 // Public
-export function fetchPublicProducts() {
-  return get('/products/public/list/');
+// Các danh sách public được phân trang theo cursor: { next, next_cursor, results }
+function buildPageQuery({ cursor, pageSize } = {}) {
+  const params = new URLSearchParams();
+  if (cursor) params.set('cursor', cursor);
+  if (pageSize) params.set('page_size', pageSize);
+  const query = params.toString();
+  return query ? `?${query}` : '';
+}
+
+export function fetchPublicProducts(page) {
+  return get(`/products/public/list/${buildPageQuery(page)}`);
+}
+
+export function searchPublicProducts(keyword, page) {
+  const query = buildPageQuery(page);
+  const separator = query ? '&' : '?';
+  return get(`/products/public/search/${query}${separator}q=${encodeURIComponent(keyword)}`);
 }
 
 export function fetchPublicProductDetail(productId) {
@@ -13,12 +28,12 @@ export function fetchTrendyProducts(token = null) {
   return get('/products/public/trendy/', token);
 }
 
-export function fetchFlashSaleProducts(token = null) {
-  return get('/products/public/flash-sale/', token);
+export function fetchFlashSaleProducts(token = null, page) {
+  return get(`/products/public/flash-sale/${buildPageQuery(page)}`, token);
 }
 
-export function fetchRecommendProducts(token = null) {
-  return get('/products/public/recommend/', token);
+export function fetchRecommendProducts(token = null, page) {
+  return get(`/products/public/recommend/${buildPageQuery(page)}`, token);
 }
 
 // Private (require token)
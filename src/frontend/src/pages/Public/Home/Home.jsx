@@ -91,16 +91,17 @@ const HomePage = () => {
         // Tải song song tất cả các loại sản phẩm và danh mục
         const [trendyData, flashSaleData, allProductsData, recommendData, categoriesData] = await Promise.all([
           fetchTrendyProducts(accessToken),
-          fetchFlashSaleProducts(accessToken),
-          fetchPublicProducts(),
-          fetchRecommendProducts(accessToken),
+          fetchFlashSaleProducts(accessToken, { pageSize: 20 }),
+          fetchPublicProducts({ pageSize: 40 }),
+          fetchRecommendProducts(accessToken, { pageSize: 20 }),
           fetchCategories(accessToken)
         ])
 
         setTrendyProducts(trendyData || [])
-        setFlashSaleProducts(flashSaleData || [])
-        setAllProducts(allProductsData || [])
-        setRecommendProducts(recommendData || [])
+        // Các danh sách public trả về dạng phân trang { next, next_cursor, results }
+        setFlashSaleProducts(flashSaleData?.results || [])
+        setAllProducts(allProductsData?.results || [])
+        setRecommendProducts(recommendData?.results || [])
         setCategories(categoriesData || [])
       } catch (err) {
         console.error("Error loading products:", err)